@@ -21,6 +21,10 @@ def create_app(config_name='default'):
     """应用工厂函数"""
     app = Flask(__name__)
     
+    # JSON 编码（安装 orjson 时使用）
+    from app.services.responses import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # 加载配置
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
@@ -28,9 +32,29 @@ def create_app(config_name='default'):
     # 初始化扩展
     db.init_app(app)
     jwt.init_app(app)
-    CORS(app, origins=app.config['CORS_ORIGINS'])
+    CORS(app, origins=app.config['CORS_ORIGINS'], expose_headers=['ETag'])
     limiter.init_app(app)
     
+    # 后台导入队列
+    from app.services.jobs import import_queue
+    import_queue.init_app(app)
+    
+    # 分析结果缓存
+    from app.services.cache import result_cache
+    result_cache.init_app(app)
+    
+    # 每用户列式快照
+    from app.services.snapshot import snapshot_store
+    snapshot_store.init_app(app)
+    
+    # 数据变更推送
+    from app.services.events import change_broker
+    change_broker.init_app(app)
+    
+    # 响应压缩
+    from app.services.responses import compressor
+    compressor.init_app(app)
+    
     # 配置日志
     setup_logging(app)
     
@@ -40,9 +64,13 @@ def create_app(config_name='default'):
     # 注册错误处理器
     register_error_handlers(app)
     
-    # 创建数据库表
-    with app.app_context():
-        db.create_all()
+    # 注册命令行命令
+    register_commands(app)
+    
+    # 表结构由 Alembic 迁移管理（alembic upgrade head），测试环境直接建表
+    if app.config['AUTO_CREATE_TABLES']:
+        with app.app_context():
+            db.create_all()
     
     return app
 
@@ -73,7 +101,7 @@ def setup_logging(app):
 
 def register_blueprints(app):
     """注册蓝图"""
-    from app.routes import auth, data, analytics, forecast, reports, settings
+    from app.routes import auth, data, analytics, forecast, reports, settings, events
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(data.bp, url_prefix='/api/data')
@@ -81,6 +109,7 @@ def register_blueprints(app):
     app.register_blueprint(forecast.bp, url_prefix='/api/forecast')
     app.register_blueprint(reports.bp, url_prefix='/api/reports')
     app.register_blueprint(settings.bp, url_prefix='/api/settings')
+    app.register_blueprint(events.bp, url_prefix='/api/events')
 
 
 def register_error_handlers(app):
@@ -113,3 +142,40 @@ def register_error_handlers(app):
         app.logger.error(f'未处理的异常: {error}', exc_info=True)
         return jsonify({'error': '服务器错误', 'message': str(error)}), 500
 
+
+
+def register_commands(app):
+    """注册命令行命令"""
+    import click
+    
+    @app.cli.command('rebuild-rollups')
+    @click.option('--user-id', type=int, default=None, help='只重建指定用户')
+    def rebuild_rollups(user_id):
+        """全量重建每日汇总表（daily_rollups）"""
+        from app.services.rollup import rebuild
+        count = rebuild(user_id)
+        click.echo(f'✓ 已重建 {count} 个用户的每日汇总')
+    
+    @app.cli.command('rebuild-category-closure')
+    def rebuild_category_closure():
+        """按 categories 表重建类别闭包表（category_closure）"""
+        from app.services.categories import rebuild_closure
+        rebuild_closure(db.session.connection())
+        db.session.commit()
+        click.echo('✓ 已重建类别闭包表')
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """重建消费记录检索索引（SQLite 重建 FTS 表与触发器）"""
+        from app.services.search import install
+        install(db.session.connection(), rebuild=True)
+        db.session.commit()
+        click.echo('✓ 已重建消费记录检索索引')
+    
+    @app.cli.command('backfill-geo-cells')
+    @click.option('--user-id', type=int, default=None, help='只处理指定用户')
+    def backfill_geo_cells(user_id):
+        """为已有经纬度的消费记录补算空间网格编号（geo_cell）"""
+        from app.services.geogrid import backfill
+        count = backfill(user_id)
+        click.echo(f'✓ 已补算 {count} 条记录的空间网格')
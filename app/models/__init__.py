@@ -7,6 +7,9 @@ from app.models.report import Report
 from app.models.setting import Setting
 from app.models.import_record import ImportRecord
 from app.models.login_log import LoginLog
+from app.models.daily_rollup import DailyRollup
+from app.models.category_closure import CategoryClosure
+from app.models.category_version import CategoryVersion
 
 __all__ = [
     'User',
@@ -16,6 +19,9 @@ __all__ = [
     'Report',
     'Setting',
     'ImportRecord',
-    'LoginLog'
+    'LoginLog',
+    'DailyRollup',
+    'CategoryClosure',
+    'CategoryVersion'
 ]
 
@@ -0,0 +1,22 @@
+"""类别闭包表模型"""
+from app import db
+
+
+class CategoryClosure(db.Model):
+    """类别闭包表：每个类别与其所有祖先（含自身）各占一行"""
+    __tablename__ = 'category_closure'
+    
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)  # 祖先到后代的层数，自身为 0
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'ancestor_id': self.ancestor_id,
+            'descendant_id': self.descendant_id,
+            'depth': self.depth
+        }
+    
+    def __repr__(self):
+        return f'<CategoryClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>'
@@ -0,0 +1,16 @@
+"""类别版本号模型"""
+from app import db
+
+
+class CategoryVersion(db.Model):
+    """类别表的全局版本号（单行），类别增删改的事务中递增
+
+    各进程的类别缓存按它判断是否需要重新加载。
+    """
+    __tablename__ = 'category_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    def __repr__(self):
+        return f'<CategoryVersion {self.version}>'
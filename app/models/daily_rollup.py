@@ -0,0 +1,38 @@
+"""每日消费汇总模型"""
+import json
+from app import db
+
+
+class DailyRollup(db.Model):
+    """每日消费汇总表（按用户、日期、类别聚合，由导入与消费写入增量维护）"""
+    __tablename__ = 'daily_rollups'
+    __table_args__ = (
+        db.Index('ix_daily_rollups_user_day', 'user_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    min_amount = db.Column(db.Float, nullable=True)
+    max_amount = db.Column(db.Float, nullable=True)
+    hour_totals = db.Column(db.Text, nullable=True)  # JSON 格式，24 个小时各自的金额合计
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'day': self.day.isoformat() if self.day else None,
+            'category_id': self.category_id,
+            'total': self.total,
+            'count': self.count,
+            'min_amount': self.min_amount,
+            'max_amount': self.max_amount,
+            'hour_totals': json.loads(self.hour_totals) if self.hour_totals else [0] * 24
+        }
+    
+    def __repr__(self):
+        return f'<DailyRollup {self.user_id} {self.day} {self.category_id}: {self.total}>'
@@ -6,9 +6,18 @@ from app import db
 class Expense(db.Model):
     """消费记录表"""
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_user_fingerprint', 'user_id', 'fingerprint', unique=True),
+        db.Index('ix_expenses_user_geo_cell', 'user_id', 'geo_cell'),
+        # 分析查询均为 user_id 等值 + time 区间；带上 amount 使按时间聚合金额无需回表
+        db.Index('ix_expenses_user_time', 'user_id', 'time', 'amount'),
+        db.Index('ix_expenses_user_category_time', 'user_id', 'category_id', 'time'),
+        # 消费记录检索按 (time, id) 倒序键集分页
+        db.Index('ix_expenses_user_time_id', 'user_id', 'time', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     time = db.Column(db.DateTime, nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True, index=True)
@@ -17,8 +26,10 @@ class Expense(db.Model):
     location_lat = db.Column(db.Float, nullable=True)
     location_lon = db.Column(db.Float, nullable=True)
     location_text = db.Column(db.String(200), nullable=True)
+    geo_cell = db.Column(db.BigInteger, nullable=True)  # 经纬度的空间网格编号（Morton 编码）
     
     note = db.Column(db.Text, nullable=True)
+    fingerprint = db.Column(db.String(40), nullable=True)  # 行指纹，用于导入去重
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     def to_dict(self):
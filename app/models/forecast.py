@@ -6,9 +6,12 @@ from app import db
 class Forecast(db.Model):
     """预测结果表"""
     __tablename__ = 'forecasts'
+    __table_args__ = (
+        db.Index('ix_forecasts_user_date', 'user_id', 'date', 'id'),  # 键集分页
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     period = db.Column(db.String(20), nullable=False)  # day, month, year
     date = db.Column(db.Date, nullable=False, index=True)
     predicted_amount = db.Column(db.Float, nullable=False)
@@ -6,16 +6,27 @@ from app import db
 class ImportRecord(db.Model):
     """数据导入记录表"""
     __tablename__ = 'import_records'
+    __table_args__ = (
+        db.Index('ix_import_records_user_idempotency', 'user_id', 'idempotency_key', unique=True),
+        db.Index('ix_import_records_user_created', 'user_id', 'created_at', 'id'),  # 键集分页
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
     rows_total = db.Column(db.Integer, default=0)
+    rows_expected = db.Column(db.Integer, nullable=True)  # 预估总行数，用于进度
     rows_success = db.Column(db.Integer, default=0)
     rows_failed = db.Column(db.Integer, default=0)
-    status = db.Column(db.String(20), default='pending')  # pending, processing, success, failed
+    rows_duplicate = db.Column(db.Integer, default=0)  # 因指纹重复而跳过的行数
+    status = db.Column(db.String(20), default='pending')  # pending, processing, success, partial, failed
     error_report_path = db.Column(db.String(500), nullable=True)
+    rows_per_sec = db.Column(db.Float, nullable=True)  # 导入吞吐量（行/秒）
+    error_message = db.Column(db.String(500), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # 文件 SHA-256
+    idempotency_key = db.Column(db.String(128), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # 状态或进度变化时间
     
     def to_dict(self):
         """转换为字典"""
@@ -24,13 +35,33 @@ class ImportRecord(db.Model):
             'user_id': self.user_id,
             'filename': self.filename,
             'rows_total': self.rows_total,
+            'rows_expected': self.rows_expected,
             'rows_success': self.rows_success,
             'rows_failed': self.rows_failed,
+            'rows_duplicate': self.rows_duplicate,
             'status': self.status,
             'error_report_path': self.error_report_path,
+            'rows_per_sec': self.rows_per_sec,
+            'error_message': self.error_message,
+            'content_hash': self.content_hash,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
+    def progress(self):
+        """导入进度（0~1），无法估算时返回 None"""
+        if self.status in ('success', 'partial'):
+            return 1.0
+        if not self.rows_expected:
+            return None
+        return min((self.rows_total or 0) / self.rows_expected, 1.0)
+    
+    def eta_sec(self):
+        """预计剩余秒数，无法估算时返回 None"""
+        if self.status != 'processing' or not self.rows_expected or not self.rows_per_sec:
+            return None
+        remaining = max(self.rows_expected - (self.rows_total or 0), 0)
+        return round(remaining / self.rows_per_sec, 1)
+    
     def __repr__(self):
         return f'<ImportRecord {self.id}: {self.filename}>'
 
@@ -6,9 +6,12 @@ from app import db
 class Report(db.Model):
     """分析报告表"""
     __tablename__ = 'reports'
+    __table_args__ = (
+        db.Index('ix_reports_user_created', 'user_id', 'created_at', 'id'),  # 键集分页
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     format = db.Column(db.String(20), nullable=False)  # pdf, docx
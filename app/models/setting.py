@@ -12,6 +12,7 @@ class Setting(db.Model):
     theme = db.Column(db.String(50), default='light')  # light, dark
     chart_prefs = db.Column(db.Text, nullable=True)  # JSON 格式的图表偏好设置
     refresh_interval_sec = db.Column(db.Integer, default=300)  # 刷新间隔（秒）
+    timezone = db.Column(db.String(64), nullable=True)  # IANA 时区名，为空时按 STORAGE_TIMEZONE 统计
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
@@ -23,6 +24,7 @@ class Setting(db.Model):
             'theme': self.theme,
             'chart_prefs': json.loads(self.chart_prefs) if self.chart_prefs else {},
             'refresh_interval_sec': self.refresh_interval_sec,
+            'timezone': self.timezone,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
@@ -14,6 +14,8 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='user', nullable=False)  # user, admin
     status = db.Column(db.String(20), default='active', nullable=False)  # active, inactive, banned
+    data_version = db.Column(db.Integer, default=0, nullable=False)  # 消费数据版本号，导入或修改时递增
+    rewrite_version = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # 最近一次修改/删除已有记录时的数据版本号
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -1,17 +1,51 @@
 """数据分析路由"""
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func, extract
+from sqlalchemy import func
+import numpy as np
 from app import db
 from app.models.expense import Expense
-from app.models.category import Category
+from app.models.category_closure import CategoryClosure
+from app.services.categories import category_cache
+from app.services.rollup import load_daily, load_days, group_raw, fold
+from app.services.timezones import user_timezone, iter_local_hours
+from app.services.geogrid import MAX_CELLS, MAX_LEVEL, MAX_ZOOM_WITHOUT_BBOX, parse_bbox, aggregate
+from app.services.widgets import trend_series, category_totals, category_share, rank, window_start
+from app.services import downsample, comparison
+from app.services.anomaly import detect, load_columns
+from app.services.buckets import date_bucket, bucket_label
+from app.services.cache import result_cache, conditional
+from app.services.snapshot import snapshot_store
 
 bp = Blueprint('analytics', __name__)
 
 
+def use_rollup():
+    """是否从每日汇总表读取"""
+    return current_app.config['ANALYTICS_USE_ROLLUP']
+
+
+def parse_range(start_date, end_date):
+    """解析 ISO 格式的起止时间参数"""
+    return (
+        datetime.fromisoformat(start_date) if start_date else None,
+        datetime.fromisoformat(end_date) if end_date else None
+    )
+
+
+def trend_payload(period, data, max_points=None, method='lttb'):
+    """趋势响应体；指定 max_points 时降采样并附带原始点数"""
+    payload = {'period': period, 'data': downsample.downsample(data, max_points, method)}
+    if max_points:
+        payload['original_points'] = len(data)
+    return payload
+
+
 @bp.route('/trend', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_trend():
     """获取消费趋势数据（折线图）"""
     current_user_id = get_jwt_identity()
@@ -20,62 +54,40 @@ def get_trend():
     period = request.args.get('period', 'month')  # day, month, year
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+
+    try:
+        max_points, method = downsample.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # 构建查询
+        start_time, end_time = parse_range(start_date, end_date)
+        if period not in ('year', 'month'):
+            # 默认最近30天
+            start_time = window_start(start_time)
+
+        if use_rollup():
+            data = trend_series(load_daily(current_user_id, start_time, end_time), period)
+            
+            return jsonify(trend_payload(period, data, max_points, method)), 200
+        
+        # 按周期分桶（SQLite 为 strftime，PostgreSQL 为 date_trunc）
+        unit = period if period in ('year', 'month') else 'day'
+        bucket = date_bucket(Expense.time, unit).label('bucket')
         query = db.session.query(
-            func.date(Expense.time).label('date'),
+            bucket,
             func.sum(Expense.amount).label('total')
-        ).filter_by(user_id=current_user_id)
+        ).filter(Expense.user_id == current_user_id)
         
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        else:
-            # 默认最近30天
-            query = query.filter(Expense.time >= datetime.now() - timedelta(days=30))
+        if start_time:
+            query = query.filter(Expense.time >= start_time)
+        if end_time:
+            query = query.filter(Expense.time <= end_time)
         
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+        results = query.group_by(bucket).order_by(bucket).all()
+        data = [{'date': bucket_label(r.bucket, unit), 'amount': float(r.total)} for r in results]
         
-        # 按日期分组
-        if period == 'year':
-            query = db.session.query(
-                extract('year', Expense.time).label('year'),
-                func.sum(Expense.amount).label('total')
-            ).filter_by(user_id=current_user_id)
-            
-            if start_date:
-                query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-            if end_date:
-                query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-            
-            results = query.group_by('year').order_by('year').all()
-            
-            data = [{'date': str(int(r.year)), 'amount': float(r.total)} for r in results]
-            
-        elif period == 'month':
-            query = db.session.query(
-                func.strftime('%Y-%m', Expense.time).label('month'),
-                func.sum(Expense.amount).label('total')
-            ).filter_by(user_id=current_user_id)
-            
-            if start_date:
-                query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-            if end_date:
-                query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-            
-            results = query.group_by('month').order_by('month').all()
-            
-            data = [{'date': r.month, 'amount': float(r.total)} for r in results]
-            
-        else:  # day
-            results = query.group_by('date').order_by('date').all()
-            data = [{'date': str(r.date), 'amount': float(r.total)} for r in results]
-        
-        return jsonify({
-            'period': period,
-            'data': data
-        }), 200
+        return jsonify(trend_payload(period, data, max_points, method)), 200
         
     except Exception as e:
         current_app.logger.error(f'获取趋势数据失败: {e}')
@@ -84,6 +96,8 @@ def get_trend():
 
 @bp.route('/category-share', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_category_share():
     """获取类别占比数据（饼图）"""
     current_user_id = get_jwt_identity()
@@ -92,33 +106,28 @@ def get_category_share():
     end_date = request.args.get('end_date')
     
     try:
-        # 构建查询
-        query = db.session.query(
-            Category.name,
-            func.sum(Expense.amount).label('total'),
-            func.count(Expense.id).label('count')
-        ).join(Expense).filter(Expense.user_id == current_user_id)
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-        
-        results = query.group_by(Category.name).order_by(func.sum(Expense.amount).desc()).all()
-        
-        # 计算总额
-        total_amount = sum(r.total for r in results)
+        if use_rollup():
+            results = category_totals(load_daily(current_user_id, *parse_range(start_date, end_date)))
+        else:
+            # 构建查询（按 category_id 聚合，名称由类别缓存翻译，免去 JOIN）
+            query = db.session.query(
+                Expense.category_id,
+                func.sum(Expense.amount).label('total'),
+                func.count(Expense.id).label('count')
+            ).filter(Expense.user_id == current_user_id, Expense.category_id.isnot(None))
+            
+            if start_date:
+                query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
+            if end_date:
+                query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+            
+            results = query.group_by(Expense.category_id).all()
         
-        data = [{
-            'category': r.name,
-            'amount': float(r.total),
-            'count': r.count,
-            'percentage': round(float(r.total) / total_amount * 100, 2) if total_amount > 0 else 0
-        } for r in results]
+        data, total_amount = category_share(results)
         
         return jsonify({
             'data': data,
-            'total_amount': float(total_amount)
+            'total_amount': total_amount
         }), 200
         
     except Exception as e:
@@ -128,6 +137,8 @@ def get_category_share():
 
 @bp.route('/amount-hist', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_amount_histogram():
     """获取金额分布数据（柱状图）"""
     current_user_id = get_jwt_identity()
@@ -135,45 +146,54 @@ def get_amount_histogram():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     bins = request.args.get('bins', 10, type=int)
+    scale = request.args.get('scale', 'linear')  # linear, log, quantile
+    
+    if bins < 1:
+        return jsonify({'error': 'bins 必须为正整数'}), 400
     
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+        # 从列式快照取金额一列
+        start_time, end_time = parse_range(start_date, end_date)
+        amounts = np.asarray(snapshot_store.get(current_user_id).between(start_time, end_time).amount)
         
-        expenses = query.all()
-        
-        if not expenses:
+        if amounts.size == 0:
             return jsonify({'data': []}), 200
         
-        # 计算分布
-        amounts = [e.amount for e in expenses]
-        min_amount = min(amounts)
-        max_amount = max(amounts)
+        min_amount = float(amounts.min())
+        max_amount = float(amounts.max())
+        
+        # 计算区间边界
+        if min_amount == max_amount:
+            edges = np.full(bins + 1, min_amount)
+        elif scale == 'log':
+            # 对数区间：非正金额并入第一个区间
+            low = amounts[amounts > 0].min() if (amounts > 0).any() else max_amount
+            edges = np.geomspace(low, max_amount, bins + 1) if low < max_amount \
+                else np.linspace(min_amount, max_amount, bins + 1)
+            edges[0] = min(edges[0], min_amount)
+        elif scale == 'quantile':
+            # 分位数区间：每个区间笔数大致相同，重复边界合并
+            edges = np.unique(np.quantile(amounts, np.linspace(0, 1, bins + 1)))
+        else:
+            edges = np.linspace(min_amount, max_amount, bins + 1)
         
-        # 创建区间
-        bin_width = (max_amount - min_amount) / bins
-        histogram = []
+        # 左闭右开，最后一个区间右闭
+        if min_amount == max_amount:
+            counts = np.zeros(bins, dtype=np.int64)
+            counts[-1] = amounts.size
+        else:
+            counts, _ = np.histogram(amounts, bins=edges)
         
-        for i in range(bins):
-            bin_start = min_amount + i * bin_width
-            bin_end = bin_start + bin_width
-            
-            count = sum(1 for a in amounts if bin_start <= a < bin_end or (i == bins - 1 and a == bin_end))
-            
-            histogram.append({
-                'range': f'{bin_start:.2f}-{bin_end:.2f}',
-                'start': round(bin_start, 2),
-                'end': round(bin_end, 2),
-                'count': count
-            })
+        histogram = [{
+            'range': f'{bin_start:.2f}-{bin_end:.2f}',
+            'start': round(float(bin_start), 2),
+            'end': round(float(bin_end), 2),
+            'count': int(count)
+        } for bin_start, bin_end, count in zip(edges[:-1], edges[1:], counts)]
         
         return jsonify({
             'data': histogram,
+            'scale': scale,
             'min': round(min_amount, 2),
             'max': round(max_amount, 2)
         }), 200
@@ -185,51 +205,43 @@ def get_amount_histogram():
 
 @bp.route('/heatmap', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_heatmap():
     """获取地点热力图数据"""
     current_user_id = get_jwt_identity()
     
+    zoom = request.args.get('zoom', 4, type=int)
+    bbox = request.args.get('bbox')  # west,south,east,north
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
+
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)\
-            .filter(Expense.location_lat.isnot(None), Expense.location_lon.isnot(None))
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-        
-        expenses = query.all()
-        
-        # 聚合地点数据
-        location_data = {}
-        for expense in expenses:
-            key = f"{expense.location_lat:.4f},{expense.location_lon:.4f}"
-            if key not in location_data:
-                location_data[key] = {
-                    'lat': expense.location_lat,
-                    'lon': expense.location_lon,
-                    'count': 0,
-                    'total_amount': 0
-                }
-            location_data[key]['count'] += 1
-            location_data[key]['total_amount'] += expense.amount
-        
+        zoom = max(0, min(zoom, MAX_LEVEL))
+        if not bbox and zoom > MAX_ZOOM_WITHOUT_BBOX:
+            raise ValueError(f'缩放级别大于 {MAX_ZOOM_WITHOUT_BBOX} 时需指定 bbox 视口')
+        bboxes = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # 按缩放级别对视口内的网格聚合，网格数不超过 MAX_CELLS（超出时 truncated 为 true）
+        level, cells, truncated = aggregate(
+            current_user_id, zoom, bboxes, *parse_range(start_date, end_date), limit=MAX_CELLS
+        )
+
         data = [
             {
-                'lat': v['lat'],
-                'lon': v['lon'],
-                'count': v['count'],
-                'amount': round(v['total_amount'], 2),
-                'intensity': v['count']  # 热力强度
+                'lat': cell.lat,
+                'lon': cell.lon,
+                'count': cell.count,
+                'amount': round(cell.amount, 2),
+                'intensity': cell.count  # 热力强度
             }
-            for v in location_data.values()
+            for cell in cells
         ]
-        
-        return jsonify({'data': data}), 200
+
+        return jsonify({'zoom': zoom, 'cell_level': level, 'truncated': truncated, 'data': data}), 200
 
     except Exception as e:
         current_app.logger.error(f'获取热力图数据失败: {e}')
@@ -238,6 +250,8 @@ def get_heatmap():
 
 @bp.route('/time-radar', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_time_radar():
     """获取时间分布数据（雷达图）"""
     current_user_id = get_jwt_identity()
@@ -247,40 +261,32 @@ def get_time_radar():
     end_date = request.args.get('end_date')
 
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)
+        weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+        month_names = ['1月', '2月', '3月', '4月', '5月', '6月', '7月', '8月', '9月', '10月', '11月', '12月']
 
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+        # 按维度聚合：（日期、小时）聚合桶换算到用户时区后再合并
+        distribution = {}
 
-        expenses = query.all()
+        start_time, end_time = parse_range(start_date, end_date)
+        if use_rollup():
+            stats = load_daily(current_user_id, start_time, end_time)
+        else:
+            stats = group_raw(current_user_id, start_time, end_time)
 
-        # 按维度聚合
-        distribution = {}
+        for local, value in iter_local_hours(stats, user_timezone(current_user_id)):
+            if dimension == 'hour':
+                key = local.hour
+            elif dimension == 'weekday':
+                key = local.weekday()
+            else:  # month
+                key = local.month - 1
+            distribution[key] = distribution.get(key, 0) + value
 
         if dimension == 'hour':
-            for expense in expenses:
-                hour = expense.time.hour
-                distribution[hour] = distribution.get(hour, 0) + expense.amount
-
             data = [{'label': f'{h}时', 'value': round(distribution.get(h, 0), 2)} for h in range(24)]
-
         elif dimension == 'weekday':
-            weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-            for expense in expenses:
-                weekday = expense.time.weekday()
-                distribution[weekday] = distribution.get(weekday, 0) + expense.amount
-
             data = [{'label': weekday_names[i], 'value': round(distribution.get(i, 0), 2)} for i in range(7)]
-
         else:  # month
-            month_names = ['1月', '2月', '3月', '4月', '5月', '6月', '7月', '8月', '9月', '10月', '11月', '12月']
-            for expense in expenses:
-                month = expense.time.month - 1
-                distribution[month] = distribution.get(month, 0) + expense.amount
-
             data = [{'label': month_names[i], 'value': round(distribution.get(i, 0), 2)} for i in range(12)]
 
         return jsonify({
@@ -295,6 +301,8 @@ def get_time_radar():
 
 @bp.route('/behavior-tree', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_behavior_tree():
     """获取消费行为关联数据（树状图/桑基图）"""
     current_user_id = get_jwt_identity()
@@ -303,37 +311,56 @@ def get_behavior_tree():
     end_date = request.args.get('end_date')
 
     try:
-        # 构建查询
-        query = db.session.query(
-            Category.name,
-            Category.parent_id,
-            func.sum(Expense.amount).label('total')
-        ).join(Expense).filter(Expense.user_id == current_user_id)
+        # 各类别的子树合计（含所有后代类别）
+        if use_rollup():
+            stats = load_daily(current_user_id, *parse_range(start_date, end_date))
+            folded = fold(
+                (stat for stat in stats if stat.category_id is not None),
+                lambda stat: stat.category_id
+            )
+            # 经缓存的祖先链逐级累加到父类
+            totals = {}
+            for category_id, stat in folded.items():
+                for ancestor_id in category_cache.ancestors(category_id):
+                    totals[ancestor_id] = totals.get(ancestor_id, 0) + stat.total
+        else:
+            # 一次聚合查询：经闭包表把每笔消费计入其类别的所有祖先
+            query = db.session.query(
+                CategoryClosure.ancestor_id,
+                func.sum(Expense.amount).label('total')
+            ).join(CategoryClosure, CategoryClosure.descendant_id == Expense.category_id)\
+                .filter(Expense.user_id == current_user_id)
 
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+            if start_date:
+                query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
+            if end_date:
+                query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
 
-        results = query.group_by(Category.id).all()
+            totals = dict(query.group_by(CategoryClosure.ancestor_id).all())
 
-        # 构建树形结构
+        # 构建树形结构（类别名称与父级均取自类别缓存）
         nodes = []
         links = []
 
-        for r in results:
+        for category_id in sorted(totals):
+            entry = category_cache.get(category_id)
+            if entry is None:
+                continue
+            name, parent_id = entry
+            total = float(totals[category_id])
+
             nodes.append({
-                'name': r.name,
-                'value': float(r.total)
+                'name': name,
+                'value': total
             })
 
-            if r.parent_id:
-                parent = Category.query.get(r.parent_id)
-                if parent:
+            if parent_id in totals:
+                parent_name = category_cache.name(parent_id)
+                if parent_name:
                     links.append({
-                        'source': parent.name,
-                        'target': r.name,
-                        'value': float(r.total)
+                        'source': parent_name,
+                        'target': name,
+                        'value': total
                     })
 
         return jsonify({
@@ -348,6 +375,8 @@ def get_behavior_tree():
 
 @bp.route('/level-scatter', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_level_scatter():
     """获取消费水平分布数据（散点图）"""
     current_user_id = get_jwt_identity()
@@ -356,27 +385,43 @@ def get_level_scatter():
     end_date = request.args.get('end_date')
 
     try:
+        if use_rollup():
+            stats = load_daily(current_user_id, *parse_range(start_date, end_date))
+            folded = fold(
+                (stat for stat in stats if stat.category_id is not None),
+                lambda stat: stat.category_id
+            )
+
+            data = [{
+                'category': category_cache.name(category_id),
+                'frequency': stat.count,
+                'avg_amount': round(stat.total / stat.count, 2),
+                'total_amount': round(stat.total, 2)
+            } for category_id, stat in sorted(folded.items()) if category_cache.get(category_id)]
+
+            return jsonify({'data': data}), 200
+
         # 构建查询
         query = db.session.query(
-            Category.name,
+            Expense.category_id,
             func.count(Expense.id).label('frequency'),
             func.avg(Expense.amount).label('avg_amount'),
             func.sum(Expense.amount).label('total_amount')
-        ).join(Expense).filter(Expense.user_id == current_user_id)
+        ).filter(Expense.user_id == current_user_id, Expense.category_id.isnot(None))
 
         if start_date:
             query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
         if end_date:
             query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
 
-        results = query.group_by(Category.id).all()
+        results = query.group_by(Expense.category_id).all()
 
         data = [{
-            'category': r.name,
+            'category': category_cache.name(r.category_id),
             'frequency': r.frequency,
             'avg_amount': round(float(r.avg_amount), 2),
             'total_amount': round(float(r.total_amount), 2)
-        } for r in results]
+        } for r in results if category_cache.get(r.category_id)]
 
         return jsonify({'data': data}), 200
 
@@ -387,6 +432,8 @@ def get_level_scatter():
 
 @bp.route('/rank', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def get_rank():
     """获取消费排行榜数据（条形图）"""
     current_user_id = get_jwt_identity()
@@ -397,23 +444,26 @@ def get_rank():
     end_date = request.args.get('end_date')
 
     try:
-        if rank_by == 'category':
+        if use_rollup() and rank_by != 'location':
+            data = rank(load_daily(current_user_id, *parse_range(start_date, end_date)), rank_by, top_n)
+
+        elif rank_by == 'category':
             # 按类别排行
             query = db.session.query(
-                Category.name,
+                Expense.category_id,
                 func.sum(Expense.amount).label('total')
-            ).join(Expense).filter(Expense.user_id == current_user_id)
+            ).filter(Expense.user_id == current_user_id, Expense.category_id.isnot(None))
 
             if start_date:
                 query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
             if end_date:
                 query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
 
-            results = query.group_by(Category.id)\
+            results = query.group_by(Expense.category_id)\
                 .order_by(func.sum(Expense.amount).desc())\
                 .limit(top_n).all()
 
-            data = [{'name': r.name, 'value': float(r.total)} for r in results]
+            data = [{'name': category_cache.name(r.category_id), 'value': float(r.total)} for r in results]
 
         elif rank_by == 'location':
             # 按地点排行
@@ -438,21 +488,22 @@ def get_rank():
 
         else:  # day
             # 按日期排行
+            bucket = date_bucket(Expense.time, 'day').label('bucket')
             query = db.session.query(
-                func.date(Expense.time).label('date'),
+                bucket,
                 func.sum(Expense.amount).label('total')
-            ).filter_by(user_id=current_user_id)
+            ).filter(Expense.user_id == current_user_id)
 
             if start_date:
                 query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
             if end_date:
                 query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
 
-            results = query.group_by('date')\
+            results = query.group_by(bucket)\
                 .order_by(func.sum(Expense.amount).desc())\
                 .limit(top_n).all()
 
-            data = [{'name': str(r.date), 'value': float(r.total)} for r in results]
+            data = [{'name': bucket_label(r.bucket, 'day'), 'value': float(r.total)} for r in results]
 
         return jsonify({
             'rank_by': rank_by,
@@ -463,3 +514,121 @@ def get_rank():
         current_app.logger.error(f'获取排行榜失败: {e}')
         return jsonify({'error': '获取排行榜失败', 'message': str(e)}), 500
 
+
+
+@bp.route('/compare', methods=['GET'])
+@jwt_required()
+@conditional()
+@result_cache.cached
+def get_compare():
+    """同比 / 环比：基准区间与各偏移区间逐桶、逐类别对比
+
+    区间按整天计，默认本月 1 日至今天，偏移量默认 1m,1y（上月同期、去年同期）。
+    所有区间一次读取，返回各桶与各类别的差额及增长率（百分比）。
+    """
+    current_user_id = get_jwt_identity()
+
+    period = request.args.get('period', 'day')  # day, month, year
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if period not in ('day', 'month', 'year'):
+        return jsonify({'error': '对比分桶仅支持 day、month、year'}), 400
+    try:
+        today = datetime.now().date()
+        last_day = datetime.fromisoformat(end_date).date() if end_date else today
+        first_day = datetime.fromisoformat(start_date).date() if start_date else last_day.replace(day=1)
+        if first_day > last_day:
+            raise ValueError('start_date 不能晚于 end_date')
+        spans = comparison.periods(first_day, last_day, comparison.parse_offsets(request.args.get('offsets')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        stats = load_days(current_user_id, [(span[1], span[2]) for span in spans], use_rollup())
+        return jsonify(comparison.compare(stats, spans, period)), 200
+
+    except Exception as e:
+        current_app.logger.error(f'获取对比数据失败: {e}')
+        return jsonify({'error': '获取对比数据失败', 'message': str(e)}), 500
+
+
+DASHBOARD_WIDGETS = ('trend', 'category-share', 'rank', 'anomaly')
+
+
+@bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+@conditional()
+@result_cache.cached
+def get_dashboard():
+    """仪表盘批量接口：一次请求返回多个图表
+
+    trend、category-share、rank 共用一次每日汇总读取（关闭汇总表时为一次
+    原始记录 GROUP BY），anomaly 另读一次检测区间的金额列。
+    """
+    current_user_id = get_jwt_identity()
+
+    widgets = request.args.get('widgets', ','.join(DASHBOARD_WIDGETS)).split(',')
+    period = request.args.get('period', 'month')  # day, month, year
+    rank_by = request.args.get('rank_by', 'category')  # category, day
+    top_n = request.args.get('top_n', 10, type=int)
+    method = request.args.get('method', 'isolation_forest')  # isolation_forest, zscore
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    unknown = [name for name in widgets if name not in DASHBOARD_WIDGETS]
+    if unknown:
+        return jsonify({'error': f'不支持的图表: {", ".join(unknown)}'}), 400
+    if 'rank' in widgets and rank_by not in ('category', 'day'):
+        return jsonify({'error': '仪表盘排行仅支持 category、day'}), 400
+    try:
+        max_points, downsample_method = downsample.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        start_time, end_time = parse_range(start_date, end_date)
+        result = {}
+
+        if {'trend', 'category-share', 'rank'} & set(widgets):
+            if use_rollup():
+                stats = load_daily(current_user_id, start_time, end_time)
+            else:
+                stats = group_raw(current_user_id, start_time, end_time)
+
+            if 'trend' in widgets:
+                trend_stats = stats
+                if period not in ('year', 'month') and start_time is None:
+                    # 与 /trend 相同的默认区间；窗口从零点开始，按日期过滤即可
+                    first_day = window_start().date()
+                    trend_stats = [stat for stat in stats if stat.day >= first_day]
+                result['trend'] = trend_payload(
+                    period, trend_series(trend_stats, period), max_points, downsample_method
+                )
+
+            if 'category-share' in widgets:
+                data, total_amount = category_share(category_totals(stats))
+                result['category-share'] = {'data': data, 'total_amount': total_amount}
+
+            if 'rank' in widgets:
+                result['rank'] = {'rank_by': rank_by, 'data': rank(stats, rank_by, top_n)}
+
+        if 'anomaly' in widgets:
+            detected = detect(load_columns(current_user_id, window_start(start_time), end_time), method)
+            result['anomaly'] = detected if detected is not None else {
+                'error': '数据不足',
+                'message': '至少需要10条消费记录才能进行异常检测'
+            }
+
+        return jsonify({'widgets': result}), 200
+
+    except Exception as e:
+        current_app.logger.error(f'获取仪表盘数据失败: {e}')
+        return jsonify({'error': '获取仪表盘数据失败', 'message': str(e)}), 500
+
+
+@bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """获取分析结果缓存命中统计"""
+    return jsonify(result_cache.stats()), 200
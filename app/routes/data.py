@@ -1,14 +1,20 @@
 """数据导入/导出路由"""
 import os
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-import pandas as pd
+from sqlalchemy import func
 from app import db
-from app.models.expense import Expense
-from app.models.category import Category
 from app.models.import_record import ImportRecord
+from app.services.importer import REQUIRED_COLUMNS, read_error_preview, save_upload
+from app.services.jobs import import_queue, run_import, expire_stale_imports
+from app.services.exporter import export_query, count_rows, iter_csv, iter_xlsx, iter_parquet, iter_arrow
+from app.services.cache import conditional
+from app.services.serializers import columns, to_dicts
+from app.services.pagination import parse_args, keyset_page
+from app.services.search import parse_fields, build_query, serialize
+from app.models.expense import Expense
 
 bp = Blueprint('data', __name__)
 
@@ -19,12 +25,38 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
+def existing_import_response(import_record, message):
+    """返回已有导入记录的结果，不重复处理"""
+    finished = import_record.status not in ('pending', 'processing')
+    return jsonify({
+        'message': message,
+        'duplicate': True,
+        'import_record': import_record.to_dict(),
+        'errors': read_error_preview(import_record.error_report_path)
+    }), 200 if finished else 202
+
+
 @bp.route('/import', methods=['POST'])
 @jwt_required()
 def import_data():
     """导入消费数据（Excel/CSV）"""
     current_user_id = get_jwt_identity()
     
+    # 中断的任务先标记为失败，不再被当作已导入
+    expire_stale_imports(current_user_id)
+    
+    # 幂等键：客户端重试时直接返回首次请求的导入记录；失败的记录释放幂等键，允许重新导入
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        import_record = ImportRecord.query.filter_by(
+            user_id=current_user_id, idempotency_key=idempotency_key
+        ).first()
+        if import_record and import_record.status != 'failed':
+            return existing_import_response(import_record, '重复请求，返回已有导入结果')
+        if import_record:
+            import_record.idempotency_key = None
+            db.session.commit()
+    
     # 检查文件
     if 'file' not in request.files:
         return jsonify({'error': '未找到上传文件'}), 400
@@ -35,7 +67,7 @@ def import_data():
         return jsonify({'error': '未选择文件'}), 400
     
     if not allowed_file(file.filename):
-        return jsonify({'error': '不支持的文件格式，仅支持 CSV、XLSX、XLS'}), 400
+        return jsonify({'error': '不支持的文件格式，仅支持 CSV、XLSX、XLS、Parquet、Arrow'}), 400
     
     try:
         # 保存文件
@@ -43,104 +75,62 @@ def import_data():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{timestamp}_{filename}"
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        content_hash = save_upload(file, filepath)
+        error_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"errors_{timestamp}.json")
+        
+        # 相同内容的文件已导入过（未失败）时直接返回已有结果
+        previous = ImportRecord.query.filter(
+            ImportRecord.user_id == current_user_id,
+            ImportRecord.content_hash == content_hash,
+            ImportRecord.status != 'failed'
+        ).order_by(ImportRecord.created_at.desc()).first()
+        if previous:
+            os.remove(filepath)
+            return existing_import_response(previous, '该文件已导入，返回已有导入结果')
         
         # 创建导入记录
         import_record = ImportRecord(
             user_id=current_user_id,
             filename=filename,
-            status='processing'
+            status='pending',
+            content_hash=content_hash,
+            idempotency_key=idempotency_key
         )
         db.session.add(import_record)
         db.session.commit()
         
-        # 读取文件
-        if filename.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
+        if current_app.config['IMPORT_ASYNC']:
+            # 提交到后台队列，立即返回导入记录 ID
+            if not import_queue.submit(import_record.id, filepath, error_filepath):
+                import_record.status = 'failed'
+                import_record.error_message = '导入任务过多，请稍后重试'
+                db.session.commit()
+                os.remove(filepath)
+                return jsonify({'error': '导入任务过多，请稍后重试'}), 429
+            
+            return jsonify({
+                'message': '导入任务已提交',
+                'import_record': import_record.to_dict()
+            }), 202
         
-        # 验证必需列
-        required_columns = ['time', 'amount']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        # 同步导入（测试环境或关闭 IMPORT_ASYNC 时）
+        run_import(import_record, filepath, error_filepath)
         
-        if missing_columns:
-            import_record.status = 'failed'
-            db.session.commit()
+        if import_record.status == 'failed':
             return jsonify({
-                'error': f'缺少必需列: {", ".join(missing_columns)}',
-                'required_columns': required_columns,
-                'found_columns': list(df.columns)
+                'error': import_record.error_message,
+                'required_columns': REQUIRED_COLUMNS
             }), 400
         
-        # 处理数据
-        rows_total = len(df)
-        rows_success = 0
-        rows_failed = 0
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                # 解析时间
-                expense_time = pd.to_datetime(row['time'])
-                
-                # 解析金额
-                amount = float(row['amount'])
-                
-                # 查找或创建类别
-                category_id = None
-                if 'category' in row and pd.notna(row['category']):
-                    category_name = str(row['category'])
-                    category = Category.query.filter_by(name=category_name).first()
-                    if not category:
-                        category = Category(name=category_name)
-                        db.session.add(category)
-                        db.session.flush()
-                    category_id = category.id
-                
-                # 创建消费记录
-                expense = Expense(
-                    user_id=current_user_id,
-                    time=expense_time,
-                    amount=amount,
-                    category_id=category_id,
-                    location_text=row.get('location') if 'location' in row else None,
-                    note=row.get('note') if 'note' in row else None
-                )
-                
-                db.session.add(expense)
-                rows_success += 1
-                
-            except Exception as e:
-                rows_failed += 1
-                errors.append({
-                    'row': idx + 2,  # Excel 行号（从1开始，加上表头）
-                    'error': str(e)
-                })
-        
-        # 更新导入记录
-        import_record.rows_total = rows_total
-        import_record.rows_success = rows_success
-        import_record.rows_failed = rows_failed
-        import_record.status = 'success' if rows_failed == 0 else 'partial'
-        
-        # 保存错误报告
-        if errors:
-            error_filename = f"errors_{timestamp}.json"
-            error_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], error_filename)
-            import json
-            with open(error_filepath, 'w', encoding='utf-8') as f:
-                json.dump(errors, f, ensure_ascii=False, indent=2)
-            import_record.error_report_path = error_filepath
-        
-        db.session.commit()
-        
-        current_app.logger.info(f'数据导入完成: {rows_success}/{rows_total} 成功')
+        current_app.logger.info(
+            f'数据导入完成: {import_record.rows_success}/{import_record.rows_total} 成功, '
+            f'{import_record.rows_per_sec} 行/秒'
+        )
         
         return jsonify({
             'message': '导入完成',
             'import_record': import_record.to_dict(),
-            'errors': errors[:10] if errors else []  # 只返回前10个错误
+            'errors': read_error_preview(import_record.error_report_path)  # 只返回前10个错误
         }), 200
         
     except Exception as e:
@@ -149,65 +139,89 @@ def import_data():
         return jsonify({'error': '导入失败', 'message': str(e)}), 500
 
 
+@bp.route('/imports/<int:import_id>', methods=['GET'])
+@jwt_required()
+def get_import_status(import_id):
+    """查询导入任务进度"""
+    current_user_id = get_jwt_identity()
+    
+    import_record = ImportRecord.query.filter_by(id=import_id, user_id=current_user_id).first()
+    
+    if not import_record:
+        return jsonify({'error': '导入记录不存在'}), 404
+    
+    return jsonify({
+        'import_record': import_record.to_dict(),
+        'progress': import_record.progress(),
+        'rows_per_sec': import_record.rows_per_sec,
+        'eta_sec': import_record.eta_sec(),
+        'errors': read_error_preview(import_record.error_report_path)
+    }), 200
+
+
 @bp.route('/export', methods=['GET'])
 @jwt_required()
 def export_data():
-    """导出消费数据"""
+    """导出消费数据
+
+    CSV、Parquet、Arrow 边查询边发送；XLSX 需整个文件生成后才能发送，行数超过
+    EXPORT_XLSX_MAX_ROWS 时返回 400，请改用 CSV 或 Parquet。
+    """
     current_user_id = get_jwt_identity()
     
     # 获取查询参数
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     category_id = request.args.get('category_id')
-    format_type = request.args.get('format', 'csv')  # csv 或 xlsx
+    format_type = request.args.get('format', 'csv')  # csv、xlsx、parquet 或 arrow
     
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-        
-        if category_id:
-            query = query.filter_by(category_id=int(category_id))
-        
-        expenses = query.order_by(Expense.time.desc()).all()
-        
-        # 转换为 DataFrame
-        data = []
-        for expense in expenses:
-            data.append({
-                'id': expense.id,
-                'time': expense.time.isoformat(),
-                'amount': expense.amount,
-                'category': expense.category.name if expense.category else '',
-                'location': expense.location_text or '',
-                'note': expense.note or ''
-            })
-        
-        df = pd.DataFrame(data)
+        # 构建查询（列元组 + SQL JOIN 类别名称）
+        query = export_query(
+            current_user_id,
+            start_time=datetime.fromisoformat(start_date) if start_date else None,
+            end_time=datetime.fromisoformat(end_date) if end_date else None,
+            category_id=int(category_id) if category_id else None
+        )
         
-        # 生成文件
+        # 流式生成文件，边查询边发送
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         if format_type == 'xlsx':
+            max_rows = current_app.config['EXPORT_XLSX_MAX_ROWS']
+            if count_rows(query, max_rows) > max_rows:
+                return jsonify({
+                    'error': f'XLSX 导出最多 {max_rows} 行，请缩小时间范围或改用 CSV / Parquet 格式',
+                    'max_rows': max_rows
+                }), 400
             filename = f'expenses_{timestamp}.xlsx'
-            filepath = os.path.join(current_app.config['EXPORT_FOLDER'], filename)
-            df.to_excel(filepath, index=False, engine='openpyxl')
+            body = iter_xlsx(query)
+            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        elif format_type in ('parquet', 'arrow'):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return jsonify({'error': '服务器未安装 pyarrow，不支持 Parquet/Arrow 导出'}), 400
+            
+            if format_type == 'parquet':
+                filename = f'expenses_{timestamp}.parquet'
+                body = iter_parquet(query)
+                mimetype = 'application/vnd.apache.parquet'
+            else:
+                filename = f'expenses_{timestamp}.arrow'
+                body = iter_arrow(query)
+                mimetype = 'application/vnd.apache.arrow.stream'
         else:
             filename = f'expenses_{timestamp}.csv'
-            filepath = os.path.join(current_app.config['EXPORT_FOLDER'], filename)
-            df.to_csv(filepath, index=False, encoding='utf-8-sig')
+            body = iter_csv(query)
+            mimetype = 'text/csv; charset=utf-8'
         
-        current_app.logger.info(f'数据导出: {len(expenses)} 条记录')
+        current_app.logger.info(f'数据导出: user_id={current_user_id}, format={format_type}')
         
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=filename
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
         
     except Exception as e:
@@ -215,24 +229,68 @@ def export_data():
         return jsonify({'error': '导出失败', 'message': str(e)}), 500
 
 
+@bp.route('/expenses', methods=['GET'])
+@jwt_required()
+@conditional()
+def search_expenses():
+    """检索消费记录（按时间倒序，键集分页）
+
+    参数：q（备注 / 地点关键词）、start_date、end_date、category_id（含子类别）、
+    min_amount、max_amount、fields（输出字段，逗号分隔）、limit、cursor、with_total
+    """
+    current_user_id = get_jwt_identity()
+    
+    keyword = (request.args.get('q') or '').strip()
+    category_id = request.args.get('category_id', type=int)
+    min_amount = request.args.get('min_amount', type=float)
+    max_amount = request.args.get('max_amount', type=float)
+    
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit, cursor, with_total = parse_args(request.args)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        query = build_query(
+            current_user_id, fields, limit, keyword or None,
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None,
+            category_id, min_amount, max_amount, with_total
+        )
+        page = keyset_page(query, Expense.time, Expense.id, limit, cursor, with_total)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = {'expenses': serialize(page.pop('items'), fields)}
+    result.update(page)
+    return jsonify(result), 200
+
+
+def imports_version(user_id):
+    """导入记录的行数、最大 id 与最近更新时间"""
+    return db.session.query(
+        func.count(ImportRecord.id),
+        func.max(ImportRecord.id),
+        func.max(ImportRecord.updated_at)
+    ).filter(ImportRecord.user_id == user_id).one()
+
+
 @bp.route('/imports', methods=['GET'])
 @jwt_required()
+@conditional(imports_version)
 def get_import_records():
-    """获取导入记录列表"""
+    """获取导入记录列表（键集分页：limit、cursor，with_total=true 时附带总数）"""
     current_user_id = get_jwt_identity()
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    pagination = ImportRecord.query.filter_by(user_id=current_user_id)\
-        .order_by(ImportRecord.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        limit, cursor, with_total = parse_args(request.args)
+        page = keyset_page(
+            db.session.query(*columns(ImportRecord)).filter(ImportRecord.user_id == current_user_id),
+            ImportRecord.created_at, ImportRecord.id, limit, cursor, with_total
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'records': [record.to_dict() for record in pagination.items],
-        'total': pagination.total,
-        'page': page,
-        'per_page': per_page,
-        'pages': pagination.pages
-    }), 200
+    result = {'records': to_dicts(page.pop('items'))}
+    result.update(page)
+    return jsonify(result), 200
 
@@ -0,0 +1,30 @@
+"""数据变更推送路由"""
+from flask import Blueprint, Response, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services.events import change_broker
+
+bp = Blueprint('events', __name__)
+
+
+@bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream():
+    """订阅当前用户的数据变更（text/event-stream）
+
+    事件 change 的数据为 {topics, widgets, data_version}，客户端据此只
+    重新请求受影响的图表或列表。
+    """
+    current_user_id = get_jwt_identity()
+    
+    events = change_broker.subscribe(current_user_id)
+    if events is None:
+        return jsonify({'error': '连接数已满', 'message': '请稍后重试'}), 503
+    
+    response = Response(
+        stream_with_context(change_broker.stream(current_user_id, events)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 等反向代理的响应缓冲
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
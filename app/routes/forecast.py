@@ -2,78 +2,99 @@
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
 from app import db
-from app.models.expense import Expense
 from app.models.forecast import Forecast
-from sklearn.ensemble import IsolationForest
+from app.services.cache import result_cache, conditional
+from app.services.serializers import columns, to_dicts
+from app.services.pagination import parse_args, keyset_page
+from app.services.anomaly import detect, load_columns
+from app.services.rollup import daily_totals
+from app.services.widgets import window_start
+from app.services.forecasting import forecast, MIN_HISTORY, MODELS, MODEL_VERSIONS, Z_SCORES
+from app.services import downsample
 import numpy as np
 
 bp = Blueprint('forecast', __name__)
 
+# 参与拟合的历史天数
+HISTORY_DAYS = 90
+MAX_FORECAST_DAYS = 366
+
 
 @bp.route('/predict', methods=['GET'])
 @jwt_required()
 def predict():
-    """预测未来消费趋势（简化版）"""
+    """预测未来每日消费（周季节指数平滑，季节朴素法为基线）"""
     current_user_id = get_jwt_identity()
     
     period = request.args.get('period', 'month')  # day, month
     days = request.args.get('days', 30, type=int)
+    model = request.args.get('model', 'auto')  # auto, holt_winters, seasonal_naive
+    confidence = request.args.get('confidence', 95, type=int)  # 预测区间置信水平
+
+    if days is None or not 1 <= days <= MAX_FORECAST_DAYS:
+        return jsonify({'error': f'days 必须在 1~{MAX_FORECAST_DAYS} 之间'}), 400
+    if model not in MODELS:
+        return jsonify({'error': f'不支持的预测模型: {model}'}), 400
+    if confidence not in Z_SCORES:
+        return jsonify({'error': f'置信水平仅支持 {"、".join(map(str, Z_SCORES))}'}), 400
+    try:
+        max_points, method = downsample.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # 获取历史数据
-        start_date = datetime.now() - timedelta(days=90)  # 使用最近90天数据
-        expenses = Expense.query.filter(
-            Expense.user_id == current_user_id,
-            Expense.time >= start_date
-        ).order_by(Expense.time).all()
-        
-        if len(expenses) < 7:
+        # 最近90天的每日合计（不含尚未结束的今天），从第一天有消费的日期起按天补 0
+        today = datetime.now().date()
+        last_day = today - timedelta(days=1)
+        totals = daily_totals(
+            current_user_id, last_day - timedelta(days=HISTORY_DAYS - 1), last_day,
+            current_app.config['ANALYTICS_USE_ROLLUP']
+        )
+        first_day = min(totals) if totals else last_day
+        history = np.zeros((last_day - first_day).days + 1)
+        for day, total in totals.items():
+            history[(day - first_day).days] = total
+        
+        if not totals or len(history) < MIN_HISTORY:
             return jsonify({
                 'error': '历史数据不足',
-                'message': '至少需要7天的消费数据才能进行预测'
+                'message': f'至少需要{MIN_HISTORY}天的消费数据才能进行预测'
             }), 400
         
-        # 简单的移动平均预测
-        daily_amounts = {}
-        for expense in expenses:
-            date_key = expense.time.date()
-            daily_amounts[date_key] = daily_amounts.get(date_key, 0) + expense.amount
-        
-        # 计算平均值
-        avg_daily = sum(daily_amounts.values()) / len(daily_amounts)
-        
-        # 生成预测数据
-        predictions = []
-        current_date = datetime.now().date()
-        
-        for i in range(1, days + 1):
-            pred_date = current_date + timedelta(days=i)
-            # 简单预测：使用历史平均值加上一些随机波动
-            predicted_amount = avg_daily * (0.9 + np.random.random() * 0.2)
-            
-            predictions.append({
-                'date': pred_date.isoformat(),
-                'predicted_amount': round(predicted_amount, 2)
-            })
-            
-            # 保存到数据库
-            forecast = Forecast(
-                user_id=current_user_id,
-                period=period,
-                date=pred_date,
-                predicted_amount=predicted_amount,
-                model_version='simple_ma_v1'
-            )
-            db.session.add(forecast)
-        
+        # 第 1 步为今天，返回明天起的 days 天
+        result, errors = forecast(history, days + 1, model, confidence)
+        model_version = MODEL_VERSIONS[result.model]
+        
+        predictions = [{
+            'date': (today + timedelta(days=step)).isoformat(),
+            'predicted_amount': round(float(result.point[step]), 2),
+            'lower': round(float(result.lower[step]), 2),
+            'upper': round(float(result.upper[step]), 2)
+        } for step in range(1, days + 1)]
+        
+        # 保存到数据库
+        db.session.add_all(Forecast(
+            user_id=current_user_id,
+            period=period,
+            date=today + timedelta(days=step),
+            predicted_amount=float(result.point[step]),
+            model_version=model_version
+        ) for step in range(1, days + 1))
         db.session.commit()
         
+        # 全部预测都已保存，降采样只影响返回的序列
         return jsonify({
             'period': period,
-            'predictions': predictions,
-            'model': 'simple_moving_average',
-            'historical_avg': round(avg_daily, 2)
+            'predictions': downsample.downsample(predictions, max_points, method, y_key='predicted_amount'),
+            'model': result.model,
+            'model_version': model_version,
+            'params': result.params,
+            'confidence': confidence,
+            'mae': errors,
+            # 有消费日期的日均消费，补 0 的日期不计入
+            'historical_avg': round(sum(totals.values()) / len(totals), 2)
         }), 200
         
     except Exception as e:
@@ -84,6 +105,8 @@ def predict():
 
 @bp.route('/anomaly', methods=['GET'])
 @jwt_required()
+@conditional()
+@result_cache.cached
 def detect_anomaly():
     """检测异常消费"""
     current_user_id = get_jwt_identity()
@@ -93,103 +116,47 @@ def detect_anomaly():
     method = request.args.get('method', 'isolation_forest')  # isolation_forest, zscore
     
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        else:
-            query = query.filter(Expense.time >= datetime.now() - timedelta(days=30))
-        
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
+        start_time = window_start(datetime.fromisoformat(start_date) if start_date else None)
+        end_time = datetime.fromisoformat(end_date) if end_date else None
         
-        expenses = query.all()
+        result = detect(load_columns(current_user_id, start_time, end_time), method)
         
-        if len(expenses) < 10:
+        if result is None:
             return jsonify({
                 'error': '数据不足',
                 'message': '至少需要10条消费记录才能进行异常检测'
             }), 400
         
-        amounts = np.array([e.amount for e in expenses]).reshape(-1, 1)
-        
-        if method == 'isolation_forest':
-            # 使用 Isolation Forest
-            clf = IsolationForest(contamination=0.1, random_state=42)
-            predictions = clf.fit_predict(amounts)
-            
-            anomalies = []
-            for i, pred in enumerate(predictions):
-                if pred == -1:  # 异常点
-                    expense = expenses[i]
-                    anomalies.append({
-                        'id': expense.id,
-                        'time': expense.time.isoformat(),
-                        'amount': expense.amount,
-                        'category': expense.category.name if expense.category else None,
-                        'note': expense.note
-                    })
-        
-        else:  # zscore
-            # 使用 3σ 规则
-            mean = np.mean(amounts)
-            std = np.std(amounts)
-            threshold = 3
-            
-            anomalies = []
-            for expense in expenses:
-                z_score = abs((expense.amount - mean) / std) if std > 0 else 0
-                if z_score > threshold:
-                    anomalies.append({
-                        'id': expense.id,
-                        'time': expense.time.isoformat(),
-                        'amount': expense.amount,
-                        'z_score': round(float(z_score), 2),
-                        'category': expense.category.name if expense.category else None,
-                        'note': expense.note
-                    })
-        
-        # 计算统计信息
-        stats = {
-            'mean': round(float(np.mean(amounts)), 2),
-            'std': round(float(np.std(amounts)), 2),
-            'min': round(float(np.min(amounts)), 2),
-            'max': round(float(np.max(amounts)), 2),
-            'median': round(float(np.median(amounts)), 2)
-        }
-        
-        return jsonify({
-            'method': method,
-            'anomalies': anomalies,
-            'anomaly_count': len(anomalies),
-            'total_count': len(expenses),
-            'stats': stats
-        }), 200
+        return jsonify(result), 200
         
     except Exception as e:
         current_app.logger.error(f'异常检测失败: {e}')
         return jsonify({'error': '异常检测失败', 'message': str(e)}), 500
 
 
+def history_version(user_id):
+    """预测记录只追加，行数与最大 id 即可标识列表版本"""
+    return db.session.query(func.count(Forecast.id), func.max(Forecast.id))\
+        .filter(Forecast.user_id == user_id).one()
+
+
 @bp.route('/history', methods=['GET'])
 @jwt_required()
+@conditional(history_version)
 def get_forecast_history():
-    """获取历史预测记录"""
+    """获取历史预测记录（键集分页：limit、cursor，with_total=true 时附带总数）"""
     current_user_id = get_jwt_identity()
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    pagination = Forecast.query.filter_by(user_id=current_user_id)\
-        .order_by(Forecast.date.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        limit, cursor, with_total = parse_args(request.args)
+        page = keyset_page(
+            db.session.query(*columns(Forecast)).filter(Forecast.user_id == current_user_id),
+            Forecast.date, Forecast.id, limit, cursor, with_total
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'forecasts': [f.to_dict() for f in pagination.items],
-        'total': pagination.total,
-        'page': page,
-        'per_page': per_page,
-        'pages': pagination.pages
-    }), 200
+    result = {'forecasts': to_dicts(page.pop('items'))}
+    result.update(page)
+    return jsonify(result), 200
 
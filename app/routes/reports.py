@@ -6,8 +6,14 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.expense import Expense
 from app.models.report import Report
-from app.models.category import Category
+from app.services.buckets import date_bucket, bucket_label
+from app.services.categories import category_cache
+from app.services.snapshot import snapshot_store
+from app.services.cache import conditional
+from app.services.serializers import columns, to_dicts
+from app.services.pagination import parse_args, keyset_page
 from sqlalchemy import func
+import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # 使用非交互式后端
 import matplotlib.pyplot as plt
@@ -37,32 +43,36 @@ def generate_report():
     end_date = data.get('end_date')
     
     try:
-        # 构建查询
-        query = Expense.query.filter_by(user_id=current_user_id)
-        
-        if start_date:
-            query = query.filter(Expense.time >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Expense.time <= datetime.fromisoformat(end_date))
-        
-        expenses = query.all()
+        # 从列式快照读取区间内的记录
+        snapshot = snapshot_store.get(current_user_id)
+        expenses = snapshot.between(
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None
+        )
         
-        if not expenses:
+        if not len(expenses):
             return jsonify({'error': '没有数据可生成报告'}), 400
         
+        total_amount = float(expenses.amount.sum())
+        avg_amount = total_amount / len(expenses)
+        
         # 生成图表
         charts = []
         
-        # 1. 类别占比饼图
-        category_data = db.session.query(
-            Category.name,
-            func.sum(Expense.amount).label('total')
-        ).join(Expense).filter(Expense.user_id == current_user_id).group_by(Category.id).all()
+        # 1. 类别占比饼图（全部记录，按类别 id 合计）
+        categorized = snapshot.category >= 0
+        category_ids = snapshot.category[categorized]
+        category_counts = np.bincount(category_ids)
+        category_totals = np.bincount(category_ids, weights=snapshot.amount[categorized])
+        category_data = [
+            (category_cache.name(category_id), float(category_totals[category_id]))
+            for category_id in np.flatnonzero(category_counts)
+        ]
         
         if category_data:
             fig, ax = plt.subplots(figsize=(8, 6))
-            labels = [r.name for r in category_data]
-            sizes = [r.total for r in category_data]
+            labels = [name for name, _ in category_data]
+            sizes = [total for _, total in category_data]
             ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
             ax.set_title('消费类别占比')
             
@@ -72,14 +82,15 @@ def generate_report():
             charts.append(chart_path)
         
         # 2. 消费趋势折线图
+        bucket = date_bucket(Expense.time, 'day').label('bucket')
         daily_data = db.session.query(
-            func.date(Expense.time).label('date'),
+            bucket,
             func.sum(Expense.amount).label('total')
-        ).filter_by(user_id=current_user_id).group_by('date').order_by('date').all()
+        ).filter_by(user_id=current_user_id).group_by(bucket).order_by(bucket).all()
         
         if daily_data:
             fig, ax = plt.subplots(figsize=(10, 6))
-            dates = [r.date for r in daily_data]
+            dates = [bucket_label(r.bucket, 'day') for r in daily_data]
             amounts = [r.total for r in daily_data]
             ax.plot(dates, amounts, marker='o')
             ax.set_title('消费趋势')
@@ -113,9 +124,6 @@ def generate_report():
             c.setFont("Helvetica", 12)
             y_position = height - 100
             
-            total_amount = sum(e.amount for e in expenses)
-            avg_amount = total_amount / len(expenses)
-            
             c.drawString(50, y_position, f"Total Expenses: {len(expenses)}")
             y_position -= 20
             c.drawString(50, y_position, f"Total Amount: {total_amount:.2f}")
@@ -150,9 +158,6 @@ def generate_report():
             doc.add_heading(title, 0)
             
             # 统计信息
-            total_amount = sum(e.amount for e in expenses)
-            avg_amount = total_amount / len(expenses)
-            
             doc.add_paragraph(f'消费记录总数: {len(expenses)}')
             doc.add_paragraph(f'消费总金额: {total_amount:.2f}')
             doc.add_paragraph(f'平均消费金额: {avg_amount:.2f}')
@@ -213,24 +218,29 @@ def download_report(report_id):
     )
 
 
+def reports_version(user_id):
+    """报告只新增，行数与最大 id 即可标识列表版本"""
+    return db.session.query(func.count(Report.id), func.max(Report.id))\
+        .filter(Report.user_id == user_id).one()
+
+
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional(reports_version)
 def get_reports():
-    """获取报告列表"""
+    """获取报告列表（键集分页：limit、cursor，with_total=true 时附带总数）"""
     current_user_id = get_jwt_identity()
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    pagination = Report.query.filter_by(user_id=current_user_id)\
-        .order_by(Report.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        limit, cursor, with_total = parse_args(request.args)
+        page = keyset_page(
+            db.session.query(*columns(Report)).filter(Report.user_id == current_user_id),
+            Report.created_at, Report.id, limit, cursor, with_total
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
-        'reports': [r.to_dict() for r in pagination.items],
-        'total': pagination.total,
-        'page': page,
-        'per_page': per_page,
-        'pages': pagination.pages
-    }), 200
+    result = {'reports': to_dicts(page.pop('items'))}
+    result.update(page)
+    return jsonify(result), 200
 
@@ -4,12 +4,20 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.setting import Setting
+from app.services.timezones import load_timezone
+from app.services.cache import bump_data_version, conditional
 
 bp = Blueprint('settings', __name__)
 
 
+def settings_version(user_id):
+    """设置的最近更新时间"""
+    return db.session.query(Setting.updated_at).filter(Setting.user_id == user_id).scalar()
+
+
 @bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional(settings_version)
 def get_settings():
     """获取用户设置"""
     current_user_id = get_jwt_identity()
@@ -54,6 +62,15 @@ def update_settings():
         if 'refresh_interval_sec' in data:
             setting.refresh_interval_sec = int(data['refresh_interval_sec'])
         
+        if 'timezone' in data:
+            if data['timezone'] and load_timezone(data['timezone']) is None:
+                db.session.rollback()
+                return jsonify({'error': f'无效的时区: {data["timezone"]}'}), 400
+            if (data['timezone'] or None) != setting.timezone:
+                # 时区影响分析结果，递增数据版本使缓存失效
+                bump_data_version(db.session.connection(), current_user_id)
+            setting.timezone = data['timezone'] or None
+        
         db.session.commit()
         
         current_app.logger.info(f'用户设置已更新: user_id={current_user_id}')
@@ -0,0 +1 @@
+"""业务服务层"""
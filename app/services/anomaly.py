@@ -0,0 +1,94 @@
+"""异常消费检测
+
+在用户的列式快照上检测，只为判定为异常的记录回表读取备注；类别名称由
+类别缓存翻译，不构造 ORM 对象。
+"""
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from app import db
+from app.models.expense import Expense
+from app.services.categories import category_cache
+from app.services.snapshot import snapshot_store, to_datetime64
+
+# 异常检测所需的最少记录数
+MIN_RECORDS = 10
+
+# SQLite 单条语句的绑定参数上限较低，IN 查询分批进行
+_IN_CHUNK = 500
+
+
+def load_columns(user_id, start_time, end_time=None):
+    """读取检测区间内的消费记录（列式快照切片）"""
+    return snapshot_store.get(user_id).between(start_time, end_time)
+
+
+def _notes(ids):
+    """按 id 分批读取备注"""
+    notes = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        notes.update(db.session.query(Expense.id, Expense.note).filter(Expense.id.in_(chunk)).all())
+    return notes
+
+
+def _anomaly_rows(columns, indices, z_scores=None):
+    """组装异常记录，备注按 id 批量读取"""
+    ids = [int(columns.id[i]) for i in indices]
+    notes = _notes(ids)
+    times = to_datetime64(columns.time[indices]).tolist()
+
+    rows = []
+    for i, expense_id, time in zip(indices, ids, times):
+        item = {
+            'id': expense_id,
+            'time': time.isoformat(),
+            'amount': float(columns.amount[i])
+        }
+        if z_scores is not None:
+            item['z_score'] = round(float(z_scores[i]), 2)
+        category_id = int(columns.category[i])
+        item['category'] = category_cache.name(category_id) if category_id >= 0 else None
+        item['note'] = notes.get(expense_id)
+        rows.append(item)
+    return rows
+
+
+def detect(columns, method='isolation_forest'):
+    """检测异常消费，返回与 /api/forecast/anomaly 相同结构的字典
+
+    记录数少于 MIN_RECORDS 时返回 None。
+    """
+    if len(columns) < MIN_RECORDS:
+        return None
+
+    amounts = np.asarray(columns.amount, dtype=np.float64).reshape(-1, 1)
+
+    if method == 'isolation_forest':
+        # 使用 Isolation Forest
+        clf = IsolationForest(contamination=0.1, random_state=42)
+        predictions = clf.fit_predict(amounts)
+        anomalies = _anomaly_rows(columns, np.flatnonzero(predictions == -1))
+    else:  # zscore
+        # 使用 3σ 规则
+        mean = np.mean(amounts)
+        std = np.std(amounts)
+        threshold = 3
+        z_scores = np.abs((amounts[:, 0] - mean) / std) if std > 0 else np.zeros(len(columns))
+        anomalies = _anomaly_rows(columns, np.flatnonzero(z_scores > threshold), z_scores)
+
+    # 计算统计信息
+    stats = {
+        'mean': round(float(np.mean(amounts)), 2),
+        'std': round(float(np.std(amounts)), 2),
+        'min': round(float(np.min(amounts)), 2),
+        'max': round(float(np.max(amounts)), 2),
+        'median': round(float(np.median(amounts)), 2)
+    }
+
+    return {
+        'method': method,
+        'anomalies': anomalies,
+        'anomaly_count': len(anomalies),
+        'total_count': len(columns),
+        'stats': stats
+    }
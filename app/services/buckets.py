@@ -0,0 +1,73 @@
+"""按方言生成的时间分桶表达式
+
+date_bucket(column, unit) 在编译时按数据库方言输出 SQL：SQLite 使用
+strftime 直接得到文本标签，PostgreSQL 使用 date_trunc 得到截断后的时间戳。
+查询结果统一经 bucket_label 转为文本标签（'2024'、'2024-05'、
+'2024-05-01'、'2024-05-01 13:00'），分析接口在两种数据库上返回相同结果。
+"""
+from datetime import date, datetime
+from sqlalchemy import String
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+# 分桶单位 -> 标签格式（同时用作 SQLite strftime 格式）
+LABEL_FORMATS = {
+    'year': '%Y',
+    'month': '%Y-%m',
+    'day': '%Y-%m-%d',
+    'hour': '%Y-%m-%d %H:00',
+}
+
+
+class date_bucket(FunctionElement):
+    """时间分桶：date_bucket(Expense.time, 'month')"""
+    name = 'date_bucket'
+    inherit_cache = True
+    type = String()
+    # unit 参与语句缓存键，不同单位不会复用同一条编译结果
+    _traverse_internals = FunctionElement._traverse_internals + [
+        ('unit', InternalTraversal.dp_string)
+    ]
+
+    def __init__(self, column, unit):
+        if unit not in LABEL_FORMATS:
+            raise ValueError(f'不支持的分桶单位: {unit}')
+        self.unit = unit
+        super().__init__(column)
+
+
+@compiles(date_bucket)
+def _compile_default(element, compiler, **kw):
+    raise CompileError(f'数据库方言 {compiler.dialect.name} 不支持时间分桶')
+
+
+@compiles(date_bucket, 'sqlite')
+def _compile_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"strftime('{LABEL_FORMATS[element.unit]}', {column})"
+
+
+@compiles(date_bucket, 'postgresql')
+def _compile_postgresql(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"date_trunc('{element.unit}', {column})"
+
+
+def bucket_label(value, unit):
+    """把查询返回的分桶值转为文本标签"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.strftime(LABEL_FORMATS[unit])
+    return str(value)
+
+
+def bucket_date(value):
+    """把按 day 分桶的值转为 date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
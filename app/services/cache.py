@@ -0,0 +1,258 @@
+"""分析结果缓存
+
+缓存键由接口名、规范化后的查询参数和用户数据版本号组成。用户导入或修改
+消费记录时数据版本号递增，旧结果自然失效，无需逐个删除。支持两种后端：
+
+- memory：进程内 LRU，单进程部署使用
+- sqlite：本地 SQLite 文件，gunicorn 多 worker 共享
+
+两种后端都支持条目上限（LRU 淘汰）与 TTL 过期。同一组键也用于生成
+HTTP ETag（见 conditional），客户端数据未变时直接得到 304。
+
+未同时指定 start_date 与 end_date 的请求，默认区间相对于当天（最近 30 天、
+本月至今等），键中另带当天日期，跨天后即失效。
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from collections import OrderedDict
+from contextlib import closing
+from urllib.parse import urlencode
+from flask import request, jsonify, make_response, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func, update
+from app import db
+from app.models.user import User
+from app.services.responses import ENCODINGS
+
+
+def bump_data_version(connection, user_id, rewrite=False):
+    """递增用户数据版本号（与数据写入同一事务）
+
+    rewrite=True 表示修改或删除了已有记录（而非只追加），同时记录
+    rewrite_version，列式快照据此判断能否增量追加。
+    """
+    table = User.__table__
+    version = func.coalesce(table.c.data_version, 0) + 1
+    values = {'data_version': version}
+    if rewrite:
+        values['rewrite_version'] = version
+    connection.execute(update(table).where(table.c.id == user_id).values(**values))
+
+
+def bump_all_data_versions(connection):
+    """递增所有用户的数据版本号（全局数据变更时使用）"""
+    table = User.__table__
+    connection.execute(
+        update(table).values(data_version=func.coalesce(table.c.data_version, 0) + 1)
+    )
+
+
+def get_data_version(user_id):
+    """读取用户当前数据版本号"""
+    return db.session.query(User.data_version).filter(User.id == user_id).scalar() or 0
+
+
+def data_token(user_id):
+    """分析结果的版本标识：数据版本号，区间不完整时附带当天日期"""
+    version = get_data_version(user_id)
+    if request.args.get('start_date') and request.args.get('end_date'):
+        return version
+    return f'{version}@{date.today().isoformat()}'
+
+
+class MemoryBackend:
+    """进程内 LRU + TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """本地 SQLite 文件，多个 worker 进程共享"""
+
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=5, isolation_level=None))
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now)
+            )
+            conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache')
+
+
+class ResultCache:
+    """分析接口结果缓存"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['ANALYTICS_CACHE_BACKEND']
+        max_entries = app.config['ANALYTICS_CACHE_MAX_ENTRIES']
+        ttl = app.config['ANALYTICS_CACHE_TTL']
+        if backend == 'sqlite':
+            self.backend = SQLiteBackend(app.config['ANALYTICS_CACHE_PATH'], max_entries, ttl)
+        elif backend == 'memory':
+            self.backend = MemoryBackend(max_entries, ttl)
+        else:
+            self.backend = None
+
+    @staticmethod
+    def make_key(endpoint, user_id, version, args):
+        """接口名 + 用户 + 数据版本 + 排序后的查询参数"""
+        query = urlencode(sorted(args.items(multi=True)))
+        return f'{endpoint}|{user_id}|{version}|{query}'
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """命中统计（当前进程）"""
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None
+        }
+
+    def cached(self, view):
+        """视图装饰器：命中时直接返回缓存的 JSON，仅缓存 200 响应"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.backend is None:
+                return view(*args, **kwargs)
+
+            user_id = get_jwt_identity()
+            key = self.make_key(request.endpoint, user_id, data_token(user_id), request.args)
+            value = self.backend.get(key)
+            if value is not None:
+                self._count(True)
+                return jsonify(value), 200
+
+            self._count(False)
+            response = view(*args, **kwargs)
+            body, status = response if isinstance(response, tuple) else (response, 200)
+            if status == 200:
+                self.backend.set(key, body.get_json())
+            return response
+        return wrapper
+
+
+result_cache = ResultCache()
+
+
+def conditional(validator=None):
+    """视图装饰器：强 ETag 与条件 GET
+
+    ETag 由接口名、用户、版本标识与排序后的查询参数计算。版本标识默认为
+    data_token(user_id)，也可传入 validator(user_id) 返回其他廉价的版本标识
+    （如列表的行数与最大 id）。请求头 If-None-Match 命中时直接返回 304，
+    不执行视图。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            token = validator(user_id) if validator else data_token(user_id)
+            key = ResultCache.make_key(request.endpoint, user_id, token, request.args)
+            etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+            # 压缩后的响应 ETag 带编码后缀（见 responses.Compressor），304 原样返回命中的那个
+            candidates = [etag] + [f'{etag}-{encoding}' for encoding in ENCODINGS]
+            matched = next((c for c in candidates if request.if_none_match.contains(c)), None)
+            if matched is not None:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            # 浏览器每次都需向服务端验证
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
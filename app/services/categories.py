@@ -0,0 +1,289 @@
+"""类别解析服务
+
+进程内缓存 categories 表（id、name、parent_id）及每个类别的祖先链，供导入
+时把类别名称整列映射为 ID，以及分析接口把聚合结果中的 category_id 翻译回
+名称、汇总到各级父类，避免逐行查询和 JOIN。类别发生变更的事务提交前维护
+闭包表（category_closure）并递增类别版本号（category_version），提交或回滚后
+本进程的缓存自动失效；其他进程在每个应用上下文（每个请求）首次访问缓存时
+比较版本号，不一致则重新加载，遇到未知的类别 ID 时也重新加载一次：
+
+- 只新增类别（如导入时自动创建）：只为新类别写入闭包行，不影响其他用户的
+  分析结果，不递增数据版本号；
+- 修改已有类别的名称或父类、删除类别：全量重建闭包表，并递增所有用户的数据
+  版本号。
+"""
+import threading
+import pandas as pd
+from flask import g, has_app_context
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models.category import Category
+from app.models.category_closure import CategoryClosure
+from app.models.category_version import CategoryVersion
+from app.services.cache import bump_all_data_versions
+
+# SQLite 单条语句的绑定参数上限较低，IN 查询分批进行
+_IN_CHUNK = 500
+
+
+def ancestor_chains(parents):
+    """由 {id: parent_id} 计算每个类别的祖先链 [自身, 父类, 祖父类, ...]
+
+    父类不存在或出现环时截断。
+    """
+    chains = {}
+    for category_id in parents:
+        chain = [category_id]
+        parent_id = parents[category_id]
+        while parent_id is not None and parent_id in parents and parent_id not in chain:
+            chain.append(parent_id)
+            parent_id = parents[parent_id]
+        chains[category_id] = chain
+    return chains
+
+
+def category_version():
+    """数据库中的类别版本号"""
+    return db.session.query(CategoryVersion.version).filter(CategoryVersion.id == 1).scalar() or 0
+
+
+def bump_category_version(connection):
+    """在当前事务中递增类别版本号"""
+    table = CategoryVersion.__table__
+    result = connection.execute(update(table).where(table.c.id == 1).values(version=table.c.version + 1))
+    if not result.rowcount:
+        connection.execute(table.insert().values(id=1, version=1))
+
+
+def _once_per_context(flag):
+    """当前应用上下文内首次调用返回 True；没有应用上下文时总是返回 True"""
+    if not has_app_context():
+        return True
+    if g.get(flag):
+        return False
+    setattr(g, flag, True)
+    return True
+
+
+class CategoryCache:
+    """类别表的进程内只读快照"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_name = None
+        self._ancestors = None
+        self._version = None
+
+    def _load(self):
+        self._version = category_version()
+        by_id = {}
+        by_name = {}
+        rows = db.session.query(Category.id, Category.name, Category.parent_id)\
+            .order_by(Category.id).all()
+        for row in rows:
+            by_id[row.id] = (row.name, row.parent_id)
+            # 同名类别取 ID 最小的一个，与原先 filter_by(name).first() 一致
+            by_name.setdefault(row.name, row.id)
+        self._by_id = by_id
+        self._by_name = by_name
+        self._ancestors = ancestor_chains({
+            category_id: parent_id for category_id, (_, parent_id) in by_id.items()
+        })
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._by_id is None:
+                self._load()
+            elif _once_per_context('category_version_checked') and category_version() != self._version:
+                # 其他进程修改过类别
+                self._load()
+            return self._by_id, self._by_name, self._ancestors
+
+    def _reload_on_miss(self, category_id):
+        """缓存中没有该 ID 时重新加载（每个应用上下文最多一次），返回是否重新加载"""
+        if category_id is None or not _once_per_context('category_miss_reloaded'):
+            return False
+        with self._lock:
+            self._load()
+        return True
+
+    def invalidate(self):
+        """丢弃缓存，下次访问时重新加载"""
+        with self._lock:
+            self._by_id = None
+            self._by_name = None
+            self._ancestors = None
+
+    def name_to_id(self):
+        """名称 -> ID 映射"""
+        return self._ensure_loaded()[1]
+
+    def id_to_name(self):
+        """ID -> 名称 映射"""
+        by_id = self._ensure_loaded()[0]
+        return {category_id: name for category_id, (name, _) in by_id.items()}
+
+    def get(self, category_id):
+        """返回 (name, parent_id)，不存在时返回 None"""
+        entry = self._ensure_loaded()[0].get(category_id)
+        if entry is None and self._reload_on_miss(category_id):
+            entry = self._ensure_loaded()[0].get(category_id)
+        return entry
+
+    def name(self, category_id):
+        """返回类别名称，不存在时返回 None"""
+        entry = self.get(category_id)
+        return entry[0] if entry else None
+
+    def ancestors(self, category_id):
+        """返回祖先链 [自身, 父类, ...]，不存在时返回空列表"""
+        chain = self._ensure_loaded()[2].get(category_id)
+        if chain is None and self._reload_on_miss(category_id):
+            chain = self._ensure_loaded()[2].get(category_id)
+        return chain or []
+
+
+category_cache = CategoryCache()
+
+
+def _mark_dirty(session):
+    session.info['categories_dirty'] = True
+
+
+def _mark_inserted(session, category_ids):
+    _mark_dirty(session)
+    session.info.setdefault('categories_inserted', set()).update(category_ids)
+
+
+def _mark_restructured(session):
+    _mark_dirty(session)
+    session.info['categories_restructured'] = True
+
+
+def _select_ids(names):
+    """按名称批量查询已存在的类别 ID"""
+    found = {}
+    for start in range(0, len(names), _IN_CHUNK):
+        chunk = names[start:start + _IN_CHUNK]
+        rows = db.session.query(Category.id, Category.name)\
+            .filter(Category.name.in_(chunk))\
+            .order_by(Category.id).all()
+        for row in rows:
+            found.setdefault(row.name, row.id)
+    return found
+
+
+def resolve_category_ids(names):
+    """把类别名称列（pandas Series）映射为类别 ID 列
+
+    已知名称直接走缓存；缓存中没有的名称先回库确认一次（其他 worker 可能
+    已创建），仍不存在的一次性批量插入。空值映射为 None。
+    """
+    distinct = [name for name in names.dropna().unique()]
+    if not distinct:
+        return pd.Series([None] * len(names), index=names.index, dtype=object)
+
+    known = category_cache.name_to_id()
+    mapping = {name: known[name] for name in distinct if name in known}
+
+    unknown = [name for name in distinct if name not in mapping]
+    if unknown:
+        mapping.update(_select_ids(unknown))
+        new_names = [name for name in unknown if name not in mapping]
+        if new_names:
+            db.session.execute(
+                Category.__table__.insert(),
+                [{'name': name} for name in new_names]
+            )
+            created = _select_ids(new_names)
+            _mark_inserted(db.session, created.values())
+            mapping.update(created)
+
+    return names.map(mapping).astype(object).where(names.notna(), None)
+
+
+@event.listens_for(Category, 'after_insert')
+def _category_inserted(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        _mark_inserted(session, [target.id])
+
+
+@event.listens_for(Category, 'after_update')
+def _category_updated(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is None:
+        return
+    state = db.inspect(target)
+    if state.attrs.parent_id.history.has_changes() or state.attrs.name.history.has_changes():
+        _mark_restructured(session)
+    else:
+        _mark_dirty(session)
+
+
+@event.listens_for(Category, 'after_delete')
+def _category_deleted(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        _mark_restructured(session)
+
+
+def rebuild_closure(connection):
+    """按当前 categories 表全量重建闭包表"""
+    table = CategoryClosure.__table__
+    parents = dict(connection.execute(
+        db.select(Category.__table__.c.id, Category.__table__.c.parent_id)
+    ).all())
+    connection.execute(table.delete())
+    rows = [
+        {'ancestor_id': ancestor_id, 'descendant_id': category_id, 'depth': depth}
+        for category_id, chain in ancestor_chains(parents).items()
+        for depth, ancestor_id in enumerate(chain)
+    ]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def insert_closure(connection, category_ids):
+    """为新增的类别写入闭包行（自身及全部祖先），已有类别的闭包不变"""
+    table = CategoryClosure.__table__
+    parents = dict(connection.execute(
+        db.select(Category.__table__.c.id, Category.__table__.c.parent_id)
+    ).all())
+    chains = ancestor_chains(parents)
+    rows = [
+        {'ancestor_id': ancestor_id, 'descendant_id': category_id, 'depth': depth}
+        for category_id in sorted(category_ids) if category_id in chains
+        for depth, ancestor_id in enumerate(chains[category_id])
+    ]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+@event.listens_for(Session, 'before_commit')
+def _update_closure_before_commit(session):
+    # 先刷新挂起的 ORM 变更，类别增删改事件才会设置标记
+    session.flush()
+    restructured = session.info.pop('categories_restructured', False)
+    inserted = session.info.pop('categories_inserted', None)
+    if session.info.get('categories_dirty'):
+        bump_category_version(session.connection())
+    if restructured:
+        connection = session.connection()
+        rebuild_closure(connection)
+        # 类别为全局数据，名称或层级变化影响所有用户的分析结果
+        bump_all_data_versions(connection)
+    elif inserted:
+        # 新类别尚无其他用户的消费记录；写入记录的用户已由写入方递增版本号
+        insert_closure(session.connection(), inserted)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def _invalidate_on_transaction_end(session, *args):
+    session.info.pop('categories_restructured', None)
+    session.info.pop('categories_inserted', None)
+    if session.info.pop('categories_dirty', False):
+        category_cache.invalidate()
@@ -0,0 +1,141 @@
+"""同比 / 环比
+
+基准区间 [start, end]（整天）按偏移量向前平移得到对比区间，例如 1m 为上月
+同期、1y 为去年同期、7d 为上周同期。全部区间的每日汇总一次读取，每天按偏移
+量映射回基准区间的日期后再分桶，各对比区间与基准逐桶、逐类别对齐。
+"""
+import calendar
+import re
+from datetime import timedelta
+from app.services.categories import category_cache
+
+OFFSET_PATTERN = re.compile(r'^(\d{1,3})([dwmy])$')
+DEFAULT_OFFSETS = '1m,1y'
+MAX_OFFSETS = 4
+
+
+def parse_offsets(value):
+    """'1m,1y' -> [('1m', 1, 'm'), ('1y', 1, 'y')]；格式不对时抛出 ValueError"""
+    offsets = []
+    for name in (value or DEFAULT_OFFSETS).split(','):
+        name = name.strip().lower()
+        match = OFFSET_PATTERN.match(name)
+        if not match or int(match.group(1)) == 0:
+            raise ValueError(f'无效的偏移量: {name}（格式如 7d、2w、1m、1y）')
+        if name not in (offset[0] for offset in offsets):
+            offsets.append((name, int(match.group(1)), match.group(2)))
+    if len(offsets) > MAX_OFFSETS:
+        raise ValueError(f'偏移量最多 {MAX_OFFSETS} 个')
+    return offsets
+
+
+def _month_days(year, month):
+    return calendar.monthrange(year, month)[1]
+
+
+def shift(day, count, unit, month_end=False):
+    """日期平移 count 个单位（可为负）
+
+    按月、年平移时日期超出目标月的天数则截到目标月的最后一天；month_end 为
+    True 且 day 是所在月的最后一天时，结果取目标月的最后一天（4-30 的上月同期
+    为 3-31），整月区间平移后仍是整月。
+    """
+    if unit == 'd':
+        return day + timedelta(days=count)
+    if unit == 'w':
+        return day + timedelta(weeks=count)
+    months = count * (12 if unit == 'y' else 1)
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    month += 1
+    last = _month_days(year, month)
+    if month_end and day.day == _month_days(day.year, day.month):
+        return day.replace(year=year, month=month, day=last)
+    return day.replace(year=year, month=month, day=min(day.day, last))
+
+
+def periods(first_day, last_day, offsets):
+    """基准与各对比区间 [(名称, first_day, last_day, count, unit)]，基准名称为 'base'"""
+    result = [('base', first_day, last_day, 0, 'd')]
+    for name, count, unit in offsets:
+        result.append((
+            name, shift(first_day, -count, unit), shift(last_day, -count, unit, month_end=True), count, unit
+        ))
+    return result
+
+
+def _bucket_key(day, period):
+    if period == 'year':
+        return str(day.year)
+    if period == 'month':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+
+def _change(current, previous):
+    """差额与增长率（百分比）；对比值为 0 时增长率为 None"""
+    delta = current - previous
+    return {
+        'amount': round(previous, 2),
+        'delta': round(delta, 2),
+        'growth_rate': round(delta / previous * 100, 2) if previous else None
+    }
+
+
+def compare(stats, spans, period='day'):
+    """按桶与类别对比
+
+    stats 为覆盖全部区间的 DayStat 列表，spans 为 periods() 的结果。
+    桶与类别取基准和各对比区间的并集，金额缺失记为 0。
+    """
+    names = [span[0] for span in spans]
+    base_first, base_last = spans[0][1], spans[0][2]
+    totals = {name: [0.0, 0] for name in names}
+    buckets = {}
+    categories = {}
+
+    for stat in stats:
+        category = category_cache.name(stat.category_id) if stat.category_id is not None else None
+        for name, first_day, last_day, count, unit in spans:
+            if not first_day <= stat.day <= last_day:
+                continue
+            totals[name][0] += stat.total
+            totals[name][1] += stat.count
+
+            # 月末平移后可能落在基准区间外（如 3-31 的上月同期为 2-28），截到区间内
+            aligned = min(max(shift(stat.day, count, unit), base_first), base_last)
+            key = _bucket_key(aligned, period)
+            bucket = buckets.setdefault(key, dict.fromkeys(names, 0.0))
+            bucket[name] += stat.total
+            if category is not None:
+                entry = categories.setdefault(category, {n: [0.0, 0] for n in names})
+                entry[name][0] += stat.total
+                entry[name][1] += stat.count
+
+    comparisons = names[1:]
+    return {
+        'period': period,
+        'base': {
+            'start_date': spans[0][1].isoformat(),
+            'end_date': spans[0][2].isoformat(),
+            'amount': round(totals['base'][0], 2),
+            'count': totals['base'][1]
+        },
+        'comparisons': [dict(
+            offset=name,
+            start_date=first_day.isoformat(),
+            end_date=last_day.isoformat(),
+            count=totals[name][1],
+            **_change(totals['base'][0], totals[name][0])
+        ) for name, first_day, last_day, _, _ in spans[1:]],
+        'buckets': [{
+            'date': key,
+            'amount': round(bucket['base'], 2),
+            'comparisons': [dict(offset=name, **_change(bucket['base'], bucket[name])) for name in comparisons]
+        } for key, bucket in sorted(buckets.items())],
+        'categories': [{
+            'category': category,
+            'amount': round(entry['base'][0], 2),
+            'count': entry['base'][1],
+            'comparisons': [dict(offset=name, **_change(entry['base'][0], entry[name][0])) for name in comparisons]
+        } for category, entry in sorted(categories.items(), key=lambda item: item[1]['base'][0], reverse=True)]
+    }
@@ -0,0 +1,107 @@
+"""时间序列降采样
+
+长区间按日汇总的序列可达数千个点，前端绘制缓慢。在聚合后的序列上降采样到
+max_points 个点以内，保留首尾点与尖峰：
+
+- lttb：Largest-Triangle-Three-Buckets，中间点均分为 max_points - 2 个桶，
+  每桶选取与前一选中点、下一桶均值构成三角形面积最大的点，曲线形状最接近原序列；
+- minmax：每桶同时保留最小值与最大值，谷值也不会丢失。
+
+横坐标取日期标签对应的时间（按日、月或年），缺少消费的日期不会被压缩。
+"""
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+# 首尾两点加至少一个 minmax 桶（最小值与最大值）
+MIN_POINTS = 4
+MAX_POINTS = 10000
+
+
+def parse_args(args):
+    """读取 max_points / downsample 参数，返回 (max_points, method)
+
+    未指定 max_points 时返回 (None, method)；参数不合法时抛出 ValueError。
+    """
+    method = args.get('downsample', 'lttb')
+    if method not in METHODS:
+        raise ValueError(f'不支持的降采样方法: {method}')
+    if args.get('max_points') is None:
+        return None, method
+    max_points = args.get('max_points', type=int)
+    if max_points is None or not MIN_POINTS <= max_points <= MAX_POINTS:
+        raise ValueError(f'max_points 必须在 {MIN_POINTS}~{MAX_POINTS} 之间')
+    return max_points, method
+
+
+def _bucket_edges(length, buckets):
+    """把下标 1..length-2 均分为 buckets 个桶，返回 buckets + 1 个边界"""
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x, y, max_points):
+    """LTTB 选点，返回升序下标"""
+    length = len(y)
+    if length <= max_points:
+        return np.arange(length)
+
+    buckets = max_points - 2
+    edges = _bucket_edges(length, buckets)
+
+    # 各桶均值（下一桶的代表点），末桶之后为最后一个点
+    x_sum = np.add.reduceat(x[:-1], edges[:-1])
+    y_sum = np.add.reduceat(y[:-1], edges[:-1])
+    sizes = np.diff(edges)
+    x_avg = np.append(x_sum / sizes, x[-1])[1:]
+    y_avg = np.append(y_sum / sizes, y[-1])[1:]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    a = 0
+    for i in range(buckets):
+        lo, hi = edges[i], edges[i + 1]
+        # 三角形 (a, j, 下一桶均值) 面积的两倍
+        area = np.abs(
+            (x[a] - x_avg[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (y_avg[i] - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """每桶保留最小值与最大值，返回升序下标"""
+    length = len(y)
+    if length <= max_points:
+        return np.arange(length)
+
+    buckets = (max_points - 2) // 2
+    edges = _bucket_edges(length, buckets)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+    values = y[1:-1]
+
+    # 按 (桶, 金额) 排序后，每桶的第一个与最后一个即最小值与最大值
+    order = np.lexsort((values, bucket))
+    starts = edges[:-1] - 1
+    ends = edges[1:] - 2
+    picked = np.concatenate(([0], order[starts] + 1, order[ends] + 1, [length - 1]))
+    return np.unique(picked)
+
+
+def time_axis(labels):
+    """日期标签（YYYY-MM-DD / YYYY-MM / YYYY）-> 数值横坐标"""
+    return np.array(labels).astype('datetime64').astype(np.int64).astype(np.float64)
+
+
+def downsample(points, max_points, method='lttb', x_key='date', y_key='amount'):
+    """对 [{'date', 'amount', ...}] 降采样，点数不超过 max_points 时原样返回"""
+    if not max_points or len(points) <= max_points:
+        return points
+
+    y = np.fromiter((point[y_key] for point in points), dtype=np.float64, count=len(points))
+    if method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        indices = lttb_indices(time_axis([point[x_key] for point in points]), y, max_points)
+    return [points[i] for i in indices]
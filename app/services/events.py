@@ -0,0 +1,197 @@
+"""数据变更推送（Server-Sent Events）
+
+每个进程一个后台轮询线程，每 SSE_POLL_INTERVAL 秒用几条批量查询读取所有
+在线用户的版本标识（数据版本号、导入记录、预测记录、报告），与上一次比较
+后把变化推送给该用户的订阅队列。查询次数与连接数无关，多 worker 部署时
+各进程独立轮询数据库，无需外部消息队列。
+
+长连接大多处于空闲状态，需要数千连接时以 gevent worker 运行（见 README），
+线程与队列在 monkey patch 后即为协程。
+"""
+import json
+import queue
+import threading
+import time
+from sqlalchemy import func
+from app import db
+from app.models.user import User
+from app.models.import_record import ImportRecord
+from app.models.forecast import Forecast
+from app.models.report import Report
+
+# 数据版本号变化时受影响的图表
+DATA_WIDGETS = [
+    'trend', 'category-share', 'amount-hist', 'heatmap', 'time-radar',
+    'behavior-tree', 'level-scatter', 'rank', 'anomaly'
+]
+
+# 版本标识 -> 受影响的图表 / 列表
+TOPICS = {
+    'data': DATA_WIDGETS,
+    'imports': ['imports'],
+    'forecasts': ['forecast-history'],
+    'reports': ['reports'],
+}
+
+# 每条批量查询最多包含的用户数
+QUERY_BATCH = 500
+
+# 断线后客户端重连的等待时间（毫秒）
+RETRY_MS = 5000
+
+# 单个订阅队列最多积压的事件数，客户端过慢时丢弃（下一次变化仍会推送）
+QUEUE_SIZE = 16
+
+
+def load_states(user_ids):
+    """批量读取用户的版本标识，返回 {user_id: {topic: token}}"""
+    states = {}
+    for offset in range(0, len(user_ids), QUERY_BATCH):
+        batch = user_ids[offset:offset + QUERY_BATCH]
+        for user_id, version in db.session.query(User.id, User.data_version).filter(User.id.in_(batch)):
+            states[user_id] = {'data': version or 0, 'imports': None, 'forecasts': None, 'reports': None}
+
+        for user_id, count, updated in db.session.query(
+            ImportRecord.user_id, func.count(ImportRecord.id), func.max(ImportRecord.updated_at)
+        ).filter(ImportRecord.user_id.in_(batch)).group_by(ImportRecord.user_id):
+            if user_id in states:
+                states[user_id]['imports'] = f'{count}|{updated}'
+
+        for model, topic in ((Forecast, 'forecasts'), (Report, 'reports')):
+            for user_id, max_id in db.session.query(
+                model.user_id, func.max(model.id)
+            ).filter(model.user_id.in_(batch)).group_by(model.user_id):
+                if user_id in states:
+                    states[user_id][topic] = max_id
+    return states
+
+
+def format_event(event, data):
+    """编码为一条 SSE 消息"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+class ChangeBroker:
+    """订阅管理与后台轮询"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set(queue.Queue)
+        self._states = {}  # user_id -> 上次推送时的版本标识
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config['SSE_POLL_INTERVAL']
+        self.heartbeat = app.config['SSE_HEARTBEAT']
+        self.max_subscribers = app.config['SSE_MAX_SUBSCRIBERS']
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id):
+        """登记订阅并返回事件队列；连接数已满时返回 None
+
+        需在应用上下文中调用：首次订阅的用户立即读取一次版本标识作为基线，
+        避免订阅后到下一次轮询之间的变化被当作基线而漏推。
+        """
+        user_id = int(user_id)
+        with self._lock:
+            if sum(len(queues) for queues in self._subscribers.values()) >= self.max_subscribers:
+                return None
+            known = user_id in self._states
+
+        state = None
+        if not known:
+            state = load_states([user_id]).get(user_id)
+        # 长连接期间不占用连接池中的数据库连接
+        db.session.remove()
+
+        events = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            if state is not None and user_id not in self._states:
+                self._states[user_id] = state
+            self._subscribers.setdefault(user_id, set()).add(events)
+            self._ensure_thread()
+        return events
+
+    def unsubscribe(self, user_id, events):
+        user_id = int(user_id)
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(events)
+            if not queues:
+                del self._subscribers[user_id]
+                self._states.pop(user_id, None)
+
+    def publish(self, user_id, event, data):
+        """向用户的全部订阅推送事件"""
+        message = format_event(event, data)
+        with self._lock:
+            queues = list(self._subscribers.get(int(user_id), ()))
+        for events in queues:
+            try:
+                events.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='sse-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                user_ids = list(self._subscribers)
+            if not user_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    states = load_states(user_ids)
+                    db.session.remove()
+                self._dispatch(states)
+            except Exception as e:
+                self.app.logger.error(f'数据变更轮询失败: {e}')
+
+    def _dispatch(self, states):
+        """与上次的版本标识比较，推送有变化的用户"""
+        for user_id, state in states.items():
+            with self._lock:
+                if user_id not in self._subscribers:
+                    continue
+                previous = self._states.get(user_id)
+                self._states[user_id] = state
+            if previous is None:
+                continue
+
+            changed = [topic for topic in TOPICS if state[topic] != previous.get(topic)]
+            if changed:
+                widgets = [widget for topic in changed for widget in TOPICS[topic]]
+                self.publish(user_id, 'change', {
+                    'topics': changed,
+                    'widgets': widgets,
+                    'data_version': state['data']
+                })
+
+    def stream(self, user_id, events):
+        """SSE 响应体生成器：推送事件，空闲时发送心跳注释以检测断开"""
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                try:
+                    yield events.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ': ping\n\n'
+        finally:
+            self.unsubscribe(user_id, events)
+
+
+change_broker = ChangeBroker()
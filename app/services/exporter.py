@@ -0,0 +1,201 @@
+"""消费数据导出服务
+
+直接在服务端游标（yield_per）上逐批读取列元组，类别名称在 SQL 中 JOIN
+得到，不构造 ORM 对象，也不在 EXPORT_FOLDER 落盘，内存占用与行数无关。
+Parquet / Arrow IPC 为列式格式，每批写成一个 row group / record batch。
+
+XLSX 是 zip 包，中央目录在文件末尾、各成员需先写完才能定长，openpyxl 只能
+在整个工作簿写入临时文件后再发送：首字节要等全部行写完，不满足流式导出，
+因此行数限制为 EXPORT_XLSX_MAX_ROWS，大量数据请用 CSV / Parquet。
+"""
+import csv
+import io
+import tempfile
+from sqlalchemy import func, select
+from app import db
+from app.models.expense import Expense
+from app.models.category import Category
+
+EXPORT_COLUMNS = ['id', 'time', 'amount', 'category', 'location', 'note']
+
+# 每批从游标读取的行数
+YIELD_PER = 2000
+
+# 列式格式每个 row group / record batch 的行数
+COLUMNAR_BATCH_SIZE = 65536
+
+
+def export_query(user_id, start_time=None, end_time=None, category_id=None):
+    """构建导出查询，返回按时间倒序的列元组 SELECT"""
+    query = select(
+        Expense.id,
+        Expense.time,
+        Expense.amount,
+        Category.name.label('category'),
+        Expense.location_text.label('location'),
+        Expense.note
+    ).outerjoin(Category, Expense.category_id == Category.id)\
+        .where(Expense.user_id == user_id)
+
+    if start_time:
+        query = query.where(Expense.time >= start_time)
+    if end_time:
+        query = query.where(Expense.time <= end_time)
+    if category_id:
+        query = query.where(Expense.category_id == category_id)
+
+    return query.order_by(Expense.time.desc())
+
+
+def count_rows(query, limit):
+    """查询结果的行数，最多数到 limit + 1（只用于判断是否超过 limit）"""
+    bounded = query.order_by(None).with_only_columns(Expense.id).limit(limit + 1).subquery()
+    return db.session.execute(select(func.count()).select_from(bounded)).scalar()
+
+
+def iter_partitions(query, size=YIELD_PER):
+    """以 yield_per 分批迭代查询结果"""
+    result = db.session.execute(query.execution_options(yield_per=size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _export_row(row):
+    return (
+        row.id,
+        row.time.isoformat(),
+        row.amount,
+        row.category or '',
+        row.location or '',
+        row.note or ''
+    )
+
+
+def iter_csv(query):
+    """逐批生成 CSV 文本（首块带 BOM，与 utf-8-sig 一致）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+
+    for rows in iter_partitions(query):
+        writer.writerows(_export_row(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_xlsx(query, block_size=64 * 1024):
+    """openpyxl 只写模式生成 XLSX，写入匿名临时文件后分块读出
+
+    整个工作簿写完后才产生第一个字节，调用方需先用 count_rows 限制行数。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(EXPORT_COLUMNS)
+    for rows in iter_partitions(query):
+        for row in rows:
+            sheet.append(_export_row(row))
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        yield from iter(lambda: f.read(block_size), b'')
+
+
+class _StreamSink:
+    """供 pyarrow 写入的只追加输出流，写入的字节由生成器取走后即释放"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('time', pa.timestamp('us')),
+        ('amount', pa.float64()),
+        ('category', pa.string()),
+        ('location', pa.string()),
+        ('note', pa.string()),
+    ])
+
+
+def _arrow_batch(rows, schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def iter_parquet(query):
+    """生成 Parquet 文件，每批查询结果写为一个 row group"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='zstd')
+    try:
+        for rows in iter_partitions(query, COLUMNAR_BATCH_SIZE):
+            writer.write_batch(_arrow_batch(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(query):
+    """生成 Arrow IPC 流格式，每批查询结果写为一个 record batch"""
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    sink = _StreamSink()
+    writer = pa.ipc.new_stream(
+        pa.PythonFile(sink, mode='w'), schema,
+        options=pa.ipc.IpcWriteOptions(compression='zstd')
+    )
+    try:
+        for rows in iter_partitions(query, COLUMNAR_BATCH_SIZE):
+            writer.write_batch(_arrow_batch(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,192 @@
+"""空间网格索引
+
+经纬度按 Web Mercator 投影换算为 MAX_LEVEL 级瓦片坐标，再交错 x、y 的
+二进制位得到 Morton 编码，存入 expenses.geo_cell 并与 user_id 建联合索引。
+Morton 编码的性质：
+
+- 任一较粗级别的网格是 geo_cell 上一段连续区间，视口范围可以换算为少量
+  区间查询，走索引扫描；
+- geo_cell 整除 4 ** (MAX_LEVEL - level) 即为 level 级网格编号，按级别
+  聚合只需一次 GROUP BY。
+"""
+import math
+import numpy as np
+from sqlalchemy import event, func, or_, and_
+from app import db
+from app.models.expense import Expense
+
+# 存储精度：20 级瓦片约 38 米（赤道）
+MAX_LEVEL = 20
+
+# 每个地图瓦片再细分为 2 ** CELL_DETAIL 行列的网格
+CELL_DETAIL = 5
+
+# Web Mercator 可表示的纬度范围
+MAX_LAT = 85.05112878
+
+# 视口换算为 geo_cell 区间时最多使用的粗网格数
+MAX_RANGES = 16
+
+# 不指定视口时允许的最大缩放级别（全局视图）
+MAX_ZOOM_WITHOUT_BBOX = 6
+
+# 单次返回的网格数上限，超出时保留笔数最多的网格
+MAX_CELLS = 5000
+
+
+def _tile_xy(lat, lon, level):
+    """经纬度 -> level 级瓦片坐标（numpy 数组）"""
+    n = 1 << level
+    lat = np.clip(np.asarray(lat, dtype='float64'), -MAX_LAT, MAX_LAT)
+    lon = np.asarray(lon, dtype='float64')
+    x = (lon + 180.0) / 360.0 * n
+    rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(rad) + 1.0 / np.cos(rad)) / math.pi) / 2.0 * n
+    x = np.clip(np.floor(x), 0, n - 1).astype('int64')
+    y = np.clip(np.floor(y), 0, n - 1).astype('int64')
+    return x, y
+
+
+def _spread(v):
+    """把 32 位整数的各位间隔插入 0（Morton 编码的一半）"""
+    v = v & 0xFFFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+
+def cell_ids(lat, lon):
+    """整列计算 geo_cell；经纬度缺失或越界的位置为 None"""
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    cells = np.zeros(len(lat), dtype='int64')
+    if valid.any():
+        x, y = _tile_xy(lat[valid], lon[valid], MAX_LEVEL)
+        cells[valid] = _spread(x) | (_spread(y) << 1)
+    return [int(cell) if ok else None for cell, ok in zip(cells, valid)]
+
+
+def cell_id(lat, lon):
+    """单个坐标的 geo_cell"""
+    if lat is None or lon is None:
+        return None
+    return cell_ids([lat], [lon])[0]
+
+
+def _ranges(west, south, east, north):
+    """把视口换算为 geo_cell 的若干连续区间 [lo, hi)
+
+    从 MAX_LEVEL 逐级变粗，直到覆盖视口的网格数不超过 MAX_RANGES。
+    """
+    level = MAX_LEVEL
+    while True:
+        # 纬度越大瓦片 y 越小
+        xs, ys = _tile_xy([north, south], [west, east], level)
+        x0, x1 = int(xs[0]), int(xs[1])
+        y0, y1 = int(ys[0]), int(ys[1])
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_RANGES or level == 0:
+            break
+        level -= 1
+
+    shift = 2 * (MAX_LEVEL - level)
+    codes = sorted(
+        int(_spread(np.int64(x)) | (_spread(np.int64(y)) << 1))
+        for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+    )
+    ranges = []
+    for code in codes:
+        lo, hi = code << shift, (code + 1) << shift
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1][1] = hi
+        else:
+            ranges.append([lo, hi])
+    return ranges
+
+
+def parse_bbox(value):
+    """解析 west,south,east,north；跨越 180° 经线时拆为两个视口"""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError(f'无效的视口范围: {value}')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError(f'无效的视口范围: {value}')
+    if west > east:
+        return [(west, south, 180.0, north), (-180.0, south, east, north)]
+    return [(west, south, east, north)]
+
+
+def aggregate(user_id, zoom, bboxes=None, start_time=None, end_time=None, limit=MAX_CELLS):
+    """按地图缩放级别聚合视口内的消费
+
+    网格级别为 zoom + CELL_DETAIL（不超过 MAX_LEVEL），返回 (网格级别, 网格列表,
+    是否截断)。网格列表为非空网格的笔数、金额与坐标均值，按笔数降序，最多
+    limit 个。
+    """
+    level = min(zoom + CELL_DETAIL, MAX_LEVEL)
+    divisor = 4 ** (MAX_LEVEL - level)
+    cell = (Expense.geo_cell // divisor).label('cell')
+
+    query = db.session.query(
+        cell,
+        func.count(Expense.id).label('count'),
+        func.sum(Expense.amount).label('amount'),
+        func.avg(Expense.location_lat).label('lat'),
+        func.avg(Expense.location_lon).label('lon')
+    ).filter(Expense.user_id == user_id, Expense.geo_cell >= 0)
+
+    if bboxes:
+        conditions = []
+        for west, south, east, north in bboxes:
+            ranges = _ranges(west, south, east, north)
+            conditions.append(and_(
+                or_(*(Expense.geo_cell.between(lo, hi - 1) for lo, hi in ranges)),
+                Expense.location_lat.between(south, north),
+                Expense.location_lon.between(west, east)
+            ))
+        query = query.filter(or_(*conditions))
+    if start_time:
+        query = query.filter(Expense.time >= start_time)
+    if end_time:
+        query = query.filter(Expense.time <= end_time)
+
+    rows = query.group_by(cell).order_by(func.count(Expense.id).desc(), cell).limit(limit + 1).all()
+    return level, rows[:limit], len(rows) > limit
+
+
+def backfill(user_id=None, batch_size=5000):
+    """为已有坐标但缺少 geo_cell 的记录补算网格编号，返回更新行数"""
+    table = Expense.__table__
+    updated = 0
+    while True:
+        query = db.session.query(Expense.id, Expense.location_lat, Expense.location_lon).filter(
+            Expense.geo_cell.is_(None),
+            Expense.location_lat.isnot(None),
+            Expense.location_lon.isnot(None)
+        )
+        if user_id is not None:
+            query = query.filter(Expense.user_id == user_id)
+        rows = query.order_by(Expense.id).limit(batch_size).all()
+        if not rows:
+            return updated
+
+        cells = cell_ids([row.location_lat for row in rows], [row.location_lon for row in rows])
+        # 越界坐标记为 -1，避免下一轮重复选中
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('row_id'))
+            .values(geo_cell=db.bindparam('cell')),
+            [{'row_id': row.id, 'cell': -1 if cell is None else cell} for row, cell in zip(rows, cells)]
+        )
+        db.session.commit()
+        updated += len(rows)
+
+
+@event.listens_for(Expense, 'before_insert')
+@event.listens_for(Expense, 'before_update')
+def _fill_geo_cell(mapper, connection, target):
+    """ORM 写入时根据经纬度填写 geo_cell"""
+    target.geo_cell = cell_id(target.location_lat, target.location_lon)
@@ -0,0 +1,481 @@
+"""消费数据批量导入服务
+
+按列（而非逐行）解析与校验整张表，再用 Core INSERT executemany 分批写入。
+文件按固定行数分块流式读取，每块单独提交，内存占用与文件大小无关。
+每行带指纹写入，已导入过的行自动跳过，重复上传不会产生重复记录。
+"""
+import hashlib
+import itertools
+import json
+import time
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app import db
+from app.models.expense import Expense
+from app.services.categories import resolve_category_ids
+from app.services.rollup import refresh_range
+from app.services.cache import bump_data_version
+from app.services.geogrid import cell_ids
+
+REQUIRED_COLUMNS = ['time', 'amount']
+OPTIONAL_COLUMNS = ['category', 'location', 'lat', 'lon', 'note']
+
+# 时间末尾的时区标记：Z、UTC、GMT 或 UTC 偏移（+08:00、-0500）
+OFFSET_PATTERN = r'(?i)\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?\s*(?:Z|UTC|GMT|[+-]\d{2}(?::?\d{2})?)$'
+
+
+def missing_columns(columns):
+    """返回缺失的必需列"""
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def _text_column(df, name):
+    """取出可选文本列，空值统一为 None"""
+    if name not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    col = df[name]
+    text = col.astype(str).str.strip()
+    return text.where(col.notna() & (text != ''), None).astype(object)
+
+
+def _coordinate_columns(df):
+    """取出经纬度列；缺失、无法解析或越界的坐标两列都置空"""
+    if 'lat' not in df.columns or 'lon' not in df.columns:
+        empty = pd.Series(np.nan, index=df.index, dtype='float64')
+        return empty, empty
+    lat = pd.to_numeric(df['lat'], errors='coerce')
+    lon = pd.to_numeric(df['lon'], errors='coerce')
+    valid = lat.between(-90, 90) & lon.between(-180, 180)
+    return lat.where(valid), lon.where(valid)
+
+
+def _to_datetime(values, **kwargs):
+    """整列解析时间；推断格式失败的行再用 mixed 模式逐个兜底"""
+    parsed = pd.to_datetime(values, errors='coerce', **kwargs)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed.loc[retry] = pd.to_datetime(values[retry].astype(str), format='mixed', errors='coerce', **kwargs)
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        raise TypeError('时间列混有不同时区')
+    return parsed
+
+
+def _to_storage_time(parsed):
+    """带时区的时间换算到存储时区后去掉时区信息，无时区的时间原样返回"""
+    if parsed.dt.tz is None:
+        return parsed
+    return parsed.dt.tz_convert(current_app.config['STORAGE_TIMEZONE']).dt.tz_localize(None)
+
+
+def _parse_time(col):
+    """解析时间列，返回存储时区下的无时区时间，无法解析的值为 NaT
+
+    整列一次解析；列中 UTC 偏移不一致（跨夏令时的导出）或带偏移与不带偏移的
+    值混杂时，按末尾是否带偏移拆成两部分：带偏移的按 UTC 解析再换算，不带的
+    视为 STORAGE_TIMEZONE 时间。
+    """
+    try:
+        return _to_storage_time(_to_datetime(col))
+    except (ValueError, TypeError):
+        pass
+
+    aware = col.notna() & col.astype(str).str.strip().str.contains(OFFSET_PATTERN)
+    parts = []
+    if aware.any():
+        parts.append(_to_storage_time(_to_datetime(col[aware], utc=True)))
+    if (~aware).any():
+        naive = col[~aware]
+        try:
+            parts.append(_to_storage_time(_to_datetime(naive)))
+        except (ValueError, TypeError):
+            # 偏移写法无法识别（如时区缩写）时，该部分值各自解析，失败的行按格式错误报告
+            parts.append(naive.map(_parse_one).astype('datetime64[us]'))
+    return pd.concat(parts).reindex(col.index)
+
+
+def _parse_one(value):
+    """单个时间值 -> 存储时区下的无时区时间；无法解析时为 NaT"""
+    try:
+        parsed = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return pd.NaT
+    if parsed is pd.NaT or parsed.tzinfo is None:
+        return parsed
+    return parsed.tz_convert(current_app.config['STORAGE_TIMEZONE']).tz_localize(None)
+
+
+def parse_frame(df, row_offset=0):
+    """向量化解析 DataFrame
+
+    返回 (有效行 DataFrame, 错误列表)。有效行包含 time、amount、category、
+    location_text、location_lat、location_lon、note 七列；错误行号按 Excel
+    行号计算（表头占第 1 行）。
+    """
+    df = df.reset_index(drop=True)
+
+    times = _parse_time(df['time'])
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+
+    bad_time = times.isna()
+    bad_amount = ~np.isfinite(amounts.to_numpy(dtype='float64', na_value=np.nan))
+    bad = bad_time.to_numpy() | bad_amount
+
+    errors = []
+    if bad.any():
+        row_numbers = np.flatnonzero(bad) + row_offset + 2
+        raw_times = df['time'].to_numpy()[bad]
+        raw_amounts = df['amount'].to_numpy()[bad]
+        for row, time_bad, raw_time, raw_amount in zip(
+                row_numbers, bad_time.to_numpy()[bad], raw_times, raw_amounts):
+            if time_bad:
+                message = f'时间格式错误: {raw_time}'
+            else:
+                message = f'金额格式错误: {raw_amount}'
+            errors.append({'row': int(row), 'error': message})
+
+    good = ~bad
+    lat, lon = _coordinate_columns(df)
+    clean = pd.DataFrame({
+        'time': times[good],
+        'amount': amounts[good].astype('float64'),
+        'category': _text_column(df, 'category')[good],
+        'location_text': _text_column(df, 'location')[good],
+        'location_lat': lat[good],
+        'location_lon': lon[good],
+        'note': _text_column(df, 'note')[good],
+    })
+    return clean, errors
+
+
+class RowFingerprinter:
+    """计算行指纹（用户、时间、金额、类别、地点）
+
+    完全相同的行按出现次序编号后再取哈希，保留文件内合法的重复消费；
+    编号在相邻分块间连续。重复上传或文件区间重叠时，已存在的行指纹相同
+    而被跳过。
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._carry = {}
+
+    def __call__(self, clean):
+        key = (
+            clean['time'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+            + '|' + clean['amount'].map('{:.2f}'.format)
+            + '|' + clean['category'].fillna('')
+            + '|' + clean['location_text'].fillna('')
+        )
+        ordinal = key.groupby(key).cumcount()
+        if self._carry:
+            ordinal = ordinal + key.map(self._carry).fillna(0).astype('int64')
+        self._carry = (ordinal + 1).groupby(key).max().to_dict()
+
+        raw = f'{self.user_id}|' + key + '|' + ordinal.astype(str)
+        return pd.Series(
+            [hashlib.sha1(value.encode('utf-8')).hexdigest() for value in raw],
+            index=clean.index
+        )
+
+
+def _existing_fingerprints(user_id, fingerprints):
+    """查询库中已存在的指纹"""
+    existing = set()
+    values = list(fingerprints)
+    for start in range(0, len(values), 500):
+        rows = db.session.query(Expense.fingerprint).filter(
+            Expense.user_id == user_id,
+            Expense.fingerprint.in_(values[start:start + 500])
+        ).all()
+        existing.update(row.fingerprint for row in rows)
+    return existing
+
+
+def _insert_statement(table):
+    """INSERT 语句；SQLite/PostgreSQL 上忽略指纹冲突，防止并发导入写入重复行"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return table.insert()
+    return insert(table).on_conflict_do_nothing()
+
+
+def insert_expenses(user_id, clean, fingerprinter=None, batch_size=None):
+    """用 Core INSERT executemany 分批写入有效行
+
+    已存在相同指纹的行被跳过，返回 (写入行数, 重复行数)。
+    """
+    if clean.empty:
+        return 0, 0
+
+    fingerprinter = fingerprinter or RowFingerprinter(user_id)
+    fingerprints = fingerprinter(clean)
+    duplicate = fingerprints.isin(_existing_fingerprints(user_id, fingerprints)).to_numpy()
+    if duplicate.any():
+        clean = clean[~duplicate]
+        fingerprints = fingerprints[~duplicate]
+    rows_duplicate = int(duplicate.sum())
+    if clean.empty:
+        return 0, rows_duplicate
+
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    category_ids = resolve_category_ids(clean['category'])
+
+    columns = {
+        'time': clean['time'].dt.to_pydatetime(),
+        'amount': clean['amount'].tolist(),
+        'category_id': category_ids.tolist(),
+        'location_text': clean['location_text'].tolist(),
+        'location_lat': clean['location_lat'].astype(object).where(clean['location_lat'].notna(), None).tolist(),
+        'location_lon': clean['location_lon'].astype(object).where(clean['location_lon'].notna(), None).tolist(),
+        'geo_cell': cell_ids(clean['location_lat'], clean['location_lon']),
+        'note': clean['note'].tolist(),
+        'fingerprint': fingerprints.tolist(),
+    }
+    names = list(columns)
+    statement = _insert_statement(Expense.__table__)
+
+    total = len(clean)
+    for start in range(0, total, batch_size):
+        rows = [
+            dict(zip(names, values), user_id=user_id)
+            for values in zip(*(columns[name][start:start + batch_size] for name in names))
+        ]
+        db.session.execute(statement, rows)
+
+    # 同一事务内重算本批涉及日期的每日汇总，并使该用户的分析缓存失效
+    connection = db.session.connection()
+    refresh_range(connection, user_id, clean['time'].min().date(), clean['time'].max().date())
+    bump_data_version(connection, user_id)
+
+    return total, rows_duplicate
+
+
+def import_frame(user_id, df, row_offset=0, fingerprinter=None):
+    """解析并写入一个 DataFrame，返回 (成功行数, 重复行数, 错误列表)"""
+    clean, errors = parse_frame(df, row_offset=row_offset)
+    rows_success, rows_duplicate = insert_expenses(user_id, clean, fingerprinter)
+    return rows_success, rows_duplicate, errors
+
+
+def save_upload(file, filepath):
+    """边保存上传文件边计算 SHA-256，返回十六进制摘要"""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+
+def _iter_xlsx_chunks(filepath, chunk_size):
+    """openpyxl 只读模式逐行读取 XLSX，按 chunk_size 组装 DataFrame"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value).strip() if value is not None else '' for value in header]
+
+        buffer = []
+        yielded = False
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            buffer.append(values[:len(columns)])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+                yielded = True
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _open_arrow_reader(filepath):
+    """打开 Arrow IPC 文件，兼容 file 与 stream 两种格式"""
+    import pyarrow as pa
+
+    source = pa.memory_map(filepath)
+    try:
+        reader = pa.ipc.open_file(source)
+        return (reader.get_batch(i) for i in range(reader.num_record_batches)), reader.schema
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader, reader.schema
+
+
+def _iter_columnar_chunks(filepath, chunk_size):
+    """按 chunk_size 读取 Parquet / Arrow 文件，列类型原样保留"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if filepath.rsplit('.', 1)[-1].lower() == 'parquet':
+        parquet_file = pq.ParquetFile(filepath)
+        batches, schema = parquet_file.iter_batches(batch_size=chunk_size), parquet_file.schema_arrow
+    else:
+        batches, schema = _open_arrow_reader(filepath)
+
+    buffer = []
+    buffered_rows = 0
+    yielded = False
+    for batch in batches:
+        buffer.append(batch)
+        buffered_rows += batch.num_rows
+        if buffered_rows >= chunk_size:
+            yield pa.Table.from_batches(buffer, schema=schema).to_pandas()
+            buffer = []
+            buffered_rows = 0
+            yielded = True
+    if buffer or not yielded:
+        yield pa.Table.from_batches(buffer, schema=schema).to_pandas()
+
+
+def _iter_chunks(filepath, chunk_size):
+    extension = filepath.rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        with pd.read_csv(filepath, chunksize=chunk_size) as reader:
+            yield from reader
+    elif extension == 'xlsx':
+        yield from _iter_xlsx_chunks(filepath, chunk_size)
+    elif extension in ('parquet', 'arrow'):
+        yield from _iter_columnar_chunks(filepath, chunk_size)
+    else:
+        # xls 为二进制格式，xlrd 不支持流式读取，只能整表加载
+        yield pd.read_excel(filepath)
+
+
+def open_chunks(filepath, chunk_size=None):
+    """打开上传文件，返回 (列名列表, DataFrame 分块迭代器)"""
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    chunks = _iter_chunks(filepath, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return [], iter(())
+    return list(first.columns), itertools.chain([first], chunks)
+
+
+def estimate_rows(filepath):
+    """估算数据行数（不含表头），用于进度与 ETA；无法估算时返回 None"""
+    extension = filepath.rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        lines = 0
+        last = b''
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                lines += block.count(b'\n')
+                last = block
+        if last and not last.endswith(b'\n'):
+            lines += 1
+        return max(lines - 1, 0)
+    if extension == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(filepath, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else None
+    if extension == 'parquet':
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(filepath).metadata.num_rows
+    return None
+
+
+def read_error_preview(filepath, limit=10):
+    """读取错误报告的前 limit 条（报告每行一条，导入进行中也可读取）"""
+    if not filepath:
+        return []
+    preview = []
+    try:
+        with open(filepath, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip().rstrip(',')
+                if not line.startswith('{'):
+                    continue
+                preview.append(json.loads(line))
+                if len(preview) >= limit:
+                    break
+    except (OSError, ValueError):
+        pass
+    return preview
+
+
+class ErrorReport:
+    """边导入边写出错误报告（JSON 数组），只在内存中保留前几条用于响应"""
+
+    def __init__(self, filepath, preview_size=10):
+        self.filepath = filepath
+        self.preview_size = preview_size
+        self.preview = []
+        self.count = 0
+        self._file = None
+
+    def write(self, errors):
+        for error in errors:
+            if self._file is None:
+                self._file = open(self.filepath, 'w', encoding='utf-8')
+                self._file.write('[\n')
+            else:
+                self._file.write(',\n')
+            self._file.write('  ' + json.dumps(error, ensure_ascii=False))
+            if len(self.preview) < self.preview_size:
+                self.preview.append(error)
+            self.count += 1
+
+    def close(self):
+        """关闭报告文件，有错误时返回文件路径，否则返回 None"""
+        if self._file is None:
+            return None
+        self._file.write('\n]\n')
+        self._file.close()
+        self._file = None
+        return self.filepath
+
+
+def import_chunks(import_record, chunks, error_report):
+    """逐块导入并提交，随进度更新 ImportRecord 的行数与吞吐量"""
+    started = time.perf_counter()
+    import_record.rows_total = 0
+    import_record.rows_success = 0
+    import_record.rows_failed = 0
+    import_record.rows_duplicate = 0
+    fingerprinter = RowFingerprinter(import_record.user_id)
+
+    try:
+        for chunk in chunks:
+            rows_success, rows_duplicate, errors = import_frame(
+                import_record.user_id, chunk,
+                row_offset=import_record.rows_total, fingerprinter=fingerprinter
+            )
+            error_report.write(errors)
+
+            import_record.rows_total += len(chunk)
+            import_record.rows_success += rows_success
+            import_record.rows_duplicate += rows_duplicate
+            import_record.rows_failed += len(errors)
+            elapsed = time.perf_counter() - started
+            import_record.rows_per_sec = round(import_record.rows_total / elapsed, 1) if elapsed > 0 else None
+            db.session.commit()
+    except Exception:
+        # 已提交的分块保留，当前分块回滚，记录标记为失败
+        db.session.rollback()
+        import_record.status = 'failed'
+        import_record.error_report_path = error_report.close()
+        db.session.commit()
+        raise
+
+    import_record.status = 'success' if import_record.rows_failed == 0 else 'partial'
+    import_record.error_report_path = error_report.close()
+    db.session.commit()
@@ -0,0 +1,132 @@
+"""后台导入任务队列
+
+进程内线程池执行导入任务，无需外部消息队列。IMPORT_MAX_WORKERS 限制同时
+执行的导入数，IMPORT_MAX_PENDING 限制排队加执行中的任务总数，避免多个大
+文件导入占满 worker 导致 API 无法响应。
+
+任务只在提交它的进程内存中排队，进程重启或崩溃后，对应的 pending /
+processing 记录不会再更新。超过 IMPORT_STALE_SECONDS 未更新的此类记录
+视为中断并标记为失败：进程启动时全部检查一次，上传时检查该用户的记录，
+使同一文件或同一幂等键可以重新导入。
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models.import_record import ImportRecord
+from app.services.importer import (
+    ErrorReport, missing_columns, open_chunks, import_chunks, estimate_rows
+)
+
+
+ACTIVE_STATUSES = ('pending', 'processing')
+
+STALE_MESSAGE = '导入任务中断（服务重启或长时间无进度），请重新上传'
+
+
+def expire_stale_imports(user_id=None):
+    """把长时间未更新的 pending / processing 记录标记为失败，返回标记的条数"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['IMPORT_STALE_SECONDS'])
+    query = ImportRecord.query.filter(
+        ImportRecord.status.in_(ACTIVE_STATUSES),
+        ImportRecord.updated_at < cutoff
+    )
+    if user_id is not None:
+        query = query.filter(ImportRecord.user_id == user_id)
+    count = query.update({
+        ImportRecord.status: 'failed',
+        ImportRecord.error_message: STALE_MESSAGE,
+        ImportRecord.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def run_import(import_record, filepath, error_filepath):
+    """执行一次导入（同步），结果写回 ImportRecord"""
+    import_record.status = 'processing'
+    import_record.rows_expected = estimate_rows(filepath)
+    db.session.commit()
+
+    columns, chunks = open_chunks(filepath)
+    missing = missing_columns(columns)
+    if missing:
+        import_record.status = 'failed'
+        import_record.error_message = f'缺少必需列: {", ".join(missing)}'
+        db.session.commit()
+        return
+
+    import_chunks(import_record, chunks, ErrorReport(error_filepath))
+
+
+class ImportJobQueue:
+    """有界的后台导入线程池"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['IMPORT_MAX_WORKERS'],
+            thread_name_prefix='import'
+        )
+        self._slots = threading.BoundedSemaphore(app.config['IMPORT_MAX_PENDING'])
+        if app.config['IMPORT_ASYNC']:
+            self._expire_orphans(app)
+
+    @staticmethod
+    def _expire_orphans(app):
+        """启动时清理上次运行遗留的中断任务；表尚未创建（迁移前）时跳过"""
+        with app.app_context():
+            try:
+                count = expire_stale_imports()
+            except SQLAlchemyError:
+                db.session.rollback()
+                return
+            if count:
+                app.logger.warning(f'已将 {count} 条中断的导入记录标记为失败')
+
+    def submit(self, import_record_id, filepath, error_filepath):
+        """提交任务；队列已满时返回 False"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            self._executor.submit(self._run, import_record_id, filepath, error_filepath)
+        except Exception:
+            self._slots.release()
+            raise
+        return True
+
+    def _run(self, import_record_id, filepath, error_filepath):
+        try:
+            with self.app.app_context():
+                import_record = db.session.get(ImportRecord, import_record_id)
+                # 排队期间已被判定为中断的任务不再执行
+                if import_record is None or import_record.status != 'pending':
+                    return
+                try:
+                    run_import(import_record, filepath, error_filepath)
+                    self.app.logger.info(
+                        f'后台导入完成: {os.path.basename(filepath)} '
+                        f'{import_record.rows_success}/{import_record.rows_total} 成功, '
+                        f'{import_record.rows_per_sec} 行/秒'
+                    )
+                except Exception as e:
+                    self.app.logger.error(f'后台导入失败: {e}', exc_info=True)
+                    db.session.rollback()
+                    import_record.status = 'failed'
+                    import_record.error_message = str(e)[:500]
+                    db.session.commit()
+        finally:
+            self._slots.release()
+
+
+import_queue = ImportJobQueue()
@@ -0,0 +1,68 @@
+"""键集（keyset）分页
+
+列表按（排序列, id）倒序输出，下一页条件为 (排序列, id) < 上一页最后一行，
+配合 (user_id, 排序列, id) 联合索引，任意深度的页都只是一次索引范围扫描，
+不使用 OFFSET，也默认不计算总数。
+
+游标是最后一行 (排序列, id) 的 JSON 经 base64url 编码，对客户端不透明。
+"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import func, tuple_
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, sort_column):
+    """游标 -> (排序值, id)；格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if python_type in (datetime, date):
+            sort_value = python_type.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('无效的分页游标')
+
+
+def parse_args(args):
+    """读取 limit / cursor / with_total 参数；参数不合法时抛出 ValueError"""
+    limit = args.get('limit', DEFAULT_LIMIT, type=int)
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit 必须在 1~{MAX_LIMIT} 之间')
+    with_total = args.get('with_total', 'false').lower() in ('1', 'true')
+    return limit, args.get('cursor') or None, with_total
+
+
+def keyset_page(query, sort_column, id_column, limit, cursor=None, with_total=False):
+    """按 (sort_column, id_column) 倒序取一页
+
+    query 为已按用户过滤、尚未排序的列元组查询，需包含两列。返回
+    {'items', 'next_cursor', 'limit'[, 'total']}；没有下一页时 next_cursor 为 None。
+    """
+    page = {'limit': limit}
+    if with_total:
+        page['total'] = query.order_by(None).with_entities(func.count(id_column)).scalar()
+
+    if cursor is not None:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    last = rows[-1]._mapping if rows else None
+    page['items'] = rows
+    page['next_cursor'] = encode_cursor(last[sort_column.key], last[id_column.key]) if has_more else None
+    return page
@@ -0,0 +1,129 @@
+"""响应层：快速 JSON 编码与压缩
+
+- FastJSONProvider：安装了 orjson 时用它编码（原生支持 datetime / date /
+  numpy），否则退回标准库 json；两种实现的日期时间均输出 ISO 8601。
+- Compressor：响应体超过 COMPRESS_MIN_SIZE 时按 Accept-Encoding 协商
+  brotli（需安装 brotli）或 gzip 压缩。流式响应与文件下载不压缩。
+"""
+import gzip
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+# 压缩后追加到 ETag 的后缀，不同编码的响应体对应不同的强 ETag
+ENCODINGS = ('br', 'gzip')
+
+
+def _default(value):
+    """标准库 json 与 orjson 都不能直接编码的类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'tolist'):  # numpy 标量与数组
+        return value.tolist()
+    raise TypeError(f'无法序列化为 JSON: {type(value).__name__}')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """优先使用 orjson 的 JSON 编码器"""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        # 直接写入 bytes，省去一次编码
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=option) + b'\n',
+            mimetype=self.mimetype
+        )
+
+
+def negotiate(accept_encoding):
+    """按 Accept-Encoding 选择压缩编码，不支持时返回 None"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+class Compressor:
+    """after_request 压缩"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['COMPRESS_ENABLED']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+        self.mimetypes = set(app.config['COMPRESS_MIMETYPES'])
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if not self.enabled or request.method == 'HEAD':
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if response.mimetype not in self.mimetypes or 'Content-Encoding' in response.headers:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            body = brotli.compress(data, quality=min(self.level, 11))
+        else:
+            body = gzip.compress(data, compresslevel=min(self.level, 9), mtime=0)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,270 @@
+"""每日汇总服务
+
+daily_rollups 按（user_id, day, category_id）保存金额合计、笔数、最小值、
+最大值与 24 小时分布。导入和 ORM 写入消费记录时按受影响的日期区间重算，
+分析接口读取整天部分的汇总行，查询区间两端不足一天的部分再从原始记录
+补算，结果与直接聚合 expenses 完全一致。
+"""
+import json
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, event, extract, func, or_, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.expense import Expense
+from app.models.daily_rollup import DailyRollup
+from app.services.buckets import date_bucket, bucket_date
+
+HOURS = 24
+
+
+class DayStat:
+    """一天内某个类别的汇总"""
+
+    __slots__ = ('day', 'category_id', 'total', 'count', 'min_amount', 'max_amount', 'hour_totals')
+
+    def __init__(self, day, category_id):
+        self.day = day
+        self.category_id = category_id
+        self.total = 0.0
+        self.count = 0
+        self.min_amount = None
+        self.max_amount = None
+        self.hour_totals = [0.0] * HOURS
+
+    def add(self, total, count, min_amount, max_amount, hour_totals=None, hour=None):
+        self.total += total
+        self.count += count
+        if min_amount is not None:
+            self.min_amount = min_amount if self.min_amount is None else min(self.min_amount, min_amount)
+        if max_amount is not None:
+            self.max_amount = max_amount if self.max_amount is None else max(self.max_amount, max_amount)
+        if hour_totals is not None:
+            self.hour_totals = [a + b for a, b in zip(self.hour_totals, hour_totals)]
+        elif hour is not None:
+            self.hour_totals[hour] += total
+
+
+def _group_expenses(connection, user_id, lower=None, upper=None, upper_inclusive=False, condition=None):
+    """从原始记录按（日期、类别、小时）聚合，返回 {(day, category_id): DayStat}"""
+    table = Expense.__table__
+    day = date_bucket(table.c.time, 'day')
+    hour = extract('hour', table.c.time)
+    query = select(
+        day.label('day'),
+        table.c.category_id,
+        hour.label('hour'),
+        func.sum(table.c.amount).label('total'),
+        func.count(table.c.id).label('count'),
+        func.min(table.c.amount).label('min_amount'),
+        func.max(table.c.amount).label('max_amount')
+    ).where(table.c.user_id == user_id)
+
+    if lower is not None:
+        query = query.where(table.c.time >= lower)
+    if upper is not None:
+        query = query.where(table.c.time <= upper if upper_inclusive else table.c.time < upper)
+    if condition is not None:
+        query = query.where(condition)
+
+    stats = {}
+    for row in connection.execute(query.group_by(day, table.c.category_id, hour)):
+        key = (bucket_date(row.day), row.category_id)
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = DayStat(*key)
+        stat.add(float(row.total), row.count, row.min_amount, row.max_amount, hour=int(row.hour))
+    return stats
+
+
+def refresh_range(connection, user_id, first_day=None, last_day=None):
+    """重算某用户 [first_day, last_day] 内的汇总行；不传日期时重算全部"""
+    table = DailyRollup.__table__
+    delete = table.delete().where(table.c.user_id == user_id)
+    lower = upper = None
+    if first_day is not None:
+        delete = delete.where(table.c.day >= first_day)
+        lower = datetime.combine(first_day, time.min)
+    if last_day is not None:
+        delete = delete.where(table.c.day <= last_day)
+        upper = datetime.combine(last_day + timedelta(days=1), time.min)
+    connection.execute(delete)
+
+    stats = _group_expenses(connection, user_id, lower, upper)
+    if stats:
+        connection.execute(table.insert(), [{
+            'user_id': user_id,
+            'day': stat.day,
+            'category_id': stat.category_id,
+            'total': stat.total,
+            'count': stat.count,
+            'min_amount': stat.min_amount,
+            'max_amount': stat.max_amount,
+            'hour_totals': json.dumps([round(value, 6) for value in stat.hour_totals])
+        } for stat in stats.values()])
+
+
+def rebuild(user_id=None):
+    """全量重建汇总表（回填历史数据），返回处理的用户数"""
+    if user_id is None:
+        user_ids = [row[0] for row in db.session.query(Expense.user_id).distinct()]
+        db.session.execute(DailyRollup.__table__.delete())
+    else:
+        user_ids = [user_id]
+
+    connection = db.session.connection()
+    for uid in user_ids:
+        refresh_range(connection, uid)
+        db.session.commit()
+        connection = db.session.connection()
+    return len(user_ids)
+
+
+def _midnight(value):
+    return datetime.combine(value.date(), time.min)
+
+
+def load_daily(user_id, start_time=None, end_time=None):
+    """读取 [start_time, end_time] 内的每日汇总
+
+    整天部分读汇总表，两端不足一天的部分从原始记录补算。
+    返回 DayStat 列表，按日期、类别排序。
+    """
+    connection = db.session.connection()
+
+    full_start = None
+    if start_time is not None:
+        full_start = start_time if start_time == _midnight(start_time) \
+            else _midnight(start_time) + timedelta(days=1)
+    full_end = _midnight(end_time) if end_time is not None else None
+
+    if full_start is not None and full_end is not None and full_start >= full_end:
+        stats = _group_expenses(connection, user_id, start_time, end_time, upper_inclusive=True)
+        return sorted(stats.values(), key=_sort_key)
+
+    stats = {}
+    if start_time is not None and start_time < full_start:
+        stats.update(_group_expenses(connection, user_id, start_time, full_start))
+
+    table = DailyRollup.__table__
+    query = select(table).where(table.c.user_id == user_id)
+    if full_start is not None:
+        query = query.where(table.c.day >= full_start.date())
+    if full_end is not None:
+        query = query.where(table.c.day < full_end.date())
+    for row in connection.execute(query):
+        key = (row.day, row.category_id)
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = DayStat(*key)
+        hour_totals = json.loads(row.hour_totals) if row.hour_totals else None
+        stat.add(row.total, row.count, row.min_amount, row.max_amount, hour_totals=hour_totals)
+
+    if end_time is not None:
+        for key, edge in _group_expenses(connection, user_id, full_end, end_time, upper_inclusive=True).items():
+            stat = stats.get(key)
+            if stat is None:
+                stats[key] = edge
+            else:
+                stat.add(edge.total, edge.count, edge.min_amount, edge.max_amount, hour_totals=edge.hour_totals)
+
+    return sorted(stats.values(), key=_sort_key)
+
+
+def group_raw(user_id, start_time=None, end_time=None):
+    """不经汇总表，直接在 SQL 中按（日期、类别、小时）聚合 [start_time, end_time]"""
+    stats = _group_expenses(db.session.connection(), user_id, start_time, end_time, upper_inclusive=True)
+    return sorted(stats.values(), key=_sort_key)
+
+
+def load_days(user_id, ranges, use_rollup=True):
+    """一次查询读取多个整天区间 [(first_day, last_day), ...] 的每日汇总
+
+    各区间可以重叠，日期只返回一次；不含小时分布。use_rollup=False 时
+    直接在原始记录上按（日期、类别）聚合。返回 DayStat 列表，按日期、类别排序。
+    """
+    connection = db.session.connection()
+    if not use_rollup:
+        table = Expense.__table__
+        condition = or_(*(and_(
+            table.c.time >= datetime.combine(first_day, time.min),
+            table.c.time < datetime.combine(last_day + timedelta(days=1), time.min)
+        ) for first_day, last_day in ranges))
+        stats = _group_expenses(connection, user_id, condition=condition)
+        return sorted(stats.values(), key=_sort_key)
+
+    table = DailyRollup.__table__
+    query = select(
+        table.c.day, table.c.category_id, table.c.total, table.c.count, table.c.min_amount, table.c.max_amount
+    ).where(
+        table.c.user_id == user_id,
+        or_(*(table.c.day.between(first_day, last_day) for first_day, last_day in ranges))
+    )
+    stats = []
+    for row in connection.execute(query):
+        stat = DayStat(row.day, row.category_id)
+        stat.add(row.total, row.count, row.min_amount, row.max_amount)
+        stats.append(stat)
+    return sorted(stats, key=_sort_key)
+
+
+def daily_totals(user_id, first_day, last_day, use_rollup=True):
+    """[first_day, last_day] 内每天的消费合计，在 SQL 中按日期 GROUP BY
+
+    返回 {day: total}，没有消费的日期不在结果中。
+    """
+    if use_rollup:
+        table = DailyRollup.__table__
+        day = table.c.day
+        query = select(day, func.sum(table.c.total)).where(
+            table.c.user_id == user_id, day.between(first_day, last_day)
+        )
+    else:
+        table = Expense.__table__
+        day = date_bucket(table.c.time, 'day')
+        query = select(day.label('day'), func.sum(table.c.amount)).where(
+            table.c.user_id == user_id,
+            table.c.time >= datetime.combine(first_day, time.min),
+            table.c.time < datetime.combine(last_day + timedelta(days=1), time.min)
+        )
+    rows = db.session.connection().execute(query.group_by(day))
+    return {bucket_date(value): float(total) for value, total in rows}
+
+
+def _sort_key(stat):
+    return stat.day, stat.category_id is not None, stat.category_id or 0
+
+
+def fold(stats, key_func):
+    """按 key_func(stat) 合并，返回 {key: DayStat}（day/category_id 取首个）"""
+    folded = {}
+    for stat in stats:
+        key = key_func(stat)
+        target = folded.get(key)
+        if target is None:
+            target = folded[key] = DayStat(stat.day, stat.category_id)
+        target.add(stat.total, stat.count, stat.min_amount, stat.max_amount, hour_totals=stat.hour_totals)
+    return folded
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_after_expense_write(session, flush_context):
+    """ORM 方式增删改消费记录后，同一事务内重算受影响日期的汇总"""
+    touched = {}
+    rewritten = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Expense) or obj.user_id is None or obj.time is None:
+            continue
+        if obj not in session.new:
+            rewritten.add(obj.user_id)
+        days = touched.setdefault(obj.user_id, set())
+        days.add(obj.time.date())
+        history = db.inspect(obj).attrs.time.history
+        days.update(value.date() for value in history.deleted if value is not None)
+
+    if touched:
+        from app.services.cache import bump_data_version
+
+        connection = session.connection()
+        for user_id, days in touched.items():
+            refresh_range(connection, user_id, min(days), max(days))
+            bump_data_version(connection, user_id, rewrite=user_id in rewritten)
@@ -0,0 +1,201 @@
+"""消费记录检索
+
+按时间、类别（含子类别）、金额区间过滤，并对备注与地点文本做全文检索：
+
+- SQLite：FTS5 外部内容表 expenses_fts（trigram 分词，中文按子串匹配），
+  由 expenses 上的触发器在增删改时同步；
+- PostgreSQL：pg_trgm GIN 索引，ILIKE 子串匹配可走索引。
+
+两种实现都是子串语义；不足 3 个字符的关键词无法使用 trigram 索引，退化为
+在该用户其他条件过滤后的记录上做 LIKE。
+
+注意：SQLite 下 batch_alter_table('expenses') 会重建表并丢失触发器，此类
+迁移之后需执行 flask rebuild-search-index。
+"""
+import math
+from flask import current_app
+from sqlalchemy import event, func, or_, select, text
+from app import db
+from app.models.expense import Expense
+from app.models.category_closure import CategoryClosure
+from app.models.daily_rollup import DailyRollup
+from app.services.categories import category_cache
+
+FTS_TABLE = 'expenses_fts'
+
+# trigram 索引可用的最短关键词
+MIN_TRIGRAM_LENGTH = 3
+
+# 逐行判定 FTS 匹配与 IN 子查询回表的单行成本之比（实测约 36）
+SCAN_COST_RATIO = 36
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "note, location_text, content='expenses', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, note, location_text) VALUES (new.id, new.note, new.location_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, location_text) "
+    "VALUES ('delete', old.id, old.note, old.location_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF note, location_text ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, location_text) "
+    "VALUES ('delete', old.id, old.note, old.location_text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, note, location_text) VALUES (new.id, new.note, new.location_text); END",
+]
+
+POSTGRESQL_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_expenses_note_trgm ON expenses USING gin (note gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_expenses_location_text_trgm ON expenses USING gin (location_text gin_trgm_ops)',
+]
+
+# 不由模型声明、迁移比对时忽略的对象
+MANAGED_NAMES = {
+    FTS_TABLE, f'{FTS_TABLE}_data', f'{FTS_TABLE}_idx', f'{FTS_TABLE}_docsize', f'{FTS_TABLE}_config',
+    'ix_expenses_note_trgm', 'ix_expenses_location_text_trgm',
+}
+
+# 可输出的字段 -> 列
+FIELDS = {
+    'id': Expense.id,
+    'time': Expense.time,
+    'amount': Expense.amount,
+    'category_id': Expense.category_id,
+    'location': Expense.location_text,
+    'lat': Expense.location_lat,
+    'lon': Expense.location_lon,
+    'note': Expense.note,
+}
+DEFAULT_FIELDS = ['id', 'time', 'amount', 'category', 'location', 'note']
+
+
+def install(connection, rebuild=False):
+    """创建检索索引；rebuild=True 时按 expenses 现有数据重建（SQLite）"""
+    if connection.dialect.name == 'sqlite':
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if rebuild:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif connection.dialect.name == 'postgresql':
+        for statement in POSTGRESQL_DDL:
+            connection.execute(text(statement))
+
+
+@event.listens_for(Expense.__table__, 'after_create')
+def _install_after_create(target, connection, **kwargs):
+    """create_all 建表（测试环境）时一并创建"""
+    install(connection)
+
+
+def parse_fields(value):
+    """解析 fields 参数；含未知字段时抛出 ValueError"""
+    if not value:
+        return list(DEFAULT_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name != 'category' and name not in FIELDS]
+    if unknown:
+        raise ValueError(f'不支持的字段: {", ".join(unknown)}')
+    return fields
+
+
+def _escape_like(keyword):
+    return keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _user_rows(user_id):
+    """用户记录数：取自每日汇总表，避免在明细表上计数；汇总表未启用或为空时直接计数"""
+    rows = 0
+    if current_app.config['ANALYTICS_USE_ROLLUP']:
+        rows = db.session.query(func.sum(DailyRollup.count)).filter(DailyRollup.user_id == user_id).scalar() or 0
+    if not rows:
+        rows = db.session.query(func.count(Expense.id)).filter(Expense.user_id == user_id).scalar()
+    return int(rows)
+
+
+def _fts_condition(keyword, user_id, limit, with_total=False):
+    """FTS5 匹配条件，按匹配数在两种执行方式间选择
+
+    - IN 子查询：先取全部匹配的 rowid 再回表排序，成本与匹配数成正比，
+      适合少见的关键词；
+    - 按 (time, id) 索引倒序扫描该用户的记录、逐行判定是否匹配，取满一页
+      即停，成本与 limit * 用户记录数 / 匹配数成正比，适合常见关键词；
+      需要总数时计数要扫描全部记录，不使用此方式。
+
+    只需判断该用户的匹配数是否超过 sqrt(SCAN_COST_RATIO * (limit + 1) * 用户记录数)，
+    计数只统计该用户的匹配并带 LIMIT。
+    """
+    phrase = '"' + keyword.replace('"', '""') + '"'
+    if not with_total:
+        rows = _user_rows(user_id)
+        threshold = math.isqrt(SCAN_COST_RATIO * (limit + 1) * rows)
+        # CROSS JOIN 固定连接顺序：外层遍历匹配，按主键回表过滤用户
+        matches = db.session.execute(
+            text(
+                f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'CROSS JOIN expenses ON expenses.id = {FTS_TABLE}.rowid AND expenses.user_id = :user_id '
+                f'WHERE {FTS_TABLE} MATCH :phrase LIMIT :cap)'
+            ),
+            {'phrase': phrase, 'user_id': user_id, 'cap': threshold + 1}
+        ).scalar()
+        if matches > threshold:
+            return text(
+                f'EXISTS (SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase AND rowid = expenses.id)'
+            ).bindparams(phrase=phrase)
+    matched = text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase')\
+        .bindparams(phrase=phrase).columns(rowid=db.Integer)
+    return Expense.id.in_(matched)
+
+
+def text_condition(keyword, dialect_name, user_id, limit, with_total=False):
+    """备注或地点包含 keyword 的条件"""
+    if dialect_name == 'sqlite' and len(keyword) >= MIN_TRIGRAM_LENGTH:
+        return _fts_condition(keyword, user_id, limit, with_total)
+
+    pattern = f'%{_escape_like(keyword)}%'
+    like = Expense.note.ilike if dialect_name == 'postgresql' else Expense.note.like
+    location_like = Expense.location_text.ilike if dialect_name == 'postgresql' else Expense.location_text.like
+    return or_(like(pattern, escape='\\'), location_like(pattern, escape='\\'))
+
+
+def build_query(user_id, fields, limit, keyword=None, start_time=None, end_time=None,
+                category_id=None, min_amount=None, max_amount=None, with_total=False):
+    """构建检索查询（列元组，未排序），供键集分页使用"""
+    selected = {'id', 'time'} | {name for name in fields if name in FIELDS}
+    if 'category' in fields:
+        selected.add('category_id')
+    query = db.session.query(*(FIELDS[name].label(name) for name in FIELDS if name in selected))\
+        .filter(Expense.user_id == user_id)
+
+    if start_time:
+        query = query.filter(Expense.time >= start_time)
+    if end_time:
+        query = query.filter(Expense.time <= end_time)
+    if category_id:
+        # 包含全部子类别
+        query = query.filter(Expense.category_id.in_(
+            select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+        ))
+    if min_amount is not None:
+        query = query.filter(Expense.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Expense.amount <= max_amount)
+    if keyword:
+        query = query.filter(text_condition(
+            keyword, db.session.get_bind().dialect.name, user_id, limit, with_total
+        ))
+    return query
+
+
+def serialize(rows, fields):
+    """按请求的字段输出"""
+    items = []
+    for row in rows:
+        values = row._mapping
+        item = {}
+        for name in fields:
+            if name == 'category':
+                item['category'] = category_cache.name(values['category_id']) if values['category_id'] else None
+            else:
+                item[name] = values[name]
+        items.append(item)
+    return items
@@ -0,0 +1,34 @@
+"""列元组序列化
+
+列表接口只查询需要输出的列，结果行（Row）直接转为字典，不构造 ORM 对象，
+也不逐个调用 to_dict()。日期时间由应用的 JSON 编码器统一输出为 ISO 8601，
+与各模型 to_dict() 的结果一致。
+"""
+from app.models.import_record import ImportRecord
+from app.models.report import Report
+from app.models.forecast import Forecast
+
+# 与各模型 to_dict() 的字段一致
+IMPORT_RECORD_FIELDS = (
+    'id', 'user_id', 'filename', 'rows_total', 'rows_expected', 'rows_success',
+    'rows_failed', 'rows_duplicate', 'status', 'error_report_path', 'rows_per_sec',
+    'error_message', 'content_hash', 'created_at'
+)
+REPORT_FIELDS = ('id', 'user_id', 'title', 'file_path', 'format', 'created_at')
+FORECAST_FIELDS = ('id', 'user_id', 'period', 'date', 'predicted_amount', 'model_version', 'created_at')
+
+FIELDS = {
+    ImportRecord: IMPORT_RECORD_FIELDS,
+    Report: REPORT_FIELDS,
+    Forecast: FORECAST_FIELDS,
+}
+
+
+def columns(model):
+    """模型对外输出的列"""
+    return [getattr(model, name) for name in FIELDS[model]]
+
+
+def to_dicts(rows):
+    """列元组 -> 字典列表"""
+    return [row._asdict() for row in rows]
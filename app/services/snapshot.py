@@ -0,0 +1,281 @@
+"""每用户列式消费快照
+
+把用户的消费记录按列保存为 .npy 文件（SNAPSHOT_FOLDER/<数据库>/<user_id>/v<版本>/），
+以 mmap 方式只读打开，多个 gunicorn worker 通过页缓存共享同一份数据：
+
+- id        int64
+- time      int64（秒级时间戳，按 time、id 升序排列）
+- amount    float64
+- category  int32（未分类为 -1）
+- lat / lon float64（无坐标为 NaN）
+
+快照按用户数据版本号（data_version）命名。数据版本变化后，若期间只有追加
+（rewrite_version 不超过旧快照版本），只读取 id 更大的新记录合并进旧快照；
+修改或删除过已有记录时全量重建。
+
+快照目录按数据库标识（连接 URL 的摘要）分开，多个数据库共用 SNAPSHOT_FOLDER
+时互不干扰。读取磁盘上的快照前，用一次 count(*)/max(id) 查询核对 meta.json
+中的 rows 与 max_id，不一致（数据库被替换、恢复或未更新版本号的写入）时重建。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, select
+from app import db
+from app.models.expense import Expense
+from app.models.user import User
+
+COLUMNS = {
+    'id': np.int64,
+    'time': np.int64,
+    'amount': np.float64,
+    'category': np.int32,
+    'lat': np.float64,
+    'lon': np.float64,
+}
+
+# 从数据库分批读取的行数
+FETCH_SIZE = 20000
+
+META_FILE = 'meta.json'
+
+
+def database_id():
+    """当前数据库的标识：连接 URL（不含密码）的摘要"""
+    url = db.engine.url.render_as_string(hide_password=True)
+    return hashlib.sha1(url.encode()).hexdigest()[:16]
+
+
+def to_timestamp(value):
+    """datetime -> 秒级时间戳（与快照 time 列一致，不做时区换算）"""
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+def to_datetime64(values):
+    """时间戳数组 -> datetime64[s] 数组"""
+    return np.asarray(values, dtype=np.int64).astype('datetime64[s]')
+
+
+class Snapshot:
+    """一个用户在某个数据版本下的列式快照"""
+
+    def __init__(self, version, columns):
+        self.version = version
+        self.columns = columns
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['columns'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def between(self, start_time=None, end_time=None):
+        """返回 [start_time, end_time] 内的子快照（time 有序，切片不复制数据）"""
+        times = self.columns['time']
+        lo = 0 if start_time is None else int(np.searchsorted(times, to_timestamp(start_time), 'left'))
+        hi = len(times) if end_time is None else int(np.searchsorted(times, to_timestamp(end_time), 'right'))
+        return Snapshot(self.version, {name: values[lo:hi] for name, values in self.columns.items()})
+
+
+def _fetch(user_id, min_id=None):
+    """从数据库读取列，返回按 (time, id) 排序的列字典"""
+    query = select(
+        Expense.id, Expense.time, Expense.amount, Expense.category_id,
+        Expense.location_lat, Expense.location_lon
+    ).where(Expense.user_id == user_id)
+    if min_id is not None:
+        query = query.where(Expense.id > min_id)
+
+    parts = {name: [] for name in COLUMNS}
+    result = db.session.execute(query.execution_options(yield_per=FETCH_SIZE))
+    for rows in result.partitions():
+        ids, times, amounts, categories, lats, lons = zip(*rows)
+        parts['id'].append(np.array(ids, dtype=np.int64))
+        parts['time'].append(np.array(times, dtype='datetime64[s]').astype(np.int64))
+        parts['amount'].append(np.array(amounts, dtype=np.float64))
+        parts['category'].append(np.array([-1 if c is None else c for c in categories], dtype=np.int32))
+        parts['lat'].append(np.array(lats, dtype=np.float64))
+        parts['lon'].append(np.array(lons, dtype=np.float64))
+
+    return {
+        name: np.concatenate(chunks) if chunks else np.empty(0, dtype=COLUMNS[name])
+        for name, chunks in parts.items()
+    }
+
+
+def _stats(user_id):
+    """数据库中该用户的 (记录数, 最大 id)"""
+    rows, max_id = db.session.query(
+        func.count(Expense.id), func.max(Expense.id)
+    ).filter(Expense.user_id == user_id).one()
+    return int(rows), int(max_id or 0)
+
+
+def _sorted(columns):
+    order = np.lexsort((columns['id'], columns['time']))
+    return {name: values[order] for name, values in columns.items()}
+
+
+class SnapshotStore:
+    """快照的读取、增量刷新与清理"""
+
+    def __init__(self, app=None):
+        self.folder = None
+        self._lock = threading.Lock()
+        self._opened = {}  # (数据库, user_id) -> Snapshot（当前进程已 mmap 打开的版本）
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.config['SNAPSHOT_FOLDER'] if app.config['SNAPSHOT_ENABLED'] else None
+        if self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.folder, database_id(), str(user_id))
+
+    def _version_dir(self, user_id, version):
+        return os.path.join(self._user_dir(user_id), f'v{version}')
+
+    @staticmethod
+    def _read_meta(path):
+        with open(os.path.join(path, META_FILE)) as f:
+            return json.load(f)
+
+    def _open(self, path):
+        meta = self._read_meta(path)
+        columns = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in COLUMNS
+        }
+        return Snapshot(meta['version'], columns)
+
+    def _latest_on_disk(self, user_id):
+        """磁盘上该用户最新的完整快照，返回 (版本, 路径)"""
+        try:
+            names = os.listdir(self._user_dir(user_id))
+        except FileNotFoundError:
+            return None, None
+        versions = sorted(
+            (int(name[1:]) for name in names if name.startswith('v') and name[1:].isdigit()),
+            reverse=True
+        )
+        for version in versions:
+            path = self._version_dir(user_id, version)
+            if os.path.exists(os.path.join(path, META_FILE)):
+                return version, path
+        return None, None
+
+    def _write(self, user_id, version, columns):
+        """写入临时目录后整体改名，其他进程不会读到写了一半的快照"""
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=user_dir)
+        try:
+            for name, values in columns.items():
+                np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(values, dtype=COLUMNS[name]))
+            with open(os.path.join(tmp, META_FILE), 'w') as f:
+                json.dump({
+                    'database': database_id(),
+                    'version': version,
+                    'rows': int(len(columns['id'])),
+                    'max_id': int(columns['id'].max()) if len(columns['id']) else 0,
+                    'created_at': datetime.now().isoformat()
+                }, f)
+            os.rename(tmp, self._version_dir(user_id, version))
+        except OSError:
+            # 其他进程已写好同一版本
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(self._version_dir(user_id, version), META_FILE)):
+                raise
+
+    def _prune(self, user_id, current_version):
+        """删除比当前版本旧的快照（已 mmap 的进程在 Linux 上仍可读到旧文件）"""
+        user_dir = self._user_dir(user_id)
+        for name in os.listdir(user_dir):
+            if name.startswith('v') and name[1:].isdigit() and int(name[1:]) < current_version:
+                shutil.rmtree(os.path.join(user_dir, name), ignore_errors=True)
+
+    @staticmethod
+    def _matches(meta, stats):
+        """meta.json 是否属于当前数据库，且行数与最大 id 与数据库一致"""
+        return (meta.get('database') == database_id()
+                and (meta.get('rows'), meta.get('max_id')) == stats)
+
+    def _build(self, user_id, version, rewrite_version, stats):
+        """生成指定版本的快照列：能增量时只读取新增记录
+
+        stats 为 _stats() 的结果。增量合并后的行数与最大 id 须与之相符，
+        否则（并发事务提交顺序与 id 顺序不一致时可能漏行，或旧快照已失效）全量重建。
+        """
+        base_version, base_path = self._latest_on_disk(user_id)
+        if base_version is not None and rewrite_version <= base_version < version:
+            base = self._open(base_path)
+            max_id = int(base.id.max()) if len(base) else None
+            added = _fetch(user_id, min_id=max_id)
+            rows = len(base) + len(added['id'])
+            if len(added['id']):
+                max_id = int(added['id'].max())
+            if (rows, max_id or 0) == stats:
+                if not len(added['id']):
+                    return dict(base.columns)
+                return _sorted({
+                    name: np.concatenate([base.columns[name], added[name]]) for name in COLUMNS
+                })
+        return _sorted(_fetch(user_id))
+
+    def get(self, user_id):
+        """返回用户当前数据版本的快照（必要时生成）"""
+        user_id = int(user_id)
+        version, rewrite_version = db.session.query(
+            User.data_version, User.rewrite_version
+        ).filter(User.id == user_id).one()
+        version = version or 0
+
+        if not self.folder:
+            return Snapshot(version, _sorted(_fetch(user_id)))
+
+        key = (database_id(), user_id)
+        with self._lock:
+            opened = self._opened.get(key)
+        if opened is not None and opened.version == version:
+            return opened
+
+        stats = _stats(user_id)
+        path = self._version_dir(user_id, version)
+        if os.path.exists(os.path.join(path, META_FILE)) and not self._matches(self._read_meta(path), stats):
+            # 同一版本号的快照与数据库不符，删除后按全量重建
+            shutil.rmtree(path, ignore_errors=True)
+            rewrite_version = version
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            self._write(user_id, version, self._build(user_id, version, rewrite_version or 0, stats))
+            self._prune(user_id, version)
+
+        snapshot = self._open(path)
+        with self._lock:
+            self._opened[key] = snapshot
+        return snapshot
+
+    def clear(self, user_id=None):
+        """删除快照文件（全部或指定用户）"""
+        with self._lock:
+            if user_id is None:
+                self._opened.clear()
+            else:
+                for key in [key for key in self._opened if key[1] == int(user_id)]:
+                    del self._opened[key]
+        if self.folder:
+            target = self.folder if user_id is None else self._user_dir(user_id)
+            shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(self.folder, exist_ok=True)
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,62 @@
+"""时区换算服务
+
+消费时间以无时区的 datetime 存储，按 STORAGE_TIMEZONE 解释。用户在设置中
+配置时区后，按小时/星期/月份的分布在用户时区下统计。换算作用在
+（日期、小时）聚合桶上而不是逐条记录，代价只与天数有关。
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import current_app
+from app.models.setting import Setting
+
+
+def load_timezone(name):
+    """按名称加载时区，名称无效时返回 None"""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def storage_timezone():
+    """存储时间所在的时区"""
+    return ZoneInfo(current_app.config['STORAGE_TIMEZONE'])
+
+
+def user_timezone(user_id):
+    """用户设置的时区；未设置或与存储时区相同时返回 None（无需换算）"""
+    name = Setting.query.with_entities(Setting.timezone).filter_by(user_id=user_id).scalar()
+    if not name or name == current_app.config['STORAGE_TIMEZONE']:
+        return None
+    return load_timezone(name)
+
+
+def iter_local_hours(stats, tz):
+    """遍历 DayStat 的小时分布，产出 (用户时区下的整点时间, 金额)
+
+    tz 为 None 时不做换算。同一天内 UTC 偏移不变时整天共用一个偏移量，
+    仅夏令时切换当天逐小时换算。
+    """
+    source = storage_timezone() if tz is not None else None
+    for stat in stats:
+        start = datetime.combine(stat.day, time.min)
+        if tz is None:
+            for hour, value in enumerate(stat.hour_totals):
+                if value:
+                    yield start + timedelta(hours=hour), value
+            continue
+
+        first = start.replace(tzinfo=source).astimezone(tz)
+        last = (start + timedelta(hours=23)).replace(tzinfo=source).astimezone(tz)
+        uniform = first.utcoffset() - source.utcoffset(start) == \
+            last.utcoffset() - source.utcoffset(start + timedelta(hours=23))
+        for hour, value in enumerate(stat.hour_totals):
+            if not value:
+                continue
+            if uniform:
+                yield first.replace(tzinfo=None) + timedelta(hours=hour), value
+            else:
+                local = (start + timedelta(hours=hour)).replace(tzinfo=source).astimezone(tz)
+                yield local.replace(tzinfo=None), value
@@ -0,0 +1,75 @@
+"""分析图表计算
+
+由每日汇总（DayStat 列表）计算各图表的数据，单个分析接口与仪表盘批量
+接口共用，仪表盘只需读取一次汇总即可生成多个图表。
+"""
+from datetime import date, datetime, time, timedelta
+from app.services.categories import category_cache
+from app.services.rollup import fold
+
+# 按日趋势与异常检测未指定起始时间时统计的天数
+DEFAULT_WINDOW_DAYS = 30
+
+
+def window_start(start_time=None):
+    """未指定起始时间时的默认起点：DEFAULT_WINDOW_DAYS 天前的零点（按整天计）"""
+    if start_time is not None:
+        return start_time
+    return datetime.combine(date.today() - timedelta(days=DEFAULT_WINDOW_DAYS), time.min)
+
+
+def trend_series(stats, period):
+    """消费趋势：按年、月或日合计"""
+    if period == 'year':
+        key = lambda stat: str(stat.day.year)
+    elif period == 'month':
+        key = lambda stat: stat.day.strftime('%Y-%m')
+    else:  # day
+        key = lambda stat: stat.day.isoformat()
+
+    folded = fold(stats, key)
+    return [{'date': date, 'amount': float(stat.total)} for date, stat in sorted(folded.items())]
+
+
+def category_totals(stats):
+    """按类别合并，返回按 category_id 排序的 DayStat 列表（不含未分类）"""
+    folded = fold(
+        (stat for stat in stats if stat.category_id is not None),
+        lambda stat: stat.category_id
+    )
+    return [folded[category_id] for category_id in sorted(folded)]
+
+
+def category_share(results):
+    """类别占比：results 为带 category_id、total、count 的行，返回 (数据, 总额)
+
+    同名类别合并，按金额降序。
+    """
+    by_name = {}
+    for r in results:
+        name = category_cache.name(r.category_id)
+        if name is None:
+            continue
+        total, count = by_name.get(name, (0, 0))
+        by_name[name] = (total + r.total, count + r.count)
+
+    total_amount = sum(total for total, _ in by_name.values())
+
+    data = [{
+        'category': name,
+        'amount': float(total),
+        'count': count,
+        'percentage': round(float(total) / total_amount * 100, 2) if total_amount > 0 else 0
+    } for name, (total, count) in sorted(by_name.items(), key=lambda item: item[1][0], reverse=True)]
+    return data, float(total_amount)
+
+
+def rank(stats, rank_by, top_n):
+    """消费排行：按类别或日期（地点不在汇总中）"""
+    if rank_by == 'category':
+        top = sorted(category_totals(stats), key=lambda stat: stat.total, reverse=True)[:top_n]
+        return [{'name': category_cache.name(stat.category_id), 'value': float(stat.total)} for stat in top]
+
+    folded = fold(stats, lambda stat: stat.day)
+    top = sorted(folded.items(), key=lambda item: item[1].total, reverse=True)[:top_n]
+    return [{'name': day.isoformat(), 'value': float(stat.total)} for day, stat in top]
@@ -0,0 +1,137 @@
+"""响应层基准测试
+
+在临时 SQLite 数据库中生成消费记录与预测记录，对负载最大的几个接口比较：
+
+- 编码耗时：标准库 json 与 orjson
+- 响应体大小：未压缩、gzip、brotli
+- 列表序列化：ORM 对象 + to_dict() 与列元组
+
+用法：python bench_responses.py [消费记录数]
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, date
+import numpy as np
+
+
+def timed(func, repeat):
+    """重复执行，返回单次平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def seed(app, rows):
+    from app import db
+    from app.models import User, Category
+    from app.models.expense import Expense
+    from app.models.forecast import Forecast
+
+    rng = np.random.default_rng(42)
+    with app.app_context():
+        user = User(email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.add_all(Category(name=f'类别{i}', code=f'c{i}') for i in range(12))
+        db.session.commit()
+
+        start = datetime(2023, 1, 1)
+        seconds = np.sort(rng.integers(0, 730 * 86400, rows))
+        amounts = np.round(rng.lognormal(3.5, 1.0, rows), 2)
+        categories = rng.integers(1, 13, rows)
+        lats = rng.uniform(22, 40, rows)
+        lons = rng.uniform(100, 122, rows)
+        db.session.execute(Expense.__table__.insert(), [{
+            'user_id': user.id,
+            'time': start + timedelta(seconds=int(s)),
+            'amount': float(a),
+            'category_id': int(c),
+            'location_lat': float(la),
+            'location_lon': float(lo),
+            'note': f'备注{i}'
+        } for i, (s, a, c, la, lo) in enumerate(zip(seconds, amounts, categories, lats, lons))])
+        db.session.execute(Forecast.__table__.insert(), [{
+            'user_id': user.id,
+            'period': 'day',
+            'date': date(2025, 1, 1) + timedelta(days=i % 365),
+            'predicted_amount': float(a),
+            'model_version': 'bench',
+            'created_at': datetime(2025, 1, 1) + timedelta(minutes=i)
+        } for i, a in enumerate(amounts[:5000])])
+        db.session.commit()
+
+        from app.services.rollup import rebuild
+        from app.services.geogrid import backfill
+        backfill(user.id)
+        rebuild(user.id)
+        return user.id
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ['LOG_FILE'] = os.path.join(workdir, 'app.log')
+    os.environ['SNAPSHOT_FOLDER'] = os.path.join(workdir, 'snapshots')
+    os.environ['LOG_LEVEL'] = 'WARNING'
+
+    from config import TestingConfig
+    TestingConfig.SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+    TestingConfig.RATELIMIT_ENABLED = False
+    TestingConfig.ANALYTICS_CACHE_BACKEND = 'none'
+    TestingConfig.COMPRESS_ENABLED = False
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.services import responses
+    from app.services.serializers import columns, to_dicts
+    from app.models.forecast import Forecast
+
+    app = create_app('testing')
+    user_id = seed(app, rows)
+    with app.app_context():
+        token = create_access_token(identity=user_id)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    endpoints = [
+        '/api/analytics/trend?period=day&start_date=2023-01-01',
+        '/api/analytics/heatmap?zoom=12&bbox=100,22,122,40',
+        '/api/analytics/dashboard',
+        '/api/forecast/history?limit=100',
+    ]
+
+    print(f'消费记录 {rows} 行，orjson: {responses.orjson is not None}，brotli: {responses.brotli is not None}\n')
+    print(f'{"接口":<58}{"原始":>10}{"gzip":>10}{"br":>10}{"json ms":>10}{"orjson ms":>11}')
+    for url in endpoints:
+        response = client.get(url, headers=headers)
+        if response.status_code != 200:
+            raise SystemExit(f'{url} 返回 {response.status_code}: {response.get_json()}')
+        payload = response.get_json()
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        gz = len(gzip.compress(raw, 6))
+        br = len(responses.brotli.compress(raw, quality=6)) if responses.brotli else float('nan')
+
+        std_ms = timed(lambda: json.dumps(payload, ensure_ascii=False, sort_keys=True), 20)
+        fast_ms = timed(
+            lambda: responses.orjson.dumps(payload, option=responses.orjson.OPT_SORT_KEYS), 20
+        ) if responses.orjson else float('nan')
+        print(f'{url:<58}{len(raw):>10}{gz:>10}{br:>10}{std_ms:>10.2f}{fast_ms:>11.2f}')
+
+    with app.app_context():
+        def orm():
+            return [f.to_dict() for f in Forecast.query.filter_by(user_id=user_id).limit(5000)]
+
+        def tuples():
+            return to_dicts(db.session.query(*columns(Forecast)).filter(Forecast.user_id == user_id).limit(5000))
+
+        print(f'\n5000 条预测记录序列化：to_dict {timed(orm, 5):.1f} ms，列元组 {timed(tuples, 5):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,14 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///consumer_analytics.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', 'false').lower() == 'true'  # 启动时 create_all，不经迁移
+    
+    # 连接池配置（SQLite 只使用 DB_POOL_PRE_PING）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))  # 常驻连接数
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))  # 高峰时额外允许的连接数
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # 等待空闲连接的秒数
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # 连接最长复用秒数，-1 为不回收
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # 取连接前探活
     
     # JWT 配置
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
@@ -24,10 +32,42 @@ class Config:
     # 文件上传配置
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
-    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'csv,xlsx,xls').split(','))
+    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'csv,xlsx,xls,parquet,arrow').split(','))
+    
+    # 导入配置
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 5000))  # 每批 INSERT 行数
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 50000))  # 每次读取并提交的行数
+    IMPORT_ASYNC = os.getenv('IMPORT_ASYNC', 'true').lower() == 'true'  # 后台执行导入
+    IMPORT_MAX_WORKERS = int(os.getenv('IMPORT_MAX_WORKERS', 2))  # 同时执行的导入任务数
+    IMPORT_MAX_PENDING = int(os.getenv('IMPORT_MAX_PENDING', 8))  # 排队加执行中的任务上限
+    IMPORT_STALE_SECONDS = int(os.getenv('IMPORT_STALE_SECONDS', 1800))  # 排队或执行中的记录超过该时长未更新视为中断
+    
+    # 分析配置
+    STORAGE_TIMEZONE = os.getenv('STORAGE_TIMEZONE', 'Asia/Shanghai')  # 无时区消费时间按此时区解释
+    ANALYTICS_USE_ROLLUP = os.getenv('ANALYTICS_USE_ROLLUP', 'true').lower() == 'true'  # 优先读每日汇总表
+    ANALYTICS_CACHE_BACKEND = os.getenv('ANALYTICS_CACHE_BACKEND', 'memory')  # memory, sqlite, none
+    ANALYTICS_CACHE_PATH = os.getenv('ANALYTICS_CACHE_PATH', 'cache/analytics_cache.db')  # sqlite 后端文件
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYTICS_CACHE_MAX_ENTRIES', 2048))
+    ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 600))  # 秒
+    
+    # 列式快照配置
+    SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'true').lower() == 'true'  # 关闭时每次从数据库读取
+    SNAPSHOT_FOLDER = os.getenv('SNAPSHOT_FOLDER', 'snapshots')  # 每用户 .npy 快照目录
+    
+    # 数据变更推送（SSE）
+    SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 2))  # 轮询版本标识的间隔（秒）
+    SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', 15))  # 空闲连接心跳间隔（秒）
+    SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', 2000))  # 每进程最大连接数
+    
+    # 响应压缩配置
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # 小于此字节数不压缩
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))  # gzip 1~9 / brotli 0~11
+    COMPRESS_MIMETYPES = ['application/json', 'text/csv', 'text/plain', 'text/html']
     
     # 导出配置
     EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', 'exports')
+    EXPORT_XLSX_MAX_ROWS = int(os.getenv('EXPORT_XLSX_MAX_ROWS', 100000))  # XLSX 导出行数上限，更多时改用 CSV/Parquet
     
     # 报告配置
     REPORT_FOLDER = os.getenv('REPORT_FOLDER', 'reports')
@@ -55,6 +95,17 @@ class Config:
         os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
         os.makedirs(app.config['MODEL_FOLDER'], exist_ok=True)
         os.makedirs(os.path.dirname(app.config['LOG_FILE']), exist_ok=True)
+        
+        # 连接池参数
+        engine_options = {'pool_pre_ping': app.config['DB_POOL_PRE_PING']}
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            engine_options.update(
+                pool_size=app.config['DB_POOL_SIZE'],
+                max_overflow=app.config['DB_MAX_OVERFLOW'],
+                pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                pool_recycle=app.config['DB_POOL_RECYCLE']
+            )
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
 
 
 class DevelopmentConfig(Config):
@@ -73,6 +124,8 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
+    AUTO_CREATE_TABLES = True
+    IMPORT_ASYNC = False
 
 
 # 配置字典
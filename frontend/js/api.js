@@ -4,9 +4,13 @@ const API_BASE_URL = 'http://localhost:5000/api';
 // 存储 token
 let accessToken = localStorage.getItem('access_token');
 
+// GET 响应的 ETag 与数据，数据未变时服务端返回 304，直接使用缓存
+const etagCache = new Map();
+
 // API 请求封装
 async function apiRequest(endpoint, options = {}) {
     const url = `${API_BASE_URL}${endpoint}`;
+    const isGet = !options.method || options.method === 'GET';
     
     const headers = {
         'Content-Type': 'application/json',
@@ -18,6 +22,11 @@ async function apiRequest(endpoint, options = {}) {
         headers['Authorization'] = `Bearer ${accessToken}`;
     }
     
+    const cached = isGet ? etagCache.get(url) : null;
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
     const config = {
         ...options,
         headers
@@ -25,8 +34,17 @@ async function apiRequest(endpoint, options = {}) {
     
     try {
         const response = await fetch(url, config);
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        
         const data = await response.json();
         
+        const etag = response.headers.get('ETag');
+        if (isGet && response.ok && etag) {
+            etagCache.set(url, { etag, data });
+        }
+        
         if (!response.ok) {
             throw new Error(data.error || data.message || '请求失败');
         }
@@ -48,6 +66,7 @@ const authAPI = {
         
         if (data.access_token) {
             accessToken = data.access_token;
+            etagCache.clear();
             localStorage.setItem('access_token', accessToken);
             localStorage.setItem('user', JSON.stringify(data.user));
         }
@@ -68,6 +87,7 @@ const authAPI = {
     
     logout() {
         accessToken = null;
+        etagCache.clear();
         localStorage.removeItem('access_token');
         localStorage.removeItem('user');
     }
@@ -75,15 +95,20 @@ const authAPI = {
 
 // 数据 API
 const dataAPI = {
-    async importData(file) {
+    async importData(file, idempotencyKey = null) {
         const formData = new FormData();
         formData.append('file', file);
         
+        const headers = {
+            'Authorization': `Bearer ${accessToken}`
+        };
+        if (idempotencyKey) {
+            headers['Idempotency-Key'] = idempotencyKey;
+        }
+        
         const response = await fetch(`${API_BASE_URL}/data/import`, {
             method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${accessToken}`
-            },
+            headers,
             body: formData
         });
         
@@ -105,17 +130,33 @@ const dataAPI = {
         a.click();
     },
     
-    async getImportRecords(page = 1) {
-        return await apiRequest(`/data/imports?page=${page}`);
+    async getImportRecords(cursor = null, limit = 20) {
+        let url = `/data/imports?limit=${limit}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        return await apiRequest(url);
+    },
+    
+    // 检索消费记录：params 可含 q、start_date、end_date、category_id、min_amount、max_amount、fields、limit、cursor
+    async searchExpenses(params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== null && value !== undefined && value !== '') query.append(key, value);
+        });
+        return await apiRequest(`/data/expenses?${query.toString()}`);
+    },
+    
+    async getImportStatus(importId) {
+        return await apiRequest(`/data/imports/${importId}`);
     }
 };
 
 // 分析 API
 const analyticsAPI = {
-    async getTrend(period = 'month', startDate = null, endDate = null) {
+    async getTrend(period = 'month', startDate = null, endDate = null, maxPoints = null) {
         let url = `/analytics/trend?period=${period}`;
         if (startDate) url += `&start_date=${startDate}`;
         if (endDate) url += `&end_date=${endDate}`;
+        if (maxPoints) url += `&max_points=${maxPoints}`;
         return await apiRequest(url);
     },
     
@@ -128,12 +169,14 @@ const analyticsAPI = {
         return await apiRequest(url);
     },
     
-    async getAmountHistogram(bins = 10) {
-        return await apiRequest(`/analytics/amount-hist?bins=${bins}`);
+    async getAmountHistogram(bins = 10, scale = 'linear') {
+        return await apiRequest(`/analytics/amount-hist?bins=${bins}&scale=${scale}`);
     },
     
-    async getHeatmap() {
-        return await apiRequest('/analytics/heatmap');
+    async getHeatmap(zoom = 4, bbox = null) {
+        let url = `/analytics/heatmap?zoom=${zoom}`;
+        if (bbox) url += `&bbox=${bbox.join(',')}`;
+        return await apiRequest(url);
     },
     
     async getTimeRadar(dimension = 'hour') {
@@ -150,21 +193,34 @@ const analyticsAPI = {
     
     async getRank(rankBy = 'category', topN = 10) {
         return await apiRequest(`/analytics/rank?rank_by=${rankBy}&top_n=${topN}`);
+    },
+    
+    async getCompare(startDate = null, endDate = null, offsets = ['1m', '1y'], period = 'day') {
+        let url = `/analytics/compare?period=${period}&offsets=${offsets.join(',')}`;
+        if (startDate) url += `&start_date=${startDate}`;
+        if (endDate) url += `&end_date=${endDate}`;
+        return await apiRequest(url);
+    },
+    
+    async getDashboard(widgets = ['trend', 'category-share', 'rank', 'anomaly']) {
+        return await apiRequest(`/analytics/dashboard?widgets=${widgets.join(',')}`);
     }
 };
 
 // 预测 API
 const forecastAPI = {
-    async predict(period = 'month', days = 30) {
-        return await apiRequest(`/forecast/predict?period=${period}&days=${days}`);
+    async predict(period = 'month', days = 30, model = 'auto', confidence = 95) {
+        return await apiRequest(`/forecast/predict?period=${period}&days=${days}&model=${model}&confidence=${confidence}`);
     },
     
     async detectAnomaly(method = 'isolation_forest') {
         return await apiRequest(`/forecast/anomaly?method=${method}`);
     },
     
-    async getHistory(page = 1) {
-        return await apiRequest(`/forecast/history?page=${page}`);
+    async getHistory(cursor = null, limit = 20) {
+        let url = `/forecast/history?limit=${limit}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        return await apiRequest(url);
     }
 };
 
@@ -177,8 +233,10 @@ const reportsAPI = {
         });
     },
     
-    async getReports(page = 1) {
-        return await apiRequest(`/reports/?page=${page}`);
+    async getReports(cursor = null, limit = 20) {
+        let url = `/reports/?limit=${limit}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        return await apiRequest(url);
     },
     
     async download(reportId) {
@@ -211,3 +269,55 @@ const settingsAPI = {
     }
 };
 
+// 数据变更推送 API（SSE，使用 fetch 读取流以便携带 Authorization 头）
+const eventsAPI = {
+    subscribe(onChange) {
+        const controller = new AbortController();
+        let retryMs = 5000;
+        
+        const dispatch = (block) => {
+            let event = 'message';
+            const dataLines = [];
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                else if (line.startsWith('retry:')) retryMs = parseInt(line.slice(6), 10) || retryMs;
+            }
+            if (event === 'change' && dataLines.length) {
+                onChange(JSON.parse(dataLines.join('\n')));
+            }
+        };
+        
+        const connect = async () => {
+            try {
+                const response = await fetch(`${API_BASE_URL}/events/stream`, {
+                    headers: { 'Authorization': `Bearer ${accessToken}` },
+                    signal: controller.signal
+                });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                
+                const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    let index;
+                    while ((index = buffer.indexOf('\n\n')) >= 0) {
+                        dispatch(buffer.slice(0, index));
+                        buffer = buffer.slice(index + 2);
+                    }
+                }
+            } catch (error) {
+                if (controller.signal.aborted) return;
+                console.error('数据变更推送断开:', error);
+            }
+            if (!controller.signal.aborted) {
+                setTimeout(connect, retryMs);
+            }
+        };
+        
+        connect();
+        return () => controller.abort();
+    }
+};
@@ -56,6 +56,7 @@ document.getElementById('login-form').addEventListener('submit', async (e) => {
         showApp();
         updateUserInfo(data.user);
         loadDashboard();
+        startLiveUpdates();
     } catch (error) {
         showMessage('登录失败: ' + error.message, 'error');
     }
@@ -98,6 +99,7 @@ document.getElementById('show-login').addEventListener('click', (e) => {
 // 退出登录
 document.getElementById('logout-btn').addEventListener('click', (e) => {
     e.preventDefault();
+    endLiveUpdates();
     authAPI.logout();
     showLoginPage();
     showMessage('已退出登录', 'success');
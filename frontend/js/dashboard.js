@@ -4,24 +4,31 @@ let trendChart = null;
 let categoryChart = null;
 let rankChart = null;
 
-// 加载仪表盘
-async function loadDashboard() {
+// 仪表盘图表及其加载函数
+const dashboardWidgets = {
+    'trend': (data) => loadTrendChart(data),
+    'category-share': (data) => loadCategoryChart(data),
+    'rank': (data) => loadRankChart(data),
+    'anomaly': (data) => loadAnomalies(data)
+};
+
+// 加载仪表盘（可只加载指定图表）
+async function loadDashboard(names = Object.keys(dashboardWidgets)) {
     try {
-        await Promise.all([
-            loadTrendChart(),
-            loadCategoryChart(),
-            loadRankChart(),
-            loadAnomalies()
-        ]);
+        // 一次请求取回所需图表数据
+        const data = await analyticsAPI.getDashboard(names);
+        const widgets = data.widgets;
+        
+        await Promise.all(names.map(name => dashboardWidgets[name](widgets[name])));
     } catch (error) {
         console.error('加载仪表盘失败:', error);
     }
 }
 
 // 加载消费趋势图
-async function loadTrendChart() {
+async function loadTrendChart(data) {
     try {
-        const data = await analyticsAPI.getTrend('month');
+        data = data || await analyticsAPI.getTrend('month');
         
         const ctx = document.getElementById('trend-chart');
         if (!ctx) return;
@@ -64,9 +71,9 @@ async function loadTrendChart() {
 }
 
 // 加载类别占比图
-async function loadCategoryChart() {
+async function loadCategoryChart(data) {
     try {
-        const data = await analyticsAPI.getCategoryShare();
+        data = data || await analyticsAPI.getCategoryShare();
         
         const ctx = document.getElementById('category-chart');
         if (!ctx) return;
@@ -108,9 +115,9 @@ async function loadCategoryChart() {
 }
 
 // 加载排行榜图
-async function loadRankChart() {
+async function loadRankChart(data) {
     try {
-        const data = await analyticsAPI.getRank('category', 10);
+        data = data || await analyticsAPI.getRank('category', 10);
         
         const ctx = document.getElementById('rank-chart');
         if (!ctx) return;
@@ -152,9 +159,10 @@ async function loadRankChart() {
 }
 
 // 加载异常检测
-async function loadAnomalies() {
+async function loadAnomalies(data) {
     try {
-        const data = await forecastAPI.detectAnomaly('isolation_forest');
+        data = data || await forecastAPI.detectAnomaly('isolation_forest');
+        if (data.error) throw new Error(data.message || data.error);
         
         const container = document.getElementById('anomaly-list');
         if (!container) return;
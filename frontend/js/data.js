@@ -21,13 +21,38 @@ document.getElementById('import-form').addEventListener('submit', async (e) => {
     resultDiv.innerHTML = '<p class="loading">正在上传...</p>';
     
     try {
-        const data = await dataAPI.importData(file);
+        // 每次提交生成一个幂等键，网络重试时服务端返回同一导入结果
+        const idempotencyKey = crypto.randomUUID();
+        let data = await dataAPI.importData(file, idempotencyKey);
+        
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        
+        // 后台导入：轮询进度直到完成
+        while (['pending', 'processing'].includes(data.import_record.status)) {
+            const percent = data.progress != null ? Math.round(data.progress * 100) : null;
+            resultDiv.innerHTML = `
+                <p class="loading">
+                    正在导入... 已处理 ${data.import_record.rows_total || 0} 行
+                    ${percent != null ? `(${percent}%)` : ''}
+                    ${data.eta_sec != null ? `，预计剩余 ${Math.ceil(data.eta_sec)} 秒` : ''}
+                </p>
+            `;
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            data = await dataAPI.getImportStatus(data.import_record.id);
+        }
+        
+        if (data.import_record.status === 'failed') {
+            throw new Error(data.import_record.error_message || '导入失败');
+        }
         
         let html = `
             <div class="success-message">
-                <p>导入完成！</p>
+                <p>${data.duplicate ? '该文件已导入过，显示上次的导入结果' : '导入完成！'}</p>
                 <p>总行数: ${data.import_record.rows_total}</p>
                 <p>成功: ${data.import_record.rows_success}</p>
+                <p>重复跳过: ${data.import_record.rows_duplicate || 0}</p>
                 <p>失败: ${data.import_record.rows_failed}</p>
             </div>
         `;
@@ -71,12 +71,54 @@ function loadPageData(pageName) {
     }
 }
 
+// 数据变更推送
+let stopLiveUpdates = null;
+
+// 当前页面受变更影响时只重新加载相关部分
+function handleDataChange(change) {
+    const active = document.querySelector('.page.active');
+    if (!active) return;
+    const widgets = new Set(change.widgets);
+    
+    switch (active.id) {
+        case 'dashboard-page': {
+            const names = Object.keys(dashboardWidgets).filter(name => widgets.has(name));
+            if (names.length) loadDashboard(names);
+            break;
+        }
+        case 'analytics-page':
+            if (['time-radar', 'amount-hist', 'heatmap', 'level-scatter'].some(name => widgets.has(name))) {
+                loadAnalytics();
+            }
+            break;
+        case 'data-page':
+            if (widgets.has('imports')) loadImportRecords();
+            break;
+        case 'reports-page':
+            if (widgets.has('reports')) loadReportsList();
+            break;
+    }
+}
+
+function startLiveUpdates() {
+    if (stopLiveUpdates) stopLiveUpdates();
+    stopLiveUpdates = eventsAPI.subscribe(handleDataChange);
+}
+
+function endLiveUpdates() {
+    if (stopLiveUpdates) {
+        stopLiveUpdates();
+        stopLiveUpdates = null;
+    }
+}
+
 // 初始化应用
 function initApp() {
     // 检查登录状态
     if (checkAuth()) {
         // 加载仪表盘
         loadDashboard();
+        startLiveUpdates();
     }
 }
 
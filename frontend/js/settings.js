@@ -8,6 +8,7 @@ async function loadSettingsPage() {
         // 填充表单
         document.getElementById('theme-select').value = data.settings.theme || 'light';
         document.getElementById('refresh-interval').value = data.settings.refresh_interval_sec || 300;
+        document.getElementById('timezone-input').value = data.settings.timezone || '';
         
         // 应用主题
         applyTheme(data.settings.theme);
@@ -23,11 +24,13 @@ document.getElementById('settings-form').addEventListener('submit', async (e) =>
     
     const theme = document.getElementById('theme-select').value;
     const refreshInterval = parseInt(document.getElementById('refresh-interval').value);
+    const timezone = document.getElementById('timezone-input').value.trim();
     
     try {
         await settingsAPI.updateSettings({
             theme: theme,
-            refresh_interval_sec: refreshInterval
+            refresh_interval_sec: refreshInterval,
+            timezone: timezone
         });
         
         showMessage('设置保存成功！', 'success');
@@ -1,4 +1,6 @@
 """数据库初始化脚本"""
+from alembic import command
+from alembic.config import Config as AlembicConfig
 from app import create_app, db
 from app.models import User, Category
 
@@ -7,10 +9,10 @@ def init_database():
     app = create_app('development')
     
     with app.app_context():
-        # 创建所有表
-        print('创建数据库表...')
-        db.create_all()
-        print('✓ 数据库表创建成功')
+        # 执行数据库迁移（创建或升级所有表）
+        print('执行数据库迁移...')
+        command.upgrade(AlembicConfig('alembic.ini'), 'head')
+        print('✓ 数据库表结构已是最新')
         
         # 创建默认类别
         print('创建默认类别...')
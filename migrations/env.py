@@ -0,0 +1,64 @@
+"""Alembic 迁移环境
+
+通过应用工厂加载配置与模型，迁移使用应用的数据库连接和 db.metadata。
+在已有应用上下文中调用（如 init_db.py）时直接使用当前应用。
+"""
+import os
+from logging.config import fileConfig
+from alembic import context
+from flask import current_app, has_app_context
+from app import create_app, db
+import app.models  # noqa: F401  注册全部模型
+
+config = context.config
+if config.config_file_name is not None and not has_app_context():
+    fileConfig(config.config_file_name)
+
+if has_app_context():
+    flask_app = current_app._get_current_object()
+else:
+    flask_app = create_app(os.getenv('FLASK_ENV', 'development'))
+target_metadata = db.metadata
+
+
+def include_name(name, type_, parent_names):
+    """忽略检索服务自行维护的 FTS 表与 trigram 索引"""
+    from app.services.search import MANAGED_NAMES
+    return name not in MANAGED_NAMES
+
+
+def run_migrations_offline():
+    """离线模式：只输出 SQL"""
+    with flask_app.app_context():
+        url = db.engine.url.render_as_string(hide_password=False)
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=url.startswith('sqlite'),
+        include_name=include_name
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """在线模式：连接数据库执行迁移"""
+    with flask_app.app_context():
+        with db.engine.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                # SQLite 不支持大部分 ALTER TABLE，按批处理方式重建表
+                render_as_batch=connection.dialect.name == 'sqlite',
+                compare_type=True,
+                include_name=include_name
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
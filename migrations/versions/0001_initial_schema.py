@@ -0,0 +1,176 @@
+"""初始表结构
+
+与引入迁移之前由 db.create_all() 创建的表结构一致，此类数据库执行
+alembic stamp 0001 后即可按顺序升级。
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 15:55:35.232008
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('code', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['categories.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('code')
+    )
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_categories_name'), ['name'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('email', sa.String(length=120), nullable=True),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_phone'), ['phone'], unique=True)
+
+    op.create_table('expenses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('location_lat', sa.Float(), nullable=True),
+    sa.Column('location_lon', sa.Float(), nullable=True),
+    sa.Column('location_text', sa.String(length=200), nullable=True),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_expenses_category_id'), ['category_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_expenses_time'), ['time'], unique=False)
+        batch_op.create_index(batch_op.f('ix_expenses_user_id'), ['user_id'], unique=False)
+
+    op.create_table('forecasts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=20), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('predicted_amount', sa.Float(), nullable=False),
+    sa.Column('model_version', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('forecasts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_forecasts_date'), ['date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_forecasts_user_id'), ['user_id'], unique=False)
+
+    op.create_table('import_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('rows_total', sa.Integer(), nullable=True),
+    sa.Column('rows_success', sa.Integer(), nullable=True),
+    sa.Column('rows_failed', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('error_report_path', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_import_records_user_id'), ['user_id'], unique=False)
+
+    op.create_table('login_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('login_time', sa.DateTime(), nullable=False),
+    sa.Column('ip', sa.String(length=50), nullable=True),
+    sa.Column('ua', sa.String(length=500), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('login_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_login_logs_login_time'), ['login_time'], unique=False)
+        batch_op.create_index(batch_op.f('ix_login_logs_user_id'), ['user_id'], unique=False)
+
+    op.create_table('reports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=False),
+    sa.Column('format', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reports_user_id'), ['user_id'], unique=False)
+
+    op.create_table('settings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('theme', sa.String(length=50), nullable=True),
+    sa.Column('chart_prefs', sa.Text(), nullable=True),
+    sa.Column('refresh_interval_sec', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_settings_user_id'), ['user_id'], unique=True)
+
+
+
+def downgrade():
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_settings_user_id'))
+
+    op.drop_table('settings')
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_user_id'))
+
+    op.drop_table('reports')
+    with op.batch_alter_table('login_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_login_logs_user_id'))
+        batch_op.drop_index(batch_op.f('ix_login_logs_login_time'))
+
+    op.drop_table('login_logs')
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_import_records_user_id'))
+
+    op.drop_table('import_records')
+    with op.batch_alter_table('forecasts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_forecasts_user_id'))
+        batch_op.drop_index(batch_op.f('ix_forecasts_date'))
+
+    op.drop_table('forecasts')
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_expenses_user_id'))
+        batch_op.drop_index(batch_op.f('ix_expenses_time'))
+        batch_op.drop_index(batch_op.f('ix_expenses_category_id'))
+
+    op.drop_table('expenses')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_phone'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_categories_name'))
+
+    op.drop_table('categories')
@@ -0,0 +1,25 @@
+"""导入记录吞吐量
+
+导入完成后记录每秒处理行数。
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 18:05:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rows_per_sec', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.drop_column('rows_per_sec')
@@ -0,0 +1,27 @@
+"""导入进度
+
+后台导入需要预估总行数以计算进度，失败时保存错误信息。
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-18 18:05:01.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001b'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rows_expected', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('error_message', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.drop_column('error_message')
+        batch_op.drop_column('rows_expected')
@@ -0,0 +1,42 @@
+"""导入去重
+
+消费记录的行指纹（同一用户内唯一），导入记录的文件哈希、幂等键与重复行数。
+已有记录的指纹为空，不参与去重。
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-18 18:05:02.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001c'
+down_revision = '0001b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=40), nullable=True))
+        batch_op.create_index('ix_expenses_user_fingerprint', ['user_id', 'fingerprint'], unique=True)
+
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rows_duplicate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=128), nullable=True))
+        batch_op.create_index(batch_op.f('ix_import_records_content_hash'), ['content_hash'], unique=False)
+        batch_op.create_index('ix_import_records_user_idempotency', ['user_id', 'idempotency_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_import_records_user_idempotency')
+        batch_op.drop_index(batch_op.f('ix_import_records_content_hash'))
+        batch_op.drop_column('idempotency_key')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('rows_duplicate')
+
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_user_fingerprint')
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,41 @@
+"""每日汇总表
+
+升级后执行 flask rebuild-rollups 回填已有消费记录的汇总。
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2026-10-18 18:05:03.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001d'
+down_revision = '0001c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('min_amount', sa.Float(), nullable=True),
+    sa.Column('max_amount', sa.Float(), nullable=True),
+    sa.Column('hour_totals', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('daily_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_rollups_user_day', ['user_id', 'day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_rollups_user_day')
+
+    op.drop_table('daily_rollups')
@@ -0,0 +1,25 @@
+"""用户数据版本号
+
+分析结果缓存按数据版本号失效，已有用户从 0 开始。
+
+Revision ID: 0001e
+Revises: 0001d
+Create Date: 2026-10-18 18:05:04.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001e'
+down_revision = '0001d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,23 @@
+"""用户时区设置
+
+Revision ID: 0001f
+Revises: 0001e
+Create Date: 2026-10-18 18:05:05.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001f'
+down_revision = '0001e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('settings', schema=None) as batch_op:
+        batch_op.drop_column('timezone')
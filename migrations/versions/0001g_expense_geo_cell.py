@@ -0,0 +1,27 @@
+"""消费记录空间网格
+
+升级后执行 flask backfill-geo-cells 为已有经纬度的记录补算网格编号。
+
+Revision ID: 0001g
+Revises: 0001f
+Create Date: 2026-10-18 18:05:06.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001g'
+down_revision = '0001f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geo_cell', sa.BigInteger(), nullable=True))
+        batch_op.create_index('ix_expenses_user_geo_cell', ['user_id', 'geo_cell'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_user_geo_cell')
+        batch_op.drop_column('geo_cell')
@@ -0,0 +1,35 @@
+"""类别闭包表
+
+升级后执行 flask rebuild-category-closure 按已有类别生成闭包。
+
+Revision ID: 0001h
+Revises: 0001g
+Create Date: 2026-10-18 18:05:07.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001h'
+down_revision = '0001g'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    with op.batch_alter_table('category_closure', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_category_closure_descendant_id'), ['descendant_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('category_closure', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_category_closure_descendant_id'))
+
+    op.drop_table('category_closure')
@@ -0,0 +1,32 @@
+"""消费记录联合索引
+
+分析与导出查询均按 user_id 等值、time 区间过滤，再按日期或类别分组。
+单列索引只能用上其中一列，改为 (user_id, time, amount) 与
+(user_id, category_id, time) 联合索引；前者以 user_id 开头，可替代原
+user_id 单列索引。
+
+Revision ID: 0002
+Revises: 0001h
+Create Date: 2026-10-18 15:55:50.466640
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001h'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index('ix_expenses_user_time', ['user_id', 'time', 'amount'], unique=False)
+        batch_op.create_index('ix_expenses_user_category_time', ['user_id', 'category_id', 'time'], unique=False)
+        batch_op.drop_index('ix_expenses_user_id')
+
+
+def downgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index('ix_expenses_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_expenses_user_category_time')
+        batch_op.drop_index('ix_expenses_user_time')
@@ -0,0 +1,26 @@
+"""用户 rewrite_version
+
+记录最近一次修改或删除已有消费记录时的数据版本号，列式快照据此判断能否
+只追加新记录。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:20:12.318402
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rewrite_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('rewrite_version')
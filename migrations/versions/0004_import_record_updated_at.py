@@ -0,0 +1,25 @@
+"""导入记录 updated_at
+
+导入记录列表的 ETag 需要感知状态与进度变化。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:48:37.902115
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,45 @@
+"""键集分页联合索引
+
+导入记录、报告与预测历史列表改为按 (排序列, id) 的键集分页，新增
+(user_id, created_at, id) / (user_id, date, id) 联合索引；它们以 user_id
+开头，可替代原 user_id 单列索引。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:06:16.766017
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.create_index('ix_import_records_user_created', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.drop_index('ix_import_records_user_id')
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index('ix_reports_user_created', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.drop_index('ix_reports_user_id')
+
+    with op.batch_alter_table('forecasts', schema=None) as batch_op:
+        batch_op.create_index('ix_forecasts_user_date', ['user_id', 'date', 'id'], unique=False)
+        batch_op.drop_index('ix_forecasts_user_id')
+
+
+def downgrade():
+    with op.batch_alter_table('forecasts', schema=None) as batch_op:
+        batch_op.create_index('ix_forecasts_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_forecasts_user_date')
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.create_index('ix_reports_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_reports_user_created')
+
+    with op.batch_alter_table('import_records', schema=None) as batch_op:
+        batch_op.create_index('ix_import_records_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_import_records_user_created')
@@ -0,0 +1,78 @@
+"""消费记录检索索引
+
+- (user_id, time, id) 联合索引：检索结果按 (time, id) 倒序键集分页
+- SQLite：FTS5 外部内容表 expenses_fts（trigram 分词）及同步触发器，并按
+  现有数据建立索引
+- PostgreSQL：pg_trgm 扩展与 note / location_text 的 GIN trigram 索引
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:21:44.105873
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5("
+    "note, location_text, content='expenses', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_ai AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO expenses_fts(rowid, note, location_text) VALUES (new.id, new.note, new.location_text); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_ad AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO expenses_fts(expenses_fts, rowid, note, location_text) "
+    "VALUES ('delete', old.id, old.note, old.location_text); END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_fts_au AFTER UPDATE OF note, location_text ON expenses BEGIN "
+    "INSERT INTO expenses_fts(expenses_fts, rowid, note, location_text) "
+    "VALUES ('delete', old.id, old.note, old.location_text); "
+    "INSERT INTO expenses_fts(rowid, note, location_text) VALUES (new.id, new.note, new.location_text); END",
+    "INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS expenses_fts_au',
+    'DROP TRIGGER IF EXISTS expenses_fts_ad',
+    'DROP TRIGGER IF EXISTS expenses_fts_ai',
+    'DROP TABLE IF EXISTS expenses_fts',
+]
+
+POSTGRESQL_UPGRADE = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_expenses_note_trgm ON expenses USING gin (note gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_expenses_location_text_trgm ON expenses USING gin (location_text gin_trgm_ops)',
+]
+
+POSTGRESQL_DOWNGRADE = [
+    'DROP INDEX IF EXISTS ix_expenses_location_text_trgm',
+    'DROP INDEX IF EXISTS ix_expenses_note_trgm',
+]
+
+
+def _execute(statements):
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade():
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.create_index('ix_expenses_user_time_id', ['user_id', 'time', 'id'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _execute(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        _execute(POSTGRESQL_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _execute(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        _execute(POSTGRESQL_DOWNGRADE)
+
+    with op.batch_alter_table('expenses', schema=None) as batch_op:
+        batch_op.drop_index('ix_expenses_user_time_id')
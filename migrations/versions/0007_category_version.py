@@ -0,0 +1,28 @@
+"""类别版本号
+
+单行表 category_version，类别增删改时递增，各进程的类别缓存据此失效。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 21:12:37.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table = op.create_table('category_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(table, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('category_version')
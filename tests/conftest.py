@@ -0,0 +1,112 @@
+"""测试夹具
+
+测试数据库为临时目录下的 SQLite 文件，表结构由 Alembic 迁移创建（与生产
+一致，包含迁移中的全部索引）。分析缓存与列式快照关闭，请求直接访问数据库。
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix='consumer-analytics-tests-')
+for _name, _folder in (('UPLOAD_FOLDER', 'uploads'), ('EXPORT_FOLDER', 'exports'),
+                       ('REPORT_FOLDER', 'reports'), ('MODEL_FOLDER', 'models'),
+                       ('SNAPSHOT_FOLDER', 'snapshots')):
+    os.environ[_name] = os.path.join(_workdir, _folder)
+os.environ['LOG_FILE'] = os.path.join(_workdir, 'logs', 'app.log')
+os.environ['LOG_LEVEL'] = 'WARNING'
+
+from alembic import command  # noqa: E402
+from alembic.config import Config as AlembicConfig  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+from config import TestingConfig  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(_workdir, "test.db")}'
+TestingConfig.AUTO_CREATE_TABLES = False
+TestingConfig.RATELIMIT_ENABLED = False
+TestingConfig.ANALYTICS_CACHE_BACKEND = 'none'
+TestingConfig.SNAPSHOT_ENABLED = False
+TestingConfig.COMPRESS_ENABLED = False
+
+EXPENSE_ROWS = 3000
+
+
+def seed(user_id, other_user_id):
+    """两个用户各自的消费记录，带多级类别、经纬度与备注"""
+    from app import db
+    from app.models import Category
+    from app.models.expense import Expense
+
+    parents = [Category(name=name, code=code) for name, code in (('餐饮', 'food'), ('交通', 'transport'))]
+    db.session.add_all(parents)
+    db.session.flush()
+    children = [Category(name=f'{parent.name}{i}', code=f'{parent.code}{i}', parent_id=parent.id)
+                for parent in parents for i in range(3)]
+    db.session.add_all(children)
+    db.session.flush()
+    category_ids = [category.id for category in parents + children]
+
+    rng = np.random.default_rng(7)
+    start = datetime.now() - timedelta(days=400)
+    rows = []
+    for owner in (user_id, other_user_id):
+        seconds = np.sort(rng.integers(0, 400 * 86400, EXPENSE_ROWS))
+        for i, second in enumerate(seconds):
+            rows.append({
+                'user_id': owner,
+                'time': start + timedelta(seconds=int(second)),
+                'amount': float(round(rng.lognormal(3, 1), 2)),
+                'category_id': int(category_ids[i % len(category_ids)]) if i % 11 else None,
+                'location_lat': float(rng.uniform(22, 40)),
+                'location_lon': float(rng.uniform(100, 122)),
+                'location_text': f'门店{i % 37}号',
+                'note': f'备注{i % 50} 午餐外卖' if i % 3 else '地铁通勤',
+            })
+    db.session.execute(Expense.__table__.insert(), rows)
+    db.session.commit()
+
+    from app.services.rollup import rebuild
+    from app.services.geogrid import backfill
+    from app.services.categories import rebuild_closure
+    rebuild_closure(db.session.connection())
+    db.session.commit()
+    for owner in (user_id, other_user_id):
+        backfill(owner)
+        rebuild(owner)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app, db
+    from app.models import User
+
+    app = create_app('testing')
+    with app.app_context():
+        alembic_config = AlembicConfig(os.path.join(ROOT, 'alembic.ini'))
+        alembic_config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+        command.upgrade(alembic_config, 'head')
+        users = [User(email=f'user{i}@example.com') for i in range(2)]
+        for user in users:
+            user.set_password('secret')
+        db.session.add_all(users)
+        db.session.commit()
+        seed(users[0].id, users[1].id)
+        app.config['TEST_USER_ID'] = users[0].id
+        app.config['OTHER_USER_ID'] = users[1].id
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    with app.app_context():
+        token = create_access_token(identity=app.config['TEST_USER_ID'])
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,20 @@
+"""分析接口"""
+import pytest
+
+
+@pytest.mark.parametrize('use_rollup', [True, False], ids=['rollup', 'raw'])
+@pytest.mark.parametrize('period', ['day', 'month', 'year'])
+def test_dashboard_trend_matches_trend_endpoint(app, client, auth_headers, period, use_rollup):
+    app.config['ANALYTICS_USE_ROLLUP'] = use_rollup
+    try:
+        trend = client.get(f'/api/analytics/trend?period={period}', headers=auth_headers).get_json()
+        dashboard = client.get(
+            f'/api/analytics/dashboard?widgets=trend&period={period}', headers=auth_headers
+        ).get_json()
+    finally:
+        app.config['ANALYTICS_USE_ROLLUP'] = True
+    widget = dashboard['widgets']['trend']
+    assert trend['data']
+    # 两条路径的浮点求和顺序不同，金额按近似比较
+    assert [point['date'] for point in widget['data']] == [point['date'] for point in trend['data']]
+    assert [point['amount'] for point in widget['data']] == pytest.approx([point['amount'] for point in trend['data']])
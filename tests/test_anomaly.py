@@ -0,0 +1,38 @@
+"""异常消费检测"""
+from sqlalchemy import event
+
+from app import db
+from app.models.expense import Expense
+from app.services import anomaly
+
+
+def test_notes_are_read_in_chunks(app, monkeypatch):
+    """异常记录多于单条语句的绑定参数上限时分批读取备注"""
+    monkeypatch.setattr(anomaly, '_IN_CHUNK', 100)
+    with app.app_context():
+        ids = [row.id for row in db.session.query(Expense.id).filter(
+            Expense.user_id == app.config['TEST_USER_ID']
+        ).order_by(Expense.id).limit(1050)]
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(len(parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            notes = anomaly._notes(ids)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert set(notes) == set(ids)
+    assert len(statements) == 11
+    assert max(statements) <= 100
+
+
+def test_isolation_forest_on_large_range(app):
+    """IsolationForest 标记 10% 的记录，备注读取不受绑定参数上限影响"""
+    with app.app_context():
+        columns = anomaly.snapshot_store.get(app.config['TEST_USER_ID'])
+        result = anomaly.detect(columns)
+    assert len(result['anomalies']) >= len(columns) // 20
+    assert any(row['note'] for row in result['anomalies'])
@@ -0,0 +1,130 @@
+"""时间分桶表达式在 SQLite 与 PostgreSQL 上的编译与结果"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import extract, literal, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import CompileError
+
+from app import db
+from app.models.expense import Expense
+from app.services import rollup
+from app.services.buckets import LABEL_FORMATS, bucket_date, bucket_label, date_bucket
+
+MOMENT = datetime(2024, 5, 17, 13, 45, 12)
+
+# 单位 -> (标签, PostgreSQL date_trunc 返回的时间)
+EXPECTED = {
+    'year': ('2024', datetime(2024, 1, 1)),
+    'month': ('2024-05', datetime(2024, 5, 1)),
+    'day': ('2024-05-17', datetime(2024, 5, 17)),
+    'hour': ('2024-05-17 13:00', datetime(2024, 5, 17, 13)),
+}
+
+DIALECTS = {
+    'sqlite': (sqlite.dialect(), "strftime('{format}', expenses.time)"),
+    'postgresql': (postgresql.dialect(), "date_trunc('{unit}', expenses.time)"),
+}
+
+
+def _sql(clause, dialect):
+    return str(clause.compile(dialect=dialect))
+
+
+@pytest.mark.parametrize('dialect', DIALECTS)
+@pytest.mark.parametrize('unit', LABEL_FORMATS)
+def test_date_bucket_compiles(dialect, unit):
+    compiler, template = DIALECTS[dialect]
+    expected = template.format(format=LABEL_FORMATS[unit], unit=unit)
+    assert _sql(date_bucket(Expense.__table__.c.time, unit), compiler) == expected
+
+
+def test_unsupported_dialect_and_unit():
+    with pytest.raises(CompileError):
+        _sql(date_bucket(Expense.__table__.c.time, 'day'), mysql.dialect())
+    with pytest.raises(ValueError):
+        date_bucket(Expense.__table__.c.time, 'week')
+
+
+@pytest.mark.parametrize('dialect', DIALECTS)
+@pytest.mark.parametrize('unit', LABEL_FORMATS)
+def test_bucket_label_is_identical_on_both_dialects(app, dialect, unit):
+    """SQLite 实际执行；PostgreSQL 的 date_trunc 结果为截断后的时间戳"""
+    label, truncated = EXPECTED[unit]
+    if dialect == 'sqlite':
+        with app.app_context():
+            value = db.session.execute(select(date_bucket(literal(MOMENT), unit))).scalar()
+    else:
+        value = truncated
+    assert bucket_label(value, unit) == label
+
+
+def test_units_do_not_share_cached_statements(app):
+    with app.app_context():
+        values = [
+            db.session.execute(select(date_bucket(literal(MOMENT), unit))).scalar()
+            for unit in LABEL_FORMATS
+        ]
+    assert values == [EXPECTED[unit][0] for unit in LABEL_FORMATS]
+
+
+@pytest.mark.parametrize('value', ['2024-05-17', datetime(2024, 5, 17), date(2024, 5, 17)])
+def test_bucket_date(value):
+    assert bucket_date(value) == date(2024, 5, 17)
+
+
+@pytest.mark.parametrize('dialect, expected', [
+    ('sqlite', "CAST(STRFTIME('%H', expenses.time) AS INTEGER)"),
+    ('postgresql', 'EXTRACT(hour FROM expenses.time)'),
+])
+def test_extract_hour_compiles(dialect, expected):
+    assert _sql(extract('hour', Expense.__table__.c.time), DIALECTS[dialect][0]) == expected
+
+
+def test_extract_hour_executes_on_sqlite(app):
+    with app.app_context():
+        assert db.session.execute(select(extract('hour', literal(MOMENT)))).scalar() == 13
+
+
+class _Capture:
+    """记录 _group_expenses 生成的查询，不执行"""
+
+    def __init__(self):
+        self.query = None
+
+    def execute(self, query):
+        self.query = query
+        return []
+
+
+@pytest.mark.parametrize('dialect', DIALECTS)
+def test_rollup_grouping_query_compiles(dialect):
+    capture = _Capture()
+    rollup._group_expenses(capture, 1, lower=datetime(2024, 1, 1), upper=datetime(2024, 2, 1))
+    sql = _sql(capture.query, DIALECTS[dialect][0])
+    if dialect == 'postgresql':
+        assert "date_trunc('day', expenses.time)" in sql
+        assert 'EXTRACT(hour FROM expenses.time)' in sql
+    else:
+        assert "strftime('%Y-%m-%d', expenses.time)" in sql
+        assert "STRFTIME('%H', expenses.time)" in sql
+
+
+def test_rollup_grouping_executes_on_sqlite(app):
+    """原始记录分组结果（日期、小时）与逐行计算一致"""
+    user_id = app.config['TEST_USER_ID']
+    lower = datetime.combine(date.today() - timedelta(days=60), datetime.min.time())
+    with app.app_context():
+        stats = rollup._group_expenses(db.session.connection(), user_id, lower=lower)
+        rows = db.session.query(Expense.time, Expense.amount, Expense.category_id).filter(
+            Expense.user_id == user_id, Expense.time >= lower
+        ).all()
+
+    expected = {}
+    for moment, amount, category_id in rows:
+        hours = expected.setdefault((moment.date(), category_id), [0.0] * 24)
+        hours[moment.hour] += amount
+    assert set(stats) == set(expected)
+    for key, stat in stats.items():
+        assert isinstance(stat.day, date)
+        assert stat.hour_totals == pytest.approx(expected[key])
@@ -0,0 +1,54 @@
+"""ETag 与条件 GET"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.services import cache
+from app.services.responses import ENCODINGS
+
+
+class Tomorrow(date):
+    @classmethod
+    def today(cls):
+        return date.today() + timedelta(days=1)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics/trend?period=day',
+    '/api/analytics/dashboard',
+    '/api/analytics/compare',
+    '/api/forecast/anomaly?method=zscore',
+])
+def test_relative_window_etag_changes_next_day(client, auth_headers, monkeypatch, url):
+    first = client.get(url, headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    same_day = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    assert same_day.status_code == 304
+
+    monkeypatch.setattr(cache, 'date', Tomorrow)
+    next_day = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    assert next_day.status_code == 200
+    assert next_day.headers['ETag'] != etag
+
+
+def test_explicit_range_etag_is_stable_across_days(client, auth_headers, monkeypatch):
+    url = '/api/analytics/trend?period=day&start_date=2025-01-01&end_date=2025-02-01'
+    etag = client.get(url, headers=auth_headers).headers['ETag']
+
+    monkeypatch.setattr(cache, 'date', Tomorrow)
+    response = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize('encoding', [None, *ENCODINGS])
+def test_not_modified_echoes_matched_etag(client, auth_headers, encoding):
+    """304 返回客户端持有的 ETag（含压缩编码后缀）"""
+    url = '/api/analytics/trend?period=month'
+    etag = client.get(url, headers=auth_headers).headers['ETag'].strip('"')
+    held = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+    response = client.get(url, headers={**auth_headers, 'If-None-Match': held})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == held
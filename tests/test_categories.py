@@ -0,0 +1,155 @@
+"""类别闭包维护与数据版本号"""
+import io
+
+from app import db
+from app.models import Category
+from app.models.category_closure import CategoryClosure
+from app.services.cache import get_data_version
+
+
+def import_csv(client, headers, text):
+    return client.post(
+        '/api/data/import', headers=headers,
+        data={'file': (io.BytesIO(text.encode('utf-8')), 'expenses.csv')},
+        content_type='multipart/form-data'
+    )
+
+
+def closure_of(category_id):
+    return sorted(
+        (row.ancestor_id, row.depth)
+        for row in CategoryClosure.query.filter_by(descendant_id=category_id)
+    )
+
+
+def test_import_with_new_category_only_bumps_importer(app, client, auth_headers):
+    user_id, other_id = app.config['TEST_USER_ID'], app.config['OTHER_USER_ID']
+    with app.app_context():
+        own_before, other_before = get_data_version(user_id), get_data_version(other_id)
+
+    response = import_csv(client, auth_headers, 'time,amount,category\n2025-05-01 12:00:00,18.5,新类别甲\n')
+    assert response.status_code in (200, 201, 202), response.get_json()
+
+    with app.app_context():
+        assert get_data_version(user_id) > own_before
+        assert get_data_version(other_id) == other_before
+        category = Category.query.filter_by(name='新类别甲').one()
+        assert closure_of(category.id) == [(category.id, 0)]
+
+
+def test_new_child_category_gets_ancestor_rows(app):
+    with app.app_context():
+        other_id = app.config['OTHER_USER_ID']
+        before = get_data_version(other_id)
+        parent = Category.query.filter_by(code='food').one()
+        child = Category(name='夜宵', code='food-night', parent_id=parent.id)
+        db.session.add(child)
+        db.session.commit()
+
+        assert closure_of(child.id) == sorted([(child.id, 0), (parent.id, 1)])
+        assert get_data_version(other_id) == before
+
+
+def test_moving_category_rebuilds_closure_and_bumps_all_users(app):
+    with app.app_context():
+        other_id = app.config['OTHER_USER_ID']
+        before = get_data_version(other_id)
+        food = Category.query.filter_by(code='food').one()
+        transport = Category.query.filter_by(code='transport').one()
+        child = Category.query.filter_by(code='food0').one()
+
+        child.parent_id = transport.id
+        db.session.commit()
+        assert closure_of(child.id) == sorted([(child.id, 0), (transport.id, 1)])
+        assert get_data_version(other_id) == before + 1
+
+        child.parent_id = food.id
+        db.session.commit()
+        assert closure_of(child.id) == sorted([(child.id, 0), (food.id, 1)])
+
+
+def test_renaming_category_bumps_all_users(app):
+    with app.app_context():
+        other_id = app.config['OTHER_USER_ID']
+        before = get_data_version(other_id)
+        category = Category.query.filter_by(code='transport0').one()
+        category.name = '交通零'
+        db.session.commit()
+        assert get_data_version(other_id) == before + 1
+
+
+def test_category_added_by_another_process_is_visible(app, client, auth_headers):
+    """其他进程新建类别并写入消费后，本进程的类别缓存按版本号重新加载"""
+    from app.services.categories import category_cache
+
+    user_id = app.config['TEST_USER_ID']
+    with app.app_context():
+        category_cache.name_to_id()
+        db.session.remove()
+        # 另一个连接模拟其他 worker，不经过本进程的 ORM 事件
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO categories (name, code) VALUES ('外部类别', 'external')")
+            category_id = connection.exec_driver_sql("SELECT id FROM categories WHERE code = 'external'").scalar()
+            connection.exec_driver_sql(
+                'INSERT INTO category_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)',
+                (category_id, category_id)
+            )
+            connection.exec_driver_sql('UPDATE category_version SET version = version + 1')
+            connection.exec_driver_sql(
+                'INSERT INTO expenses (user_id, time, amount, category_id, created_at) VALUES (?, ?, ?, ?, ?)',
+                (user_id, '2025-06-01 12:00:00.000000', 999999.0, category_id, '2025-06-01 12:00:00.000000')
+            )
+            connection.exec_driver_sql('UPDATE users SET data_version = data_version + 1 WHERE id = ?', (user_id,))
+
+    try:
+        app.config['ANALYTICS_USE_ROLLUP'] = False
+        url = '/api/analytics/rank?rank_by=category&start_date=2025-06-01&end_date=2025-06-02'
+        ranked = client.get(url, headers=auth_headers).get_json()['data']
+        assert ranked[0]['name'] == '外部类别'
+        share = client.get(
+            '/api/analytics/category-share?start_date=2025-06-01&end_date=2025-06-02', headers=auth_headers
+        ).get_json()
+        assert '外部类别' in [item['category'] for item in share['data']]
+        scatter = client.get(
+            '/api/analytics/level-scatter?start_date=2025-06-01&end_date=2025-06-02', headers=auth_headers
+        ).get_json()
+        assert scatter['data']
+    finally:
+        app.config['ANALYTICS_USE_ROLLUP'] = True
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('DELETE FROM expenses WHERE category_id = ?', (category_id,))
+                connection.exec_driver_sql('UPDATE users SET data_version = data_version + 1 WHERE id = ?', (user_id,))
+
+
+def test_unknown_category_id_reloads_cache(app):
+    from app.services.categories import category_cache
+
+    with app.app_context():
+        category_cache.name_to_id()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO categories (name, code) VALUES ('未同步类别', 'unsynced')")
+            category_id = connection.exec_driver_sql("SELECT id FROM categories WHERE code = 'unsynced'").scalar()
+    with app.app_context():
+        # 版本号未变时，未知 ID 也会触发一次重新加载
+        assert category_cache.name(category_id) == '未同步类别'
+        assert category_cache.ancestors(category_id) == [category_id]
+
+
+def test_rename_by_another_process_reloads_cache(app):
+    from app.services.categories import category_cache
+
+    with app.app_context():
+        category_id = Category.query.filter_by(code='transport1').one().id
+        assert category_cache.name(category_id) == '交通1'
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE categories SET name = '交通壹' WHERE id = ?", (category_id,))
+            connection.exec_driver_sql('UPDATE category_version SET version = version + 1')
+    try:
+        with app.app_context():
+            assert category_cache.name(category_id) == '交通壹'
+    finally:
+        with app.app_context():
+            category = db.session.get(Category, category_id)
+            category.name = '交通1'
+            db.session.commit()
@@ -0,0 +1,59 @@
+"""同比 / 环比区间"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.comparison import parse_offsets, periods, shift
+
+
+def _span(first_day, last_day, offsets):
+    return [(span[0], span[1], span[2]) for span in periods(first_day, last_day, parse_offsets(offsets))][1:]
+
+
+@pytest.mark.parametrize('first_day, last_day, offsets, expected', [
+    # 整月基准对比整月
+    (date(2025, 4, 1), date(2025, 4, 30), '1m', [('1m', date(2025, 3, 1), date(2025, 3, 31))]),
+    (date(2025, 3, 1), date(2025, 3, 31), '1m', [('1m', date(2025, 2, 1), date(2025, 2, 28))]),
+    (date(2025, 2, 1), date(2025, 2, 28), '1m', [('1m', date(2025, 1, 1), date(2025, 1, 31))]),
+    (date(2024, 3, 1), date(2024, 3, 31), '1m', [('1m', date(2024, 2, 1), date(2024, 2, 29))]),
+    # 闰年 2 月的去年同期与平年 2 月的去年同期
+    (date(2024, 2, 1), date(2024, 2, 29), '1y', [('1y', date(2023, 2, 1), date(2023, 2, 28))]),
+    (date(2025, 2, 1), date(2025, 2, 28), '1y', [('1y', date(2024, 2, 1), date(2024, 2, 29))]),
+    (date(2025, 1, 1), date(2025, 3, 31), '3m', [('3m', date(2024, 10, 1), date(2024, 12, 31))]),
+    # 非月末的结束日按天数截断
+    (date(2025, 4, 1), date(2025, 4, 15), '1m,1y', [
+        ('1m', date(2025, 3, 1), date(2025, 3, 15)),
+        ('1y', date(2024, 4, 1), date(2024, 4, 15)),
+    ]),
+    (date(2025, 3, 1), date(2025, 3, 30), '1m', [('1m', date(2025, 2, 1), date(2025, 2, 28))]),
+    (date(2025, 4, 1), date(2025, 4, 30), '7d', [('7d', date(2025, 3, 25), date(2025, 4, 23))]),
+])
+def test_periods(first_day, last_day, offsets, expected):
+    assert _span(first_day, last_day, offsets) == expected
+
+
+def test_shift_clamps_without_month_end():
+    assert shift(date(2025, 3, 31), -1, 'm') == date(2025, 2, 28)
+    assert shift(date(2025, 2, 28), 1, 'm') == date(2025, 3, 28)
+    assert shift(date(2025, 2, 28), 1, 'm', month_end=True) == date(2025, 3, 31)
+
+
+def test_full_month_comparison_covers_whole_previous_month(client, auth_headers):
+    last_day = date.today().replace(day=1) - timedelta(days=1)
+    first_day = last_day.replace(day=1)
+    previous_last = first_day - timedelta(days=1)
+    previous_first = previous_last.replace(day=1)
+
+    response = client.get(
+        f'/api/analytics/compare?start_date={first_day}&end_date={last_day}&offsets=1m',
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    result = response.get_json()['comparisons'][0]
+    assert (result['start_date'], result['end_date']) == (previous_first.isoformat(), previous_last.isoformat())
+
+    trend = client.get(
+        f'/api/analytics/trend?period=day&start_date={previous_first}&end_date={previous_last}T23:59:59.999999',
+        headers=auth_headers
+    ).get_json()
+    assert result['amount'] == pytest.approx(sum(point['amount'] for point in trend['data']), abs=0.05)
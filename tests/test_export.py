@@ -0,0 +1,24 @@
+"""数据导出"""
+import io
+
+from openpyxl import load_workbook
+
+
+def test_xlsx_export_within_limit(app, client, auth_headers):
+    response = client.get('/api/data/export?format=xlsx&start_date=2026-01-01', headers=auth_headers)
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.data), read_only=True).active
+    assert next(sheet.iter_rows(values_only=True))[0] == 'id'
+
+
+def test_xlsx_export_over_limit_is_refused(app, client, auth_headers):
+    app.config['EXPORT_XLSX_MAX_ROWS'] = 100
+    try:
+        response = client.get('/api/data/export?format=xlsx', headers=auth_headers)
+        csv = client.get('/api/data/export?format=csv', headers=auth_headers)
+    finally:
+        app.config['EXPORT_XLSX_MAX_ROWS'] = 100000
+    assert response.status_code == 400
+    assert response.get_json()['max_rows'] == 100
+    assert csv.status_code == 200
+    assert csv.data.count(b'\n') > 100
@@ -0,0 +1,25 @@
+"""消费预测接口"""
+from datetime import date, timedelta
+
+import pytest
+
+from app.routes import forecast as forecast_routes
+
+
+def test_historical_avg_counts_only_days_with_spending(client, auth_headers, monkeypatch):
+    last_day = date.today() - timedelta(days=1)
+    # 60 天内每 3 天有一笔消费，其余日期补 0 参与拟合
+    totals = {last_day - timedelta(days=i): 30.0 + i for i in range(0, 60, 3)}
+    monkeypatch.setattr(forecast_routes, 'daily_totals', lambda *args: totals)
+
+    response = client.get('/api/forecast/predict?days=7', headers=auth_headers)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['historical_avg'] == pytest.approx(sum(totals.values()) / len(totals), abs=0.01)
+    assert len(result['predictions']) == 7
+
+
+def test_predict_requires_two_weeks_of_history(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(forecast_routes, 'daily_totals', lambda *args: {date.today() - timedelta(days=1): 10.0})
+    response = client.get('/api/forecast/predict?days=7', headers=auth_headers)
+    assert response.status_code == 400
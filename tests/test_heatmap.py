@@ -0,0 +1,33 @@
+"""地点热力图"""
+import pytest
+
+from app.routes import analytics
+
+
+def test_high_zoom_requires_bbox(client, auth_headers):
+    response = client.get('/api/analytics/heatmap?zoom=12', headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics/heatmap?zoom=4',
+    '/api/analytics/heatmap?zoom=12&bbox=110,25,112,27',
+])
+def test_cells_are_within_viewport(client, auth_headers, url):
+    response = client.get(url, headers=auth_headers)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['data'] and result['truncated'] is False
+    if 'bbox' in url:
+        assert all(110 <= cell['lon'] <= 112 and 25 <= cell['lat'] <= 27 for cell in result['data'])
+
+
+def test_cell_count_is_capped(client, auth_headers, monkeypatch):
+    full = client.get('/api/analytics/heatmap?zoom=6', headers=auth_headers).get_json()['data']
+    monkeypatch.setattr(analytics, 'MAX_CELLS', 50)
+    result = client.get('/api/analytics/heatmap?zoom=6', headers=auth_headers).get_json()
+    assert result['truncated'] is True
+    assert len(result['data']) == 50
+    # 保留笔数最多的网格
+    counts = sorted((cell['count'] for cell in full), reverse=True)
+    assert [cell['count'] for cell in result['data']] == counts[:50]
@@ -0,0 +1,137 @@
+"""数据导入：时间解析与中断任务的恢复"""
+import hashlib
+import io
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from app import db
+from app.models.import_record import ImportRecord
+from app.services.importer import open_chunks, parse_frame
+from app.services.jobs import import_queue
+
+
+def _parse(app, tmp_path, lines):
+    path = tmp_path / 'expenses.csv'
+    path.write_text('time,amount\n' + '\n'.join(lines) + '\n', encoding='utf-8')
+    with app.app_context():
+        _, chunks = open_chunks(str(path), chunk_size=1000)
+        clean, errors = parse_frame(next(iter(chunks)))
+    return list(clean['time'].dt.to_pydatetime()), errors
+
+
+def test_offsets_across_dst_change(app, tmp_path):
+    """跨夏令时的导出：各行 UTC 偏移不同，换算到存储时区（Asia/Shanghai）"""
+    times, errors = _parse(app, tmp_path, [
+        '2024-03-30 10:00:00+01:00,12.5',
+        '2024-03-31 10:00:00+02:00,8',
+        '2024-10-27T09:30:00Z,3',
+    ])
+    assert errors == []
+    assert times == [datetime(2024, 3, 30, 17), datetime(2024, 3, 31, 16), datetime(2024, 10, 27, 17, 30)]
+
+
+def test_mixed_naive_and_offset_values(app, tmp_path):
+    """无时区的值视为存储时区时间，不做换算"""
+    times, errors = _parse(app, tmp_path, [
+        '2024-03-30 10:00:00,12.5',
+        '2024-03-31 10:00:00+02:00,8',
+        '2024/4/1 09:15,3',
+        '2024-04-02 08:00:00+0800,1',
+    ])
+    assert errors == []
+    assert times == [
+        datetime(2024, 3, 30, 10), datetime(2024, 3, 31, 16),
+        datetime(2024, 4, 1, 9, 15), datetime(2024, 4, 2, 8),
+    ]
+
+
+def test_unparseable_times_are_row_errors(app, tmp_path):
+    times, errors = _parse(app, tmp_path, [
+        '2024-03-30 10:00:00+01:00,12.5',
+        '2024-03-31 10:00:00,8',
+        'not a time,3',
+        '2024-13-45 10:00:00+02:00,1',
+    ])
+    assert times == [datetime(2024, 3, 30, 17), datetime(2024, 3, 31, 10)]
+    assert [error['row'] for error in errors] == [4, 5]
+    assert all(error['error'].startswith('时间格式错误') for error in errors)
+
+
+@pytest.mark.parametrize('values', [
+    [pd.Timestamp('2024-03-30 10:00', tz='Europe/Berlin'), pd.Timestamp('2024-03-31 10:00', tz='Europe/Berlin')],
+    [datetime(2024, 3, 30, 10), pd.Timestamp('2024-03-31 10:00', tz='Europe/Berlin')],
+])
+def test_datetime_objects(app, values):
+    """XLSX / Parquet 读出的时间对象"""
+    with app.app_context():
+        clean, errors = parse_frame(pd.DataFrame({'time': pd.Series(values, dtype=object), 'amount': [1, 2]}))
+    assert errors == []
+    assert clean['time'].iloc[1] == pd.Timestamp('2024-03-31 16:00')
+
+
+def _upload(client, headers, text, **extra_headers):
+    return client.post(
+        '/api/data/import', headers={**headers, **extra_headers},
+        data={'file': (io.BytesIO(text.encode('utf-8')), 'expenses.csv')},
+        content_type='multipart/form-data'
+    )
+
+
+def _stuck_record(app, text, minutes_ago, **fields):
+    stamp = datetime.utcnow() - timedelta(minutes=minutes_ago)
+    with app.app_context():
+        record = ImportRecord(
+            user_id=fields.pop('user_id', app.config['TEST_USER_ID']), filename='stuck.csv', status='processing',
+            content_hash=hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            created_at=stamp, updated_at=stamp, **fields
+        )
+        db.session.add(record)
+        db.session.commit()
+        return record.id
+
+
+def _status(app, record_id):
+    with app.app_context():
+        return db.session.get(ImportRecord, record_id).status
+
+
+def test_orphaned_import_does_not_block_reupload(app, client, auth_headers):
+    text = 'time,amount,note\n2025-07-01 08:00:00,11.5,中断后重传\n'
+    stuck = _stuck_record(app, text, minutes_ago=120)
+
+    response = _upload(client, auth_headers, text)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert not result.get('duplicate')
+    assert result['import_record']['rows_success'] == 1
+    assert _status(app, stuck) == 'failed'
+
+
+def test_orphaned_import_releases_idempotency_key(app, client, auth_headers):
+    text = 'time,amount,note\n2025-07-02 08:00:00,12.5,幂等键重试\n'
+    stuck = _stuck_record(app, text, minutes_ago=120, idempotency_key='retry-stuck')
+
+    response = _upload(client, auth_headers, text, **{'Idempotency-Key': 'retry-stuck'})
+    assert response.status_code == 200
+    assert response.get_json()['import_record']['id'] != stuck
+    assert _status(app, stuck) == 'failed'
+
+
+def test_running_import_is_still_deduplicated(app, client, auth_headers):
+    text = 'time,amount,note\n2025-07-03 08:00:00,13.5,正在导入\n'
+    running = _stuck_record(app, text, minutes_ago=1)
+
+    response = _upload(client, auth_headers, text)
+    assert response.status_code == 202
+    assert response.get_json()['import_record']['id'] == running
+    assert _status(app, running) == 'processing'
+
+
+def test_orphaned_imports_expire_at_startup(app):
+    stuck = _stuck_record(app, 'startup', minutes_ago=120, user_id=app.config['OTHER_USER_ID'])
+    running = _stuck_record(app, 'running', minutes_ago=1, user_id=app.config['OTHER_USER_ID'])
+    import_queue._expire_orphans(app)
+    assert _status(app, stuck) == 'failed'
+    assert _status(app, running) == 'processing'
@@ -0,0 +1,122 @@
+"""查询计划回归测试
+
+对每个分析、导出与检索接口，记录请求期间执行的 SELECT，用 EXPLAIN QUERY PLAN
+检查：消费记录与每日汇总表只能按索引查找（SEARCH），不能全表扫描（SCAN）。
+"""
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+# 数据量随用户增长、必须走索引的表
+LARGE_TABLES = ('expenses', 'daily_rollups')
+
+FULL_SCAN = re.compile(r'\bSCAN (%s)\b' % '|'.join(LARGE_TABLES))
+
+ANALYTICS_URLS = [
+    '/api/analytics/trend?period=month',
+    '/api/analytics/trend?period=day&start_date=2025-01-01T08:30:00&end_date=2025-03-01',
+    '/api/analytics/trend?period=year',
+    '/api/analytics/category-share',
+    '/api/analytics/category-share?start_date=2025-01-01&end_date=2025-06-30T12:00:00',
+    '/api/analytics/amount-hist?bins=20',
+    '/api/analytics/amount-hist?scale=quantile&start_date=2025-01-01',
+    '/api/analytics/heatmap?zoom=6',
+    '/api/analytics/heatmap?zoom=10&bbox=110,25,115,30',
+    '/api/analytics/time-radar?dimension=hour',
+    '/api/analytics/time-radar?dimension=weekday&start_date=2025-02-01',
+    '/api/analytics/behavior-tree',
+    '/api/analytics/level-scatter',
+    '/api/analytics/rank?rank_by=category',
+    '/api/analytics/rank?rank_by=day&top_n=5',
+    '/api/analytics/rank?rank_by=location',
+    '/api/analytics/compare?start_date=2025-03-01&end_date=2025-03-31&offsets=1m,1y',
+    '/api/analytics/dashboard',
+    '/api/forecast/anomaly?method=zscore',
+]
+
+EXPORT_URLS = [
+    '/api/data/export?format=csv',
+    '/api/data/export?format=csv&start_date=2025-01-01&end_date=2025-03-31',
+    '/api/data/export?format=parquet',
+    '/api/data/export?format=xlsx&start_date=2026-01-01',
+]
+
+SEARCH_URLS = [
+    '/api/data/expenses',
+    '/api/data/expenses?q=午餐外卖',
+    '/api/data/expenses?q=地铁&start_date=2025-01-01',
+    '/api/data/expenses?category_id=1&min_amount=10&max_amount=50',
+    '/api/data/expenses?q=门店&with_total=true',
+]
+
+
+@contextmanager
+def captured_selects():
+    """记录期间执行的 SELECT 语句与参数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')) and not executemany:
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_scans(statements):
+    """返回 [(语句, 全表扫描的计划行)]"""
+    problems = []
+    with db.engine.connect() as connection:
+        raw = connection.connection.driver_connection
+        for statement, parameters in statements:
+            plan = raw.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            details = [row[-1] for row in plan]
+            scans = [detail for detail in details if FULL_SCAN.search(detail)]
+            if scans:
+                problems.append((statement, scans))
+    return problems
+
+
+def assert_indexed(app, client, auth_headers, url, use_rollup):
+    app.config['ANALYTICS_USE_ROLLUP'] = use_rollup
+    try:
+        with app.app_context(), captured_selects() as statements:
+            response = client.get(url, headers=auth_headers)
+            response.get_data()  # 流式导出需读完响应体
+            assert response.status_code == 200, response.get_data(as_text=True)[:500]
+            assert statements, '请求没有执行查询'
+            problems = full_scans(statements)
+    finally:
+        app.config['ANALYTICS_USE_ROLLUP'] = True
+    assert not problems, '\n\n'.join(f'{statement}\n  -> {scans}' for statement, scans in problems)
+
+
+@pytest.mark.parametrize('use_rollup', [True, False], ids=['rollup', 'raw'])
+@pytest.mark.parametrize('url', ANALYTICS_URLS)
+def test_analytics_queries_use_indexes(app, client, auth_headers, url, use_rollup):
+    assert_indexed(app, client, auth_headers, url, use_rollup)
+
+
+@pytest.mark.parametrize('url', EXPORT_URLS)
+def test_export_queries_use_indexes(app, client, auth_headers, url):
+    assert_indexed(app, client, auth_headers, url, True)
+
+
+@pytest.mark.parametrize('url', SEARCH_URLS)
+def test_search_queries_use_indexes(app, client, auth_headers, url):
+    assert_indexed(app, client, auth_headers, url, True)
+
+
+def test_full_scan_is_detected(app):
+    """确认检测本身有效：不带 user_id 条件的查询应判为全表扫描"""
+    with app.app_context():
+        problems = full_scans([('SELECT sum(amount) FROM expenses WHERE note LIKE ?', ('%午餐%',))])
+    assert problems
@@ -0,0 +1,105 @@
+"""全文检索执行方式的选择"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, event, func, text
+
+from app import db
+from app.models.expense import Expense
+from app.services import search
+
+
+def _choice(condition):
+    return 'exists' if str(condition).startswith('EXISTS') else 'in'
+
+
+def _unbounded_choice(keyword, user_id, limit):
+    """以该用户的全部匹配数按原公式选择执行方式"""
+    phrase = '"' + keyword + '"'
+    matches = db.session.execute(
+        text(f'SELECT count(*) FROM {search.FTS_TABLE} JOIN expenses ON expenses.id = {search.FTS_TABLE}.rowid '
+             f'WHERE {search.FTS_TABLE} MATCH :phrase AND expenses.user_id = :user_id'),
+        {'phrase': phrase, 'user_id': user_id}
+    ).scalar()
+    rows = db.session.query(func.count(Expense.id)).filter(Expense.user_id == user_id).scalar()
+    return 'exists' if matches * matches > search.SCAN_COST_RATIO * (limit + 1) * rows else 'in'
+
+
+@pytest.mark.parametrize('keyword', ['午餐外卖', '地铁通勤', '门店12号', '备注7 ', '不存在的关键词'])
+@pytest.mark.parametrize('limit', [1, 20, 200])
+def test_bounded_match_count_keeps_plan_choice(app, keyword, limit):
+    user_id = app.config['TEST_USER_ID']
+    with app.app_context():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            condition = search._fts_condition(keyword, user_id, limit)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert _choice(condition) == _unbounded_choice(keyword, user_id, limit)
+        counts = [(statement, parameters) for statement, parameters in statements if search.FTS_TABLE in statement]
+        assert counts and all('LIMIT' in statement for statement, _ in counts)
+        # 外层遍历 FTS 匹配，明细表只按主键查找
+        for statement, parameters in counts:
+            plan = [row[3] for row in db.session.connection().exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + statement, parameters
+            )]
+            details = [detail for detail in plan if 'expenses' in detail]
+            assert details[0].startswith(f'SCAN {search.FTS_TABLE}')
+            assert any('INTEGER PRIMARY KEY' in detail for detail in details[1:])
+
+
+def test_with_total_skips_match_count(app):
+    with app.app_context():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            condition = search._fts_condition('午餐外卖', app.config['TEST_USER_ID'], 20, with_total=True)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert _choice(condition) == 'in'
+    assert not statements
+
+
+@pytest.fixture
+def other_users_keyword(app):
+    """只在另一个用户的记录中大量出现的关键词"""
+    table = Expense.__table__
+    with app.app_context():
+        db.session.execute(table.insert(), [{
+            'user_id': app.config['OTHER_USER_ID'], 'time': datetime(2025, 8, 1, 12), 'amount': 1.0,
+            'note': '别人的常用词', 'created_at': datetime(2025, 8, 1, 12)
+        }] * 2000)
+        db.session.commit()
+    yield '别人的常用词'
+    with app.app_context():
+        db.session.execute(delete(table).where(table.c.note == '别人的常用词'))
+        db.session.commit()
+
+
+def test_keyword_common_only_for_other_users_uses_in(app, other_users_keyword):
+    with app.app_context():
+        condition = search._fts_condition(other_users_keyword, app.config['TEST_USER_ID'], 20)
+        assert _choice(condition) == 'in'
+        condition = search._fts_condition(other_users_keyword, app.config['OTHER_USER_ID'], 20)
+        assert _choice(condition) == 'exists'
+
+
+def test_user_rows_fall_back_to_expenses_without_rollup(app):
+    user_id = app.config['TEST_USER_ID']
+    app.config['ANALYTICS_USE_ROLLUP'] = False
+    try:
+        with app.app_context():
+            rows = db.session.query(func.count(Expense.id)).filter(Expense.user_id == user_id).scalar()
+            assert search._user_rows(user_id) == rows
+    finally:
+        app.config['ANALYTICS_USE_ROLLUP'] = True
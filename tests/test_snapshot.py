@@ -0,0 +1,111 @@
+"""列式快照的校验与重建"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, func
+
+from app import db
+from app.models.expense import Expense
+from app.services import snapshot
+from app.services.cache import bump_data_version
+
+
+@pytest.fixture
+def store(app, tmp_path):
+    store = snapshot.SnapshotStore()
+    store.folder = str(tmp_path)
+    with app.app_context():
+        yield store
+
+
+def _expected(user_id):
+    return db.session.query(func.count(Expense.id), func.max(Expense.id)).filter(
+        Expense.user_id == user_id
+    ).one()
+
+
+def _meta(store, user_id, version):
+    return os.path.join(store._version_dir(user_id, version), snapshot.META_FILE)
+
+
+def test_snapshot_matches_database(app, store):
+    user_id = app.config['TEST_USER_ID']
+    result = store.get(user_id)
+    rows, max_id = _expected(user_id)
+    assert len(result) == rows
+    assert int(result.id.max()) == max_id
+    with open(_meta(store, user_id, result.version)) as f:
+        meta = json.load(f)
+    assert meta['database'] == snapshot.database_id()
+    assert (meta['rows'], meta['max_id']) == (rows, max_id)
+
+
+def test_folder_is_keyed_by_database(app, store, monkeypatch):
+    user_id = app.config['TEST_USER_ID']
+    first = store._version_dir(user_id, 0)
+    monkeypatch.setattr(snapshot, 'database_id', lambda: 'other-database')
+    assert store._version_dir(user_id, 0) != first
+
+
+def test_stale_snapshot_with_same_version_is_rebuilt(app, store):
+    """磁盘上同一版本号的快照行数与数据库不符时不使用"""
+    user_id = app.config['TEST_USER_ID']
+    version = store.get(user_id).version
+    path = store._version_dir(user_id, version)
+
+    # 模拟换库后遗留的同版本快照：只有 10 行
+    for name in snapshot.COLUMNS:
+        values = np.load(os.path.join(path, f'{name}.npy'))
+        np.save(os.path.join(path, f'{name}.npy'), values[:10])
+    with open(_meta(store, user_id, version)) as f:
+        meta = json.load(f)
+    meta['rows'] = 10
+    with open(_meta(store, user_id, version), 'w') as f:
+        json.dump(meta, f)
+
+    fresh = snapshot.SnapshotStore()
+    fresh.folder = store.folder
+    result = fresh.get(user_id)
+    assert len(result) == _expected(user_id)[0]
+
+
+def test_incremental_merge_checks_rows_and_max_id(app, store):
+    user_id = app.config['TEST_USER_ID']
+    rows, max_id = _expected(user_id)
+    store.get(user_id)
+
+    table = Expense.__table__
+    removed = None
+    inserted = db.session.execute(table.insert().values(
+        user_id=user_id, time=datetime(2020, 1, 1), amount=1.5
+    )).inserted_primary_key[0]
+    bump_data_version(db.session.connection(), user_id)
+    db.session.commit()
+    try:
+        appended = store.get(user_id)
+        assert len(appended) == rows + 1
+        assert int(appended.id.max()) == inserted
+
+        # 删除最早的一条但未记录 rewrite_version：增量合并的行数不符，全量重建
+        oldest = db.session.query(func.min(Expense.id)).filter(Expense.user_id == user_id).scalar()
+        removed = db.session.execute(
+            db.select(table).where(table.c.id == oldest)
+        ).mappings().one()
+        db.session.execute(delete(table).where(table.c.id == oldest))
+        db.session.execute(table.insert().values(
+            user_id=user_id, time=datetime(2020, 1, 2), amount=2.5
+        ))
+        bump_data_version(db.session.connection(), user_id)
+        db.session.commit()
+        rebuilt = store.get(user_id)
+        assert (len(rebuilt), int(rebuilt.id.max())) == _expected(user_id)
+        assert oldest not in set(rebuilt.id.tolist())
+    finally:
+        db.session.execute(delete(table).where(table.c.user_id == user_id, table.c.id > max_id))
+        if removed is not None:
+            db.session.execute(table.insert().values(**removed))
+        bump_data_version(db.session.connection(), user_id)
+        db.session.commit()